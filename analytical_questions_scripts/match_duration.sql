@@ -4,14 +4,11 @@
 
 SELECT 
     team_name, 
-    ROUND(AVG(duration)/60, 0) as avg_duration_minutes
+    ROUND(SUM(r.duration_sum)::numeric / SUM(r.timed_matches) / 60, 0) as avg_duration_minutes
 FROM 
     dim_teams t 
-    JOIN fact_team_match_stats tm 
-        ON t.team_id = tm.team_id 
-    JOIN fact_matches m 
-        ON tm.match_id = m.match_id 
-WHERE 
-    t.team_id = 2163 --Comment this line to run for all teams
+    JOIN rollup_team_daily r 
+        ON t.team_id = r.team_id 
+WHERE t.team_id = 2163 --Comment this line to run for all teams
 GROUP BY 1
-ORDER BY 2 DESC;
\ No newline at end of file
+ORDER BY 2 DESC, 1; -- Ties in name order
\ No newline at end of file
@@ -4,14 +4,14 @@
 
 SELECT 
     p.player_name, 
-    CAST(AVG(pm.kda) AS NUMERIC(10,2)) as avg_kda 
+    CAST(SUM(r.kda_sum) / NULLIF(SUM(r.kda_matches), 0) AS NUMERIC(10,2)) as avg_kda -- Like AVG, skips unknown KDAs
 FROM 
     dim_players p 
-    JOIN fact_player_match_stats pm ON p.account_id = pm.account_id 
-WHERE 
-    pm.team_id = 2163  -- Comment this line to run for all teams
+    JOIN rollup_team_player r ON p.account_id = r.account_id 
+WHERE r.team_id = 2163  -- Comment this line to run for all teams
 GROUP BY 
     p.player_name 
 ORDER BY 
-    avg_kda DESC 
+    avg_kda DESC,
+    p.player_name -- Ties in name order, so the top 3 are stable
 LIMIT 3;
\ No newline at end of file
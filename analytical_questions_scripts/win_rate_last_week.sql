@@ -2,17 +2,30 @@
 1. What is the team’s win rate over the past week?
 **/
 
+WITH window_start AS (
+    -- Whole seconds as BIGINT, so the comparison with start_time prunes partitions
+    SELECT CEIL(extract(epoch from (CURRENT_TIMESTAMP - INTERVAL '10 week')))::BIGINT AS ts
+),
+team_results AS (
+    -- Whole UTC days come from the daily rollup
+    SELECT r.team_id, r.wins, r.matches
+    FROM rollup_team_daily r, window_start w
+    WHERE r.day > (to_timestamp(w.ts) AT TIME ZONE 'UTC')::date
+    UNION ALL
+    -- The partial first day comes from the fact tables
+    SELECT tm.team_id, CASE WHEN tm.win_flag = true THEN 1 ELSE 0 END, 1
+    FROM fact_matches m
+    JOIN fact_team_match_stats tm ON tm.match_id = m.match_id, window_start w
+    WHERE m.start_time >= w.ts
+    AND m.start_time < extract(epoch from (to_timestamp(w.ts) AT TIME ZONE 'UTC')::date + 1)::BIGINT
+)
 SELECT 
     team_name, 
-    ROUND(CAST(COUNT(CASE WHEN win_flag = true THEN 1 END) AS DECIMAL) / COUNT(*) * 100, 2) as win_rate,
-    COUNT(DISTINCT m.match_id) as matches_played
+    ROUND(CAST(SUM(r.wins) AS DECIMAL) / SUM(r.matches) * 100, 2) as win_rate,
+    SUM(r.matches) as matches_played
 FROM 
     dim_teams t 
-    JOIN fact_team_match_stats tm 
-        ON t.team_id = tm.team_id 
-    JOIN fact_matches m 
-        ON tm.match_id = m.match_id 
-WHERE 
-    t.team_id = 2163 AND --Comment this line to run for all teams
-    m.start_time >= extract(epoch from (CURRENT_TIMESTAMP - INTERVAL '10 week')) 
-GROUP BY 1;
+    JOIN team_results r 
+        ON t.team_id = r.team_id 
+WHERE t.team_id = 2163 --Comment this line to run for all teams
+GROUP BY 1;
\ No newline at end of file
@@ -0,0 +1,220 @@
+# Standard library imports
+import os
+import math
+import time
+import argparse
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+
+# Third party imports
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+
+# Configuration constants
+SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", "snapshots/latest")  # Written by data_pipeline.export_snapshot
+DEFAULT_TEAM_ID = 2163  # Team the analytical questions are asked about
+WIN_RATE_WEEKS = 10  # Window of win_rate_last_week.sql
+
+# Nullable pandas types, so integer columns with NULLs keep exact integer values
+PANDAS_TYPES = {
+    pa.bool_(): pd.BooleanDtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+}
+
+
+def load_table(name, columns, filter=None, snapshot_dir=None):
+    """
+    Reads the given columns of one snapshot table into a DataFrame
+
+    Args:
+        name (str): Table name, e.g. fact_matches
+        columns (list): Columns to read, so other columns are never decoded
+        filter (pyarrow.dataset.Expression): Row filter; conditions on the
+            patch/month partition columns skip whole partitions
+        snapshot_dir (str): Snapshot directory, defaults to ANALYTICS_SNAPSHOT_DIR
+
+    Returns:
+        pandas.DataFrame: The selected rows
+    """
+    dataset = pads.dataset(os.path.join(snapshot_dir or SNAPSHOT_DIR, name), format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter).to_pandas(types_mapper=PANDAS_TYPES.get)
+
+
+def team_filter(team_id):
+    """Row filter on team_id, or None for every team"""
+    return None if team_id is None else pads.field("team_id") == team_id
+
+
+def round_ratio(numerator, denominator, places):
+    """
+    Rounds numerator / denominator like PostgreSQL ROUND(numeric, places):
+    exactly, with halves rounded away from zero
+
+    Returns:
+        Decimal/None: The rounded value, None where SQL would return NULL
+    """
+    if pd.isna(numerator) or pd.isna(denominator) or denominator == 0:
+        return None
+    scaled = Fraction(int(numerator), int(denominator)) * 10 ** places
+    rounded = math.floor(abs(scaled) + Fraction(1, 2))
+    return Decimal(rounded if scaled >= 0 else -rounded).scaleb(-places)
+
+
+def float_to_numeric(value, places):
+    """Casts a float to NUMERIC(p, places) like PostgreSQL: 15 significant digits, then halves away from zero"""
+    if pd.isna(value):
+        return None
+    return Decimal(f"{value:.15g}").quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+
+def sort_desc(frame, column, tiebreak):
+    """Sorts like ORDER BY column DESC (NULLs first), breaking ties by another column for a stable order"""
+    frame = frame.sort_values(tiebreak, kind="stable")
+    nulls = frame[column].isna()
+    ranked = frame[~nulls].sort_values(column, ascending=False, kind="stable")
+    return pd.concat([frame[nulls], ranked]).reset_index(drop=True)
+
+
+def win_rate_last_week(team_id=DEFAULT_TEAM_ID, weeks=WIN_RATE_WEEKS, now=None, snapshot_dir=None):
+    """
+    1. What is the team's win rate over the past week? (win_rate_last_week.sql)
+
+    Args:
+        team_id (int): Team to report, None for every team
+        weeks (int): Length of the window, in weeks
+        now (float): End of the window as a Unix timestamp, defaults to the current time
+        snapshot_dir (str): Snapshot directory
+
+    Returns:
+        pandas.DataFrame: team_name, win_rate, matches_played
+    """
+    window_start = math.ceil((time.time() if now is None else now) - weeks * 7 * 86400)
+    window_month = time.strftime("%Y-%m", time.gmtime(window_start))
+    recent = pads.field("month") >= window_month
+
+    matches = load_table("fact_matches", ["match_id"],
+                         recent & (pads.field("start_time") >= window_start), snapshot_dir)
+    team_filter_expr = team_filter(team_id)
+    results = load_table("fact_team_match_stats", ["match_id", "team_id", "win_flag"],
+                         recent if team_filter_expr is None else recent & team_filter_expr, snapshot_dir)
+    teams = load_table("dim_teams", ["team_id", "team_name"], team_filter(team_id), snapshot_dir)
+
+    frame = results.merge(matches, on="match_id").merge(teams, on="team_id")
+    frame["won"] = frame["win_flag"].fillna(False).astype("int64")
+    grouped = frame.groupby("team_name", dropna=False).agg(
+        wins=("won", "sum"),
+        matches_played=("match_id", "size"),
+    ).reset_index()
+
+    grouped["win_rate"] = [round_ratio(wins * 100, played, 2)
+                           for wins, played in zip(grouped["wins"], grouped["matches_played"])]
+    return grouped[["team_name", "win_rate", "matches_played"]].sort_values("team_name").reset_index(drop=True)
+
+
+def match_duration(team_id=DEFAULT_TEAM_ID, snapshot_dir=None):
+    """
+    2. What is the average match duration for the team? (match_duration.sql)
+
+    Returns:
+        pandas.DataFrame: team_name, avg_duration_minutes
+    """
+    results = load_table("fact_team_match_stats", ["match_id", "team_id"], team_filter(team_id), snapshot_dir)
+    match_ids = None if team_id is None else pads.field("match_id").isin(results["match_id"].to_numpy())
+    matches = load_table("fact_matches", ["match_id", "duration"], match_ids, snapshot_dir)
+    teams = load_table("dim_teams", ["team_id", "team_name"], team_filter(team_id), snapshot_dir)
+
+    frame = results.merge(matches, on="match_id").merge(teams, on="team_id")
+    grouped = frame.groupby("team_name", dropna=False).agg(
+        duration_sum=("duration", "sum"),
+        timed_matches=("duration", "count"),
+    ).reset_index()
+
+    grouped["avg_duration_minutes"] = [round_ratio(total, count * 60, 0)
+                                       for total, count in zip(grouped["duration_sum"], grouped["timed_matches"])]
+    return sort_desc(grouped[["team_name", "avg_duration_minutes"]], "avg_duration_minutes", "team_name")
+
+
+def top3_player_kda(team_id=DEFAULT_TEAM_ID, snapshot_dir=None):
+    """
+    3. Who are the top 3 players by KDA in the team's matches? (top3_player_kda.sql)
+
+    Returns:
+        pandas.DataFrame: player_name, avg_kda
+    """
+    stats = load_table("fact_player_match_stats", ["account_id", "team_id", "kda"], team_filter(team_id), snapshot_dir)
+    players = load_table("dim_players", ["account_id", "player_name"], None, snapshot_dir)
+
+    frame = stats[stats["team_id"].notna()].merge(players, on="account_id")
+    groups = frame.groupby("player_name", dropna=False)
+    grouped = pd.DataFrame({
+        "kda_sum": groups["kda"].sum(min_count=1),
+        "kda_matches": groups["kda"].count(),  # Like AVG, matches with an unknown KDA are left out
+    }).reset_index()
+
+    grouped["avg_kda"] = [float_to_numeric(total / count, 2) if count else None
+                          for total, count in zip(grouped["kda_sum"], grouped["kda_matches"])]
+    return sort_desc(grouped[["player_name", "avg_kda"]], "avg_kda", "player_name").head(3)
+
+
+def top_win_rate_hero(team_id=DEFAULT_TEAM_ID, min_matches=5, snapshot_dir=None):
+    """
+    4. Which hero has the highest win rate when picked by the team? (top_win_rate_hero.sql)
+
+    Args:
+        min_matches (int): Heroes picked fewer times are left out
+
+    Returns:
+        pandas.DataFrame: hero_name, win_rate, total_matches_played
+    """
+    stats = load_table("fact_player_match_stats", ["hero_id", "team_id", "win_flag"],
+                       team_filter(team_id), snapshot_dir)
+    heroes = load_table("dim_heroes", ["hero_id", "hero_name"], None, snapshot_dir)
+
+    frame = stats[stats["team_id"].notna()].merge(heroes, on="hero_id")
+    frame["won"] = frame["win_flag"].fillna(False).astype("int64")
+    grouped = frame.groupby("hero_name", dropna=False).agg(
+        wins=("won", "sum"),
+        total_matches_played=("hero_id", "size"),
+    ).reset_index()
+    grouped = grouped[grouped["total_matches_played"] >= min_matches]
+
+    grouped["win_rate"] = [round_ratio(wins * 100, played, 2)
+                           for wins, played in zip(grouped["wins"], grouped["total_matches_played"])]
+    return sort_desc(grouped[["hero_name", "win_rate", "total_matches_played"]], "win_rate", "hero_name")
+
+
+QUESTIONS = {
+    "win_rate_last_week": win_rate_last_week,
+    "match_duration": match_duration,
+    "top3_player_kda": top3_player_kda,
+    "top_win_rate_hero": top_win_rate_hero,
+}
+
+
+def parse_args():
+    """Parse command line options for question selection"""
+    parser = argparse.ArgumentParser(description="Answer the analytical questions from a snapshot")
+    parser.add_argument("questions", nargs="*", help=f"Questions to answer ({', '.join(QUESTIONS)}; default: all)")
+    parser.add_argument("--team-id", type=int, default=DEFAULT_TEAM_ID, help="Team to report")
+    parser.add_argument("--all-teams", action="store_true", help="Report every team")
+    parser.add_argument("--snapshot", default=SNAPSHOT_DIR, help="Snapshot directory")
+    args = parser.parse_args()
+    unknown = [question for question in args.questions if question not in QUESTIONS]
+    if unknown:
+        parser.error(f"unknown questions: {', '.join(unknown)}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    team_id = None if args.all_teams else args.team_id
+    for question in args.questions or QUESTIONS:
+        start_time = time.time()
+        result = QUESTIONS[question](team_id=team_id, snapshot_dir=args.snapshot)
+        print(f"📊 {question} ({time.time() - start_time:.3f}s)")
+        print(result.to_string(index=False))
+        print()
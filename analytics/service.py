@@ -0,0 +1,519 @@
+# Standard library imports
+import os
+import json
+import time
+import select
+import hashlib
+import logging
+import argparse
+import threading
+from decimal import Decimal
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third party imports
+from dotenv import load_dotenv
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+# Local imports
+from data_pipeline.metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")  # PostgreSQL connection string
+ANALYTICS_HOST = os.getenv("ANALYTICS_HOST", "127.0.0.1")  # Interface the service listens on
+ANALYTICS_PORT = int(os.getenv("ANALYTICS_PORT", "8000"))  # Port the service listens on
+ANALYTICS_POOL_SIZE = int(os.getenv("ANALYTICS_POOL_SIZE", "8"))  # Queries running at once
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "4096"))  # Responses kept in the LRU cache
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))  # Seconds a response is served without an ETL notification
+ETL_NOTIFY_CHANNEL = "etl_completed"  # Signalled by run_etl.py after every successful run or micro-batch
+LISTEN_RETRY_DELAY = 5  # Seconds before reconnecting a dropped LISTEN connection
+
+WIN_RATE_DAYS = 70  # Default window of win_rate_last_week, as in win_rate_last_week.sql
+MAX_LIMIT = 100  # Most rows a top-N question returns
+
+
+def window_start(days):
+    """Start of a window of `days` days ending now, in whole seconds as BIGINT so start_time comparisons prune partitions"""
+    return f"CEIL(extract(epoch from (CURRENT_TIMESTAMP - make_interval(days => {days}))))::BIGINT"
+
+
+def team_daily_results(days, team, rollup_columns, fact_columns):
+    """
+    CTE with one row per team and day inside the window: whole UTC days come
+    from rollup_team_daily, the partial first day from the fact tables
+
+    Args:
+        days (str): Placeholder of the window length in days
+        team (str): Placeholder of the team id, None for every team
+        rollup_columns (str): rollup_team_daily columns selected (alias r)
+        fact_columns (str): Equivalent expressions over one match (aliases m and tm)
+    """
+    return f"""
+        window_start AS (
+            SELECT {window_start(days)} AS ts
+        ),
+        team_results AS (
+            SELECT r.team_id, {rollup_columns}
+            FROM rollup_team_daily r, window_start w
+            WHERE r.day > (to_timestamp(w.ts) AT TIME ZONE 'UTC')::date
+            {f"AND r.team_id = {team}" if team else ""}
+            UNION ALL
+            SELECT tm.team_id, {fact_columns}
+            FROM fact_matches m
+            JOIN fact_team_match_stats tm ON tm.match_id = m.match_id, window_start w
+            WHERE m.start_time >= w.ts
+            AND m.start_time < extract(epoch from (to_timestamp(w.ts) AT TIME ZONE 'UTC')::date + 1)::BIGINT
+            {f"AND tm.team_id = {team}" if team else ""}
+        )"""
+
+
+def win_rate_last_week(bind, team_id, days, min_matches):
+    """1. What is the team's win rate over the past `days` days? (win_rate_last_week.sql)"""
+    team = bind(team_id) if team_id is not None else None
+    results = team_daily_results(bind(days), team, "r.wins, r.matches",
+                                 "CASE WHEN tm.win_flag = true THEN 1 ELSE 0 END, 1")
+    return f"""
+        WITH {results}
+        SELECT
+            team_name,
+            ROUND(CAST(SUM(r.wins) AS DECIMAL) / SUM(r.matches) * 100, 2) AS win_rate,
+            SUM(r.matches) AS matches_played
+        FROM dim_teams t
+        JOIN team_results r ON t.team_id = r.team_id
+        GROUP BY 1
+        HAVING SUM(r.matches) >= {bind(min_matches)}
+        ORDER BY 1
+    """
+
+
+def match_duration(bind, team_id, days, min_matches):
+    """2. What is the average match duration for the team? (match_duration.sql)"""
+    team = bind(team_id) if team_id is not None else None
+    if days is None:
+        source = "rollup_team_daily"
+        where = f"WHERE t.team_id = {team}" if team else ""
+    else:
+        source = "team_results"
+        where = ""
+    results = "" if days is None else "WITH " + team_daily_results(
+        bind(days), team, "r.matches, r.duration_sum, r.timed_matches",
+        "1, m.duration, CASE WHEN m.duration IS NULL THEN 0 ELSE 1 END")
+    return f"""
+        {results}
+        SELECT
+            team_name,
+            ROUND(SUM(r.duration_sum)::numeric / NULLIF(SUM(r.timed_matches), 0) / 60, 0) AS avg_duration_minutes
+        FROM dim_teams t
+        JOIN {source} r ON t.team_id = r.team_id
+        {where}
+        GROUP BY 1
+        HAVING SUM(r.matches) >= {bind(min_matches)}
+        ORDER BY 2 DESC, 1
+    """
+
+
+def top3_player_kda(bind, team_id, days, min_matches, limit):
+    """3. Who are the top players by KDA in the team's matches? (top3_player_kda.sql)"""
+    if days is None:
+        # All-time totals per team and player come from the rollup
+        team = f"r.team_id = {bind(team_id)}" if team_id is not None else "TRUE"
+        return f"""
+            SELECT p.player_name, CAST(SUM(r.kda_sum) / NULLIF(SUM(r.kda_matches), 0) AS NUMERIC(10,2)) AS avg_kda
+            FROM dim_players p
+            JOIN rollup_team_player r ON p.account_id = r.account_id
+            WHERE {team}
+            GROUP BY p.player_name
+            HAVING SUM(r.matches) >= {bind(min_matches)}
+            ORDER BY avg_kda DESC, p.player_name
+            LIMIT {bind(limit)}
+        """
+    team = f"s.team_id = {bind(team_id)}" if team_id is not None else "s.team_id IS NOT NULL"
+    return f"""
+        SELECT p.player_name, CAST(AVG(s.kda) AS NUMERIC(10,2)) AS avg_kda
+        FROM dim_players p
+        JOIN fact_player_match_stats s ON p.account_id = s.account_id
+        WHERE {team} AND s.start_time >= {window_start(bind(days))}
+        GROUP BY p.player_name
+        HAVING COUNT(*) >= {bind(min_matches)}
+        ORDER BY avg_kda DESC, p.player_name
+        LIMIT {bind(limit)}
+    """
+
+
+def top_win_rate_hero(bind, team_id, days, min_matches):
+    """4. Which hero has the highest win rate when picked by the team? (top_win_rate_hero.sql)"""
+    if days is None:
+        team = f"r.team_id = {bind(team_id)}" if team_id is not None else "TRUE"
+        source = f"""
+            SELECT r.hero_id, r.wins, r.matches
+            FROM rollup_team_hero r
+            WHERE {team}
+        """
+    else:
+        team = f"s.team_id = {bind(team_id)}" if team_id is not None else "s.team_id IS NOT NULL"
+        source = f"""
+            SELECT s.hero_id, CASE WHEN s.win_flag THEN 1 ELSE 0 END AS wins, 1 AS matches
+            FROM fact_player_match_stats s
+            WHERE {team} AND s.start_time >= {window_start(bind(days))}
+        """
+    return f"""
+        SELECT
+            h.hero_name,
+            ROUND(CAST(SUM(r.wins) AS DECIMAL) / SUM(r.matches) * 100, 2) AS win_rate,
+            SUM(r.matches) AS total_matches_played
+        FROM ({source}) r
+        JOIN dim_heroes h ON h.hero_id = r.hero_id
+        GROUP BY h.hero_name
+        HAVING SUM(r.matches) >= {bind(min_matches)}
+        ORDER BY win_rate DESC, h.hero_name
+    """
+
+
+# Questions served by the service, with their query builder and parameter defaults.
+# team_id None is every team and days None is all time
+QUESTIONS = {
+    "win_rate_last_week": (win_rate_last_week, {"team_id": None, "days": WIN_RATE_DAYS, "min_matches": 1}),
+    "match_duration": (match_duration, {"team_id": None, "days": None, "min_matches": 1}),
+    "top3_player_kda": (top3_player_kda, {"team_id": None, "days": None, "min_matches": 1, "limit": 3}),
+    "top_win_rate_hero": (top_win_rate_hero, {"team_id": None, "days": None, "min_matches": 5}),
+}
+
+
+def parse_params(question, query):
+    """
+    Validates the query string of a question and fills in the defaults
+
+    Args:
+        question (str): Key of QUESTIONS
+        query (str): Raw query string, e.g. "team_id=2163&days=7"
+
+    Returns:
+        dict: Parameter values in the order of the question's defaults
+
+    Raises:
+        ValueError: For unknown parameters or invalid values
+    """
+    _, defaults = QUESTIONS[question]
+    values = parse_qs(query, keep_blank_values=True)
+    unknown = sorted(set(values) - set(defaults))
+    if unknown:
+        raise ValueError(f"unknown parameters: {', '.join(unknown)}, expected {', '.join(defaults)}")
+
+    params = {}
+    for name, default in defaults.items():
+        raw = values.get(name, [""])[-1].strip()
+        if name == "team_id" and raw.lower() in ("", "all"):
+            params[name] = None
+        elif name == "days" and raw.lower() == "all":
+            params[name] = None
+        elif not raw:
+            params[name] = default
+        else:
+            try:
+                params[name] = int(raw)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer, got {raw!r}") from None
+            if params[name] < (0 if name == "min_matches" else 1):
+                raise ValueError(f"{name} is out of range: {raw}")
+    if "limit" in params:
+        params["limit"] = min(params["limit"], MAX_LIMIT)
+    return params
+
+
+def build_statement(question, params):
+    """
+    Builds the SQL of a question for the given parameter values
+    Values are bound as $n parameters, so every request shape (team or all teams,
+    windowed or all time) is one statement, prepared once per connection
+
+    Returns:
+        tuple: (statement name, SQL text, argument list)
+    """
+    builder, _ = QUESTIONS[question]
+    args = []
+
+    def bind(value):
+        args.append(value)
+        return f"${len(args)}"
+
+    sql = builder(bind, **params)
+    name = f"{question}_{hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]}"
+    return name, sql, args
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements were prepared on its session"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+    def execute_prepared(self, name, sql, args):
+        """Runs a statement with PREPARE/EXECUTE, preparing it on first use"""
+        with self.cursor() as cursor:
+            if name not in self.prepared:
+                cursor.execute(f"PREPARE {name} AS {sql}")
+                self.prepared.add(name)
+            placeholders = ", ".join(["%s"] * len(args))
+            cursor.execute(f"EXECUTE {name}({placeholders})" if args else f"EXECUTE {name}", args)
+            columns = [column.name for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of encoded responses
+    clear() is called when an ETL run completes. A response computed while the
+    cache was being cleared is not stored, so it can never outlive the run
+    that made it stale
+    """
+
+    def __init__(self, max_entries=ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, body), least recently used first
+        self.loading = {}  # key -> Event set when the request computing it finishes
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached body for a key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def get_or_load(self, key, load):
+        """
+        Returns the cached body for a key, or computes it with `load()`
+        Concurrent misses on the same key wait for the first one instead of
+        running the same query again
+
+        Returns:
+            tuple: (body, True if it was served from the cache)
+        """
+        body = self.get(key)
+        if body is not None:
+            return body, True
+
+        with self.lock:
+            event = self.loading.get(key)
+            leader = event is None
+            if leader:
+                event = self.loading[key] = threading.Event()
+            generation = self.generation
+
+        if not leader:
+            event.wait()
+            body = self.get(key)
+            if body is not None:
+                return body, True
+            with self.lock:
+                generation = self.generation
+
+        try:
+            body = load()
+            with self.lock:
+                if generation == self.generation:
+                    self.entries[key] = (time.monotonic(), body)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            return body, False
+        finally:
+            if leader:
+                with self.lock:
+                    del self.loading[key]
+                event.set()
+
+    def clear(self):
+        """Drops every cached response"""
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def json_default(value):
+    """Encodes NUMERIC results as JSON numbers"""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class AnalyticsService(ThreadingHTTPServer):
+    """
+    HTTP/JSON service answering the analytical questions from PostgreSQL
+    Answers are cached in memory until the next completed ETL run, and misses
+    run as prepared statements on a bounded connection pool
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, database_url=None, pool_size=ANALYTICS_POOL_SIZE, cache=None):
+        super().__init__(address, AnalyticsHandler)
+        self.database_url = database_url or DATABASE_URL
+        self.pool = ThreadedConnectionPool(1, pool_size, self.database_url, connection_factory=PreparedConnection)
+        self.pool_slots = threading.BoundedSemaphore(pool_size)  # getconn() fails instead of waiting when empty
+        self.cache = cache or ResultCache()
+        self.stopping = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def query(self, question, params):
+        """Runs a question on a pooled connection and returns the encoded response"""
+        name, sql, args = build_statement(question, params)
+        with self.pool_slots:
+            conn = self.pool.getconn()
+            try:
+                conn.autocommit = True  # Plain reads, no transaction left open between requests
+                start_time = time.time()
+                rows = conn.execute_prepared(name, sql, args)
+                metrics.observe("analytics_query_seconds", time.time() - start_time, question=question)
+            except psycopg2.Error:
+                conn.close()  # Drops its prepared statements too, e.g. after a schema change
+                raise
+            finally:
+                self.pool.putconn(conn, close=conn.closed != 0)
+        payload = {"question": question, "params": params, "rows": rows}
+        return json.dumps(payload, default=json_default).encode("utf-8")
+
+    def answer(self, question, params):
+        """
+        Returns the response for a question, from the cache when possible
+
+        Returns:
+            tuple: (encoded JSON body, True on a cache hit)
+        """
+        key = (question,) + tuple(params.values())
+        return self.cache.get_or_load(key, lambda: self.query(question, params))
+
+    def listen_for_etl(self):
+        """
+        Clears the cache whenever the ETL signals a completed run, until the
+        service stops. A dropped connection also clears it, since notifications
+        sent while disconnected are lost
+        """
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.database_url)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {ETL_NOTIFY_CHANNEL}")
+                self.cache.clear()
+                logging.info(f"Listening for {ETL_NOTIFY_CHANNEL} notifications")
+
+                while not self.stopping.is_set():
+                    if select.select([conn], [], [], 1)[0]:
+                        conn.poll()
+                        if conn.notifies:
+                            conn.notifies.clear()
+                            self.cache.clear()
+                            metrics.inc("analytics_cache_invalidations")
+                            logging.info("ETL run completed, response cache cleared")
+            except psycopg2.Error as e:
+                logging.error(f"LISTEN connection failed: {str(e)}")
+                self.cache.clear()
+                self.stopping.wait(LISTEN_RETRY_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def serve(self):
+        """Serves requests until interrupted, with the ETL listener on a background thread"""
+        listener = threading.Thread(target=self.listen_for_etl, name="etl-listener", daemon=True)
+        listener.start()
+        try:
+            self.serve_forever()
+        finally:
+            self.stopping.set()
+            self.server_close()
+            self.pool.closeall()
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive for dashboards polling many teams
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes; don't hold the body for an ACK
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, cache_status=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cache_status:
+            self.send_header("X-Cache", cache_status)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_body(status, json.dumps({"error": message}).encode("utf-8"))
+
+    def do_GET(self):
+        start_time = time.time()
+        url = urlsplit(self.path)
+        question = url.path.strip("/")
+
+        if question == "":
+            index = {name: defaults for name, (_, defaults) in QUESTIONS.items()}
+            self.send_body(200, json.dumps({"questions": index}).encode("utf-8"))
+            return
+        if question == "metrics":
+            self.send_body(200, json.dumps(metrics.to_dict(), default=str).encode("utf-8"))
+            return
+        if question not in QUESTIONS:
+            self.send_error_json(404, f"unknown question, expected one of: {', '.join(QUESTIONS)}")
+            return
+
+        try:
+            params = parse_params(question, url.query)
+        except ValueError as e:
+            self.send_error_json(400, str(e))
+            return
+
+        try:
+            body, hit = self.server.answer(question, params)
+        except psycopg2.Error as e:
+            logging.error(f"{question} failed: {str(e)}")
+            self.send_error_json(503, "database query failed")
+            return
+
+        cache_status = "HIT" if hit else "MISS"
+        metrics.inc("analytics_requests", question=question, cache=cache_status.lower())
+        metrics.observe("analytics_request_seconds", time.time() - start_time, cache=cache_status.lower())
+        self.send_body(200, body, cache_status)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Serve the analytical questions as a cached HTTP/JSON API")
+    parser.add_argument("--host", default=ANALYTICS_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=ANALYTICS_PORT, help="Port to listen on")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+    args = parse_args()
+    service = AnalyticsService((args.host, args.port))
+    print(f"📊 Analytics service on {service.url} ({', '.join(QUESTIONS)})")
+    try:
+        service.serve()
+    except KeyboardInterrupt:
+        pass
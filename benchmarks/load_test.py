@@ -0,0 +1,106 @@
+# Standard library imports
+import sys
+import json
+import time
+import argparse
+
+# Local imports
+from benchmarks.mock_opendota import start_server, add_fault_args, faults_from_args
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client
+from data_pipeline.metrics import metrics
+
+# Configuration constants
+MIN_EFFICIENCY = 0.8  # Share of the quota the client must sustain, counting retried attempts served
+BACKOFF_SCALE = 0.05  # Shrinks the client's retry backoff, which is sized for the real API
+
+
+def run_load_test(base_url, match_ids, rate_per_minute, workers, quota_per_minute=None, burst=1):
+    """
+    Fetches every match concurrently through request_with_retries, with the
+    shared rate limiter set to `rate_per_minute` and the cache disabled
+
+    Args:
+        quota_per_minute (float): Quota enforced by the server, when lower than
+            the client's rate; efficiency is measured against the lower of the two
+
+    Returns:
+        dict: Matches fetched and lost, request rates and client metrics
+    """
+    api_client.response_cache = None
+    api_client.rate_limiter = api_client.TokenBucket(rate_per_minute / 60, burst)
+    quota_per_minute = min(rate_per_minute, quota_per_minute or rate_per_minute)
+    api_client.session = api_client.create_session(workers)
+
+    start_time = time.perf_counter()
+    fetch = lambda match_id: api_client.request_with_retries(f"{base_url}/matches/{match_id}")
+    lost = [match_id for match_id, match in api_client.fetch_concurrently(fetch, match_ids, max_workers=workers)
+            if match is None or match.get("match_id") != match_id]
+    seconds = time.perf_counter() - start_time
+
+    # Requests refused with a 429 did not use the quota
+    attempts = metrics.total("api_attempts") - metrics.total("api_rate_limited")
+    return {
+        "matches": len(match_ids),
+        "fetched": len(match_ids) - len(lost),
+        "lost": sorted(lost),
+        "seconds": round(seconds, 2),
+        "retry_after_seconds": round(api_client.rate_limiter.paused_seconds, 2),
+        "quota_per_minute": quota_per_minute,
+        "requests_per_minute": round(attempts / seconds * 60, 1),
+        "matches_per_minute": round((len(match_ids) - len(lost)) / seconds * 60, 1),
+        "efficiency": round(attempts / seconds * 60 / quota_per_minute, 3),
+        "final_rate_per_minute": round(api_client.rate_limiter.rate * 60, 1),
+        "retries": metrics.total("api_retries"),
+        "rate_limited": metrics.total("api_rate_limited"),
+        "invalid_responses": metrics.total("api_invalid_responses"),
+        "failures": metrics.total("api_failures"),
+    }
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(
+        description="Fetch matches concurrently from the mock OpenDota API and check the sustained throughput")
+    parser.add_argument("--matches", type=int, default=500, help="Matches to fetch")
+    parser.add_argument("--rate", type=float, default=3000, help="Client rate limit in requests per minute")
+    parser.add_argument("--workers", type=int, default=api_client.FETCH_WORKERS, help="Concurrent requests")
+    parser.add_argument("--url", help="Base URL of an already running mock (default: start one in-process)")
+    parser.add_argument("--seed", type=int, default=0, help="Generator and fault seed")
+    parser.add_argument("--min-efficiency", type=float, default=MIN_EFFICIENCY,
+                        help="Fail below this share of the quota (default: 0.8)")
+    parser.add_argument("--backoff-scale", type=float, default=BACKOFF_SCALE,
+                        help="Multiplier of the client's retry backoff (default: 0.05)")
+    add_fault_args(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    api_client.BACKOFF_SCALE = args.backoff_scale
+    generator = DataGenerator(args.matches, seed=args.seed)
+
+    server = None
+    if not args.url:
+        server = start_server(generator, faults_from_args(args), seed=args.seed)
+    base_url = args.url or server.url
+
+    try:
+        print(f"🚀 Fetching {args.matches} matches from {base_url} with {args.workers} workers "
+              f"at {args.rate:.0f} requests/min")
+        result = run_load_test(base_url, [generator.match_id(i) for i in range(args.matches)],
+                               args.rate, args.workers, quota_per_minute=args.quota)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    if server is not None:
+        result["server_responses"] = server.stats
+
+    print(json.dumps(result, indent=2, sort_keys=True))
+    if result["lost"]:
+        sys.exit(f"❌ {len(result['lost'])} matches lost")
+    if result["efficiency"] < args.min_efficiency:
+        sys.exit(f"❌ Sustained {result['requests_per_minute']} requests/min, "
+                 f"below {args.min_efficiency:.0%} of the {result['quota_per_minute']:.0f}/min quota")
+    print(f"✅ {result['fetched']} matches at {result['efficiency']:.0%} of the quota")
@@ -0,0 +1,249 @@
+# Standard library imports
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local imports
+from benchmarks.synthetic import DataGenerator
+
+# Endpoint patterns served by the mock, mapped to the generator method answering them
+ROUTES = [
+    (re.compile(r"/heroes$"), lambda generator: generator.heroes()),
+    (re.compile(r"/proMatches$"), lambda generator: generator.pro_matches()),
+    (re.compile(r"/teams/(\d+)$"), lambda generator, team_id: generator.team(int(team_id))),
+    (re.compile(r"/teams/(\d+)/matches$"), lambda generator, team_id: generator.team_matches(int(team_id))),
+    (re.compile(r"/matches/(\d+)$"), lambda generator, match_id: generator.match(int(match_id))),
+    (re.compile(r"/players/(\d+)$"), lambda generator, account_id: generator.player(int(account_id))),
+]
+
+
+@dataclass
+class Faults:
+    """Faults injected into the mock's responses; shares are probabilities per request"""
+    latency: float = 0.0  # Seconds added to every response
+    latency_jitter: float = 0.0  # Random extra latency, up to this many seconds
+    quota_per_minute: float = 0.0  # Requests per minute served before answering 429, 0 for no quota
+    quota_burst: int = 10  # Requests allowed back-to-back under the quota
+    rate_limit_share: float = 0.0  # Random 429 Too Many Requests, on top of the quota
+    retry_after: int = 1  # Retry-After seconds sent with random 429s
+    error_share: float = 0.0  # Random 500/502/503 responses
+    truncate_share: float = 0.0  # Bodies cut in half, after announcing the full Content-Length
+
+
+class Quota:
+    """Non-blocking token bucket: the server refuses requests instead of queueing them"""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Consumes a token if one is available
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds until the next token
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class MockOpenDotaServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenDota endpoints used by the pipeline, serving
+    DataGenerator payloads with optional latency, 429, 5xx and truncation faults.
+    Responses carry an ETag and honour If-None-Match, like the real API
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, generator, faults=None, seed=0):
+        super().__init__(address, MockHandler)
+        self.generator = generator
+        self.faults = faults or Faults()
+        self.quota = Quota(self.faults.quota_per_minute, self.faults.quota_burst) if self.faults.quota_per_minute else None
+        self.random = random.Random(seed)
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        generator.team_matches(generator.team_ids[0])  # Build the team index before serving concurrent requests
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, outcome):
+        with self.stats_lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def draw(self):
+        """One random number per decision, shared across handler threads"""
+        with self.stats_lock:
+            return self.random.random()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the API behind its load balancer
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        return body
+
+    def do_GET(self):
+        server = self.server
+        faults = server.faults
+        path = self.path.split("?", 1)[0]
+
+        if faults.latency or faults.latency_jitter:
+            time.sleep(faults.latency + faults.latency_jitter * server.draw())
+
+        if server.quota is not None:
+            wait_time = server.quota.take()
+            if wait_time:
+                server.count("429_quota")
+                self.wfile.write(self.send_json(429, {"error": "rate limit exceeded"},
+                                                {"Retry-After": str(math.ceil(wait_time))}))
+                return
+
+        if server.draw() < faults.rate_limit_share:
+            server.count("429_injected")
+            self.wfile.write(self.send_json(429, {"error": "rate limit exceeded"},
+                                            {"Retry-After": str(faults.retry_after)}))
+            return
+
+        if server.draw() < faults.error_share:
+            status = (500, 502, 503)[int(server.draw() * 3)]
+            server.count(str(status))
+            self.wfile.write(self.send_json(status, {"error": "Internal Server Error"}))
+            return
+
+        for pattern, handler in ROUTES:
+            match = pattern.search(path)
+            if match:
+                payload = handler(server.generator, *match.groups())
+                break
+        else:
+            payload = None
+
+        if payload is None:
+            server.count("404")
+            self.wfile.write(self.send_json(404, {"error": "Not Found"}))
+            return
+
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            server.count("304")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+        if server.draw() < faults.truncate_share:
+            server.count("200_truncated")
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+
+        server.count("200")
+        self.wfile.write(body)
+
+
+def start_server(generator, faults=None, host="127.0.0.1", port=0, seed=0):
+    """
+    Starts the mock API on a background thread
+
+    Args:
+        generator (DataGenerator): Source of every payload
+        faults (Faults): Faults to inject, none by default
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 for any free port
+        seed (int): Seed of the fault injection
+
+    Returns:
+        MockOpenDotaServer: The running server; its `url` is the API base URL, stop it with shutdown()
+    """
+    server = MockOpenDotaServer((host, port), generator, faults, seed)
+    threading.Thread(target=server.serve_forever, name="mock-opendota", daemon=True).start()
+    return server
+
+
+def add_fault_args(parser):
+    """Adds the fault injection options shared by the mock and the load test"""
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra latency, in seconds")
+    parser.add_argument("--quota", type=float, default=0.0,
+                        help="Requests per minute served before answering 429 (default: no quota)")
+    parser.add_argument("--rate-limit-share", type=float, default=0.0, help="Share of random 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with random 429s")
+    parser.add_argument("--error-share", type=float, default=0.0, help="Share of random 500/502/503 responses")
+    parser.add_argument("--truncate-share", type=float, default=0.0, help="Share of responses cut in half")
+
+
+def faults_from_args(args):
+    return Faults(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        quota_per_minute=args.quota,
+        rate_limit_share=args.rate_limit_share,
+        retry_after=args.retry_after,
+        error_share=args.error_share,
+        truncate_share=args.truncate_share,
+    )
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Serve synthetic OpenDota data with injected faults")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--matches", type=int, default=1000, help="Number of matches served")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    add_fault_args(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MockOpenDotaServer((args.host, args.port), DataGenerator(args.matches, seed=args.seed),
+                                faults_from_args(args), args.seed)
+    print(f"🧪 Mock OpenDota API on {server.url} (OPENDOTA_API_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 Responses: {json.dumps(server.stats, sort_keys=True)}")
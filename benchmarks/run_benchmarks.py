@@ -0,0 +1,344 @@
+# Standard library imports
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from dataclasses import replace
+from pathlib import Path
+
+# Third party imports
+import psycopg2
+from dotenv import load_dotenv
+
+# Local imports
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import fetch_data
+from data_pipeline.metrics import metrics
+from run_etl import PIPELINE, split_sql_statements
+
+# Load environment variables from .env file
+load_dotenv()
+ROOT = Path(__file__).resolve().parent.parent
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL")  # Scratch database, wiped by every run
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+QUERY_RUNS = 5  # Timed runs of every analytical query
+REGRESSION_THRESHOLD = 0.10  # Slowdown reported as a regression by --compare
+NOISE_FLOOR = {"stages": 0.05, "queries": 1.0, "tables": 0.1}  # Smaller absolute changes (s, ms, MB) are never regressions
+
+# The team filter line of the analytical queries, commented out for the all-teams
+# variant as the scripts tell their reader to
+TEAM_FILTER = re.compile(r"^WHERE\s+\S+ = 2163\s*--", re.MULTILINE)
+
+
+class TimedIterator:
+    """Wraps an iterator and accumulates the time spent producing its items"""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start_time = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start_time
+
+
+def stage_result(stage, seconds, rows=None, **details):
+    """One entry of the results file: duration and throughput of a stage"""
+    result = {"stage": stage, "seconds": round(seconds, 4)}
+    if rows is not None:
+        result["rows"] = rows
+        result["rows_per_second"] = round(rows / seconds, 1) if seconds > 0 else None
+    result.update(details)
+    print(f"⏱️ {stage}: {seconds:.3f}s" + (f" ({result['rows_per_second']} rows/s)" if rows else ""))
+    return result
+
+
+def reset_database(connection):
+    """Drops every table of the scratch database"""
+    with connection.cursor() as cursor:
+        cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    connection.commit()
+
+
+def run_script(connection, path):
+    """
+    Runs a SQL script one statement at a time, like run_etl
+
+    Returns:
+        tuple: (seconds, slowest statements as dicts with statement, seconds and rows)
+    """
+    statements = []
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            start_time = time.perf_counter()
+            for statement in split_sql_statements(path.read_text()):
+                statement_start = time.perf_counter()
+                cursor.execute(statement)
+                statements.append({
+                    "statement": " ".join(statement.split())[:80],
+                    "seconds": round(time.perf_counter() - statement_start, 4),
+                    "rows": cursor.rowcount,
+                })
+            seconds = time.perf_counter() - start_time
+    finally:
+        connection.autocommit = False
+    return seconds, sorted(statements, key=lambda entry: entry["seconds"], reverse=True)[:3]
+
+
+def stage_data(generator, start, stop, label):
+    """
+    Loads matches start..stop-1 through store_raw_data. Generating the payloads
+    is timed separately, so the staging throughput only covers encoding and COPY
+
+    Returns:
+        list: Stage results for generation and staging
+    """
+    matches = TimedIterator(generator.matches(start, stop))
+    start_time = time.perf_counter()
+    inserted = fetch_data.store_raw_data("stg_matches", matches)
+    total = time.perf_counter() - start_time
+    return [
+        stage_result(f"{label}generate_matches", matches.seconds, stop - start),
+        stage_result(f"{label}stage_matches", total - matches.seconds, stop - start, inserted=inserted),
+    ]
+
+
+def run_transforms(connection, matches, label):
+    """Runs every SQL step of the pipeline in declaration order"""
+    results = []
+    for name, kind, target, _, _ in PIPELINE:
+        if kind != "sql" or name == "schema":
+            continue
+        seconds, slowest = run_script(connection, ROOT / "sql_scripts" / target)
+        results.append(stage_result(f"{label}{name}", seconds, matches, slowest_statements=slowest))
+    return results
+
+
+def all_teams(sql):
+    """Analytical query with its team filter line commented out"""
+    return TEAM_FILTER.sub(lambda match: f"-- {match.group(0)}", sql)
+
+
+def benchmark_queries(connection, team_id, runs=QUERY_RUNS):
+    """
+    Times every analytical query for one team and for all teams
+
+    Returns:
+        list: Latency statistics per query in milliseconds
+    """
+    results = []
+    for path in sorted((ROOT / "analytical_questions_scripts").glob("*.sql")):
+        sql = path.read_text()
+        for variant, query in (("team", sql.replace("2163", str(team_id))), ("all", all_teams(sql))):
+            timings = []
+            with connection.cursor() as cursor:
+                for _ in range(runs):
+                    start_time = time.perf_counter()
+                    cursor.execute(query)
+                    rows = len(cursor.fetchall())
+                    timings.append((time.perf_counter() - start_time) * 1000)
+            connection.rollback()
+
+            timings.sort()
+            result = {
+                "query": f"{path.stem}[{variant}]",
+                "runs": runs,
+                "rows": rows,
+                "min_ms": round(timings[0], 3),
+                "median_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            }
+            print(f"🔎 {result['query']}: median {result['median_ms']}ms")
+            results.append(result)
+    return results
+
+
+def table_sizes(connection):
+    """
+    Size of every table after the run, with its TOAST data, indexes and partitions
+
+    Returns:
+        list: Table names and sizes in MB, largest first
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname, COALESCE(
+                (SELECT SUM(pg_total_relation_size(relid)) FROM pg_partition_tree(c.oid)),
+                pg_total_relation_size(c.oid)
+            )
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+            ORDER BY 2 DESC
+        """)
+        sizes = [{"table": name, "mb": round(int(size) / 2 ** 20, 3)} for name, size in cursor.fetchall()]
+    connection.rollback()
+    return sizes
+
+
+def git_commit():
+    """Short commit hash of the benchmarked tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(database_url, match_count, increment, seed=0, query_runs=QUERY_RUNS):
+    """
+    Loads `match_count` synthetic matches into an empty database through the
+    staging loader and every SQL step, then `increment` more matches as an
+    incremental run, and times the analytical queries
+
+    Returns:
+        dict: The results file contents
+    """
+    generator = DataGenerator(match_count + increment, seed=seed)
+    connection = psycopg2.connect(database_url)
+    fetch_data.config = replace(fetch_data.config, database_url=database_url)
+    fetch_data._connection = connection
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT version()")
+            postgres_version = cursor.fetchone()[0]
+        connection.rollback()
+
+        reset_database(connection)
+        seconds, _ = run_script(connection, ROOT / "sql_scripts" / "tables_schema.sql")
+        stages = [stage_result("schema", seconds)]
+
+        start_time = time.perf_counter()
+        fetch_data.store_raw_data("stg_heroes", generator.heroes())
+        fetch_data.store_raw_data("stg_teams", generator.teams())
+        stages.append(stage_result("stage_heroes_teams", time.perf_counter() - start_time,
+                                   len(generator.team_ids)))
+
+        stages += stage_data(generator, 0, match_count, "")
+        stages += run_transforms(connection, match_count, "")
+
+        if increment:
+            stages += stage_data(generator, match_count, match_count + increment, "incremental/")
+            stages += run_transforms(connection, increment, "incremental/")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT team_id FROM fact_team_match_stats GROUP BY team_id ORDER BY COUNT(*) DESC LIMIT 1")
+            busiest_team = cursor.fetchone()[0]
+        connection.rollback()
+        queries = benchmark_queries(connection, busiest_team, query_runs)
+        tables = table_sizes(connection)
+    finally:
+        connection.close()
+        fetch_data._connection = None
+
+    return {
+        "benchmark": {
+            "matches": match_count,
+            "increment": increment,
+            "seed": seed,
+            "teams": generator.team_count,
+            "data_end_time": generator.end_time,
+            "commit": git_commit(),
+            "started_at": metrics.started_at,
+            "postgres": postgres_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "stages": stages,
+        "queries": queries,
+        "tables": tables,
+        "counters": metrics.to_dict()["counters"],
+    }
+
+
+def compare(baseline_path, candidate_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints stage durations, query latencies and table sizes of two results files side by side
+
+    Returns:
+        int: Number of stages and queries slower (tables larger) than the baseline
+            by more than `threshold` and by more than the NOISE_FLOOR of their section
+    """
+    baseline = json.loads(Path(baseline_path).read_text())
+    candidate = json.loads(Path(candidate_path).read_text())
+    regressions = 0
+
+    def rows(results, name_field, value_field):
+        return {entry[name_field]: entry[value_field] for entry in results}
+
+    for title, section, name_field, value_field, unit in (
+        ("Stage", "stages", "stage", "seconds", "s"),
+        ("Query", "queries", "query", "median_ms", "ms"),
+        ("Table", "tables", "table", "mb", "M"),
+    ):
+        if section not in baseline or section not in candidate:
+            continue
+        before = rows(baseline[section], name_field, value_field)
+        after = rows(candidate[section], name_field, value_field)
+        print(f"{title:<45} {'baseline':>12} {'candidate':>12} {'change':>9}")
+        for name in [name for name in before if name in after]:
+            change = (after[name] - before[name]) / before[name] if before[name] else 0.0
+            flag = ""
+            if change > threshold and after[name] - before[name] > NOISE_FLOOR[section]:
+                regressions += 1
+                flag = " ⚠️"
+            print(f"{name:<45} {before[name]:>11.3f}{unit:<1} {after[name]:>11.3f}{unit:<1} {change:>+8.1%}{flag}")
+        print()
+
+    for label, results in (("baseline", baseline), ("candidate", candidate)):
+        info = results["benchmark"]
+        print(f"{label}: {info['matches']} matches, commit {info['commit']}, {info['postgres'].split(',')[0]}")
+    return regressions
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark the ETL on synthetic data against a scratch database")
+    parser.add_argument("--matches", type=int, default=1000, help="Matches in the initial load (1k to 1M)")
+    parser.add_argument("--increment", type=int,
+                        help="Matches in the incremental run after it (default: 1%% of --matches, at least 10)")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("--query-runs", type=int, default=QUERY_RUNS, help="Timed runs per analytical query")
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL,
+                        help="Scratch database; every table in it is dropped (default: BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<time>-<matches>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two results files instead of running a benchmark")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown reported as a regression by --compare (default: 0.10)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+
+    if not args.database_url:
+        sys.exit("Set BENCHMARK_DATABASE_URL or pass --database-url with a scratch database")
+    if args.database_url == os.getenv("DATABASE_URL"):
+        sys.exit("Refusing to benchmark against DATABASE_URL: the benchmark drops every table in its database")
+
+    increment = args.increment if args.increment is not None else max(10, args.matches // 100)
+    results = run_benchmark(args.database_url, args.matches, increment, seed=args.seed, query_runs=args.query_runs)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        time.strftime("%Y%m%dT%H%M%S", time.gmtime()) + f"-{args.matches}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"✅ Results written to {output}")
@@ -0,0 +1,221 @@
+# Standard library imports
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import multiprocessing
+
+# Third party imports
+import psycopg2
+
+# Local imports
+from benchmarks.mock_opendota import start_server, add_fault_args, faults_from_args
+from benchmarks.run_benchmarks import BENCHMARK_DATABASE_URL, ROOT, reset_database, run_script, run_transforms
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client, fetch_data
+from data_pipeline.metrics import metrics
+
+# Configuration constants
+BACKOFF_SCALE = 0.05  # Shrinks the client's retry backoff, which is sized for the real API
+
+# Consistency checks run after the stress test; every one must return 0
+CHECKS = {
+    # Every staged match carries the batch that staged it, and every batch finished
+    "untagged_matches": "SELECT COUNT(*) FROM stg_matches WHERE load_batch_id IS NULL",
+    "unfinished_batches": "SELECT COUNT(*) FROM load_batches WHERE status <> 'completed'",
+    # A match staged by two batches would be counted twice
+    "double_counted_matches": """
+        SELECT COALESCE(SUM(matches_staged), 0) - (SELECT COUNT(*) FROM stg_matches) FROM load_batches
+    """,
+    # Staged rows the incremental transforms skipped, e.g. because a later stg_seq committed first
+    "matches_missing_from_facts": """
+        SELECT COUNT(*) FROM stg_matches s
+        WHERE s.start_time IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM fact_matches f WHERE f.match_id = s.match_id)
+    """,
+    "team_rows_missing_from_facts": """
+        SELECT COUNT(*) FROM stg_matches s
+        CROSS JOIN LATERAL (VALUES (s.radiant_team_id), (s.dire_team_id)) AS side(team_id)
+        WHERE s.start_time IS NOT NULL AND side.team_id > 0
+          AND NOT EXISTS (SELECT 1 FROM fact_team_match_stats f
+                          WHERE f.match_id = s.match_id AND f.team_id = side.team_id)
+    """,
+    "player_rows_missing_from_facts": """
+        SELECT COUNT(*) FROM stg_match_players p
+        JOIN stg_matches s ON s.match_id = p.match_id
+        WHERE s.start_time IS NOT NULL AND p.account_id > 0
+          AND NOT EXISTS (SELECT 1 FROM fact_player_match_stats f
+                          WHERE f.match_id = p.match_id AND f.account_id = p.account_id)
+    """,
+}
+
+
+def run_worker(fetch_config, rate_per_minute, backoff_scale, verbose):
+    """
+    Entry point of a loader process: one fetch_data.run() against the mock
+
+    Returns:
+        dict: The worker's metrics
+    """
+    api_client.BACKOFF_SCALE = backoff_scale
+    api_client.RATE_LIMIT_PER_MINUTE = rate_per_minute
+    api_client.response_cache = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        fetch_data.run(fetch_config)
+    return metrics.to_dict()
+
+
+def transform_loop(database_url, stop, passes, errors):
+    """Runs every SQL step over and over until `stop` is set, like a run_etl running next to the loaders"""
+    connection = psycopg2.connect(database_url)
+    try:
+        while not stop.is_set():
+            try:
+                run_transforms(connection, None, "")
+                passes.append(time.time())
+            except psycopg2.Error as e:
+                errors.append(str(e).strip())
+                # The scripts open their own transactions, so start over on a new session
+                connection.close()
+                connection = psycopg2.connect(database_url)
+    finally:
+        connection.close()
+
+
+def run_stress_test(database_url, base_url, generator, workers, transformers, batch_teams, copy_batch_size,
+                    rate_per_minute, verbose=False):
+    """
+    Loads every generated match with `workers` concurrent loader processes that
+    all track every team, while `transformers` threads run the SQL steps in a
+    loop, then checks that nothing was duplicated or lost
+
+    Returns:
+        dict: Row counts, API requests, transform passes and errors, and the check results
+    """
+    connection = psycopg2.connect(database_url)
+    reset_database(connection)
+    run_script(connection, ROOT / "sql_scripts" / "tables_schema.sql")
+
+    fetch_config = fetch_data.FetchConfig(
+        database_url=database_url,
+        api_base_url=base_url,
+        team_ids=",".join(str(team_id) for team_id in generator.team_ids),
+        match_limit=generator.match_count,
+        match_history_depth=generator.match_count,
+        copy_batch_size=copy_batch_size,
+        batch_teams=batch_teams,
+    )
+
+    # Heroes are staged before the loops start, as run_etl runs fetch_data before dim_heroes
+    fetch_data.config, fetch_data._connection = fetch_config, connection
+    try:
+        fetch_data.load_heroes_if_missing()
+    finally:
+        fetch_data._connection = None
+
+    stop = threading.Event()
+    passes, errors = [], []
+    threads = [threading.Thread(target=transform_loop, args=(database_url, stop, passes, errors),
+                                name=f"transform-{i}") for i in range(transformers)]
+    for thread in threads:
+        thread.start()
+
+    start_time = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    try:
+        with context.Pool(workers) as pool:
+            results = pool.starmap(run_worker, [(fetch_config, rate_per_minute, api_client.BACKOFF_SCALE, verbose)
+                                                for _ in range(workers)])
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    load_seconds = time.perf_counter() - start_time
+
+    # One last pass picks up whatever the loop passes were bounded away from
+    run_transforms(connection, None, "")
+    for worker_metrics in results:
+        metrics.merge(worker_metrics)
+
+    with connection.cursor() as cursor:
+        checks = {}
+        for name, query in CHECKS.items():
+            cursor.execute(query)
+            checks[name] = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT worker) FROM load_batches")
+        batches, batch_workers = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM stg_matches")
+        staged = cursor.fetchone()[0]
+    connection.close()
+
+    checks["matches_not_staged"] = generator.match_count - staged
+    match_fetches = sum(
+        counter["value"] for counter in metrics.to_dict()["counters"]
+        if counter["name"] == "api_requests" and counter["labels"].get("endpoint", "").endswith("/matches/{id}")
+        and counter["labels"].get("status") == 200
+    )
+    return {
+        "matches": generator.match_count,
+        "teams": len(generator.team_ids),
+        "workers": workers,
+        "transformers": transformers,
+        "load_seconds": round(load_seconds, 2),
+        "staged_matches": staged,
+        "load_batches": batches,
+        "workers_with_batches": batch_workers,
+        "match_fetches": match_fetches,
+        "transform_passes": len(passes),
+        "transform_errors": errors,
+        "checks": checks,
+    }
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(
+        description="Run concurrent loaders and transforms against the mock API and check for duplicates and lost rows")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent loader processes")
+    parser.add_argument("--transformers", type=int, default=2,
+                        help="Threads running the SQL steps in a loop, like overlapping ETL runs next to the loaders")
+    parser.add_argument("--matches", type=int, default=1000, help="Matches served by the mock")
+    parser.add_argument("--teams", type=int, default=24, help="Teams, all tracked by every worker")
+    parser.add_argument("--batch-teams", type=int, default=2, help="Teams claimed per load batch")
+    parser.add_argument("--copy-batch-size", type=int, default=20, help="Matches per staging commit")
+    parser.add_argument("--rate", type=float, default=60000, help="Client rate limit per worker, in requests per minute")
+    parser.add_argument("--seed", type=int, default=0, help="Generator and fault seed")
+    parser.add_argument("--database-url", default=BENCHMARK_DATABASE_URL,
+                        help="Scratch database; every table in it is dropped (default: BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--verbose", action="store_true", help="Show the loaders' output")
+    add_fault_args(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.database_url:
+        sys.exit("Set BENCHMARK_DATABASE_URL or pass --database-url with a scratch database")
+    if args.database_url == os.getenv("DATABASE_URL"):
+        sys.exit("Refusing to stress test against DATABASE_URL: the test drops every table in its database")
+
+    api_client.BACKOFF_SCALE = BACKOFF_SCALE
+    generator = DataGenerator(args.matches, seed=args.seed, team_count=args.teams)
+    server = start_server(generator, faults_from_args(args), seed=args.seed)
+    try:
+        print(f"🚀 {args.workers} loaders and {args.transformers} transform loops, "
+              f"{args.matches} matches of {args.teams} teams from {server.url}")
+        result = run_stress_test(args.database_url, server.url, generator, args.workers, args.transformers,
+                                 args.batch_teams, args.copy_batch_size, args.rate, args.verbose)
+    finally:
+        server.shutdown()
+        server.server_close()
+    result["server_responses"] = server.stats
+
+    print(json.dumps(result, indent=2, sort_keys=True))
+    failed = {name: value for name, value in result["checks"].items() if value}
+    if failed or result["transform_errors"]:
+        sys.exit(f"❌ Failed checks: {json.dumps(failed)}, {len(result['transform_errors'])} transform errors")
+    print(f"✅ {result['staged_matches']} matches loaded by {result['workers_with_batches']} workers "
+          f"in {result['load_batches']} batches, no duplicates or lost rows")
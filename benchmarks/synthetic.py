@@ -0,0 +1,296 @@
+# Standard library imports
+import time
+import random
+import argparse
+import json
+import sys
+
+# Configuration constants
+MATCH_ID_BASE = 7_000_000_000  # Synthetic match ids start here, in the range of recent real matches
+ACCOUNT_ID_BASE = 100_000  # First synthetic account id
+HERO_COUNT = 124  # Heroes in the current game
+ROSTER_SIZE = 7  # Five starters and two substitutes per team
+PATCH_DAYS = 90  # A new patch every three months
+HISTORY_DAYS = 730  # Matches are spread over the last two years by default
+UNPARSED_SHARE = 0.05  # Matches without replay data (version is null)
+ANONYMOUS_SHARE = 0.01  # Players with a private profile, whose account_id is null
+STANDIN_SHARE = 0.3  # Lineups with one starter replaced by a substitute
+
+ATTRIBUTES = ["str", "agi", "int", "all"]
+ROLES = ["Carry", "Support", "Nuker", "Disabler", "Jungler", "Durable", "Escape", "Pusher", "Initiator"]
+COUNTRIES = ["US", "DE", "SE", "RU", "UA", "CN", "PH", "PE", "BR", "DK", "FI", "MY"]
+
+
+class DataGenerator:
+    """
+    Deterministic OpenDota-shaped data for benchmarks and the mock API
+
+    Every match is generated from its own seeded random stream, so match(i) can
+    be produced on its own, in any order and any number of times, with the same
+    result. Team rosters, heroes and player profiles depend only on the seed.
+    Matches are spread evenly over `history_days` up to `end_time`, oldest first.
+    """
+
+    def __init__(self, match_count=1000, seed=0, team_count=None, end_time=None, history_days=HISTORY_DAYS):
+        self.match_count = match_count
+        self.seed = seed
+        self.team_count = team_count or max(8, min(5000, match_count // 200))
+        self.end_time = int(end_time or time.time())
+        self.start_time = self.end_time - history_days * 86400
+        self.team_ids = [1000 + i * 7 for i in range(self.team_count)]
+        self.team_index = {team_id: i for i, team_id in enumerate(self.team_ids)}
+        self._team_matches = None
+
+        rng = random.Random(f"{seed}:teams")
+        self.team_ratings = [rng.gauss(1500, 150) for _ in self.team_ids]
+
+    def _rng(self, *key):
+        return random.Random(":".join(str(part) for part in (self.seed,) + key))
+
+    # Heroes, teams and players
+
+    def heroes(self):
+        """Payload of /heroes"""
+        rng = self._rng("heroes")
+        return [
+            {
+                "id": hero_id,
+                "name": f"npc_dota_hero_{hero_id}",
+                "localized_name": f"Hero {hero_id}",
+                "primary_attr": rng.choice(ATTRIBUTES),
+                "attack_type": rng.choice(["Melee", "Ranged"]),
+                "roles": rng.sample(ROLES, rng.randint(1, 4)),
+                "legs": rng.choice([0, 2, 4, 6]),
+            }
+            for hero_id in range(1, HERO_COUNT + 1)
+        ]
+
+    def roster(self, team_id):
+        """Account ids of a team's players, starters first"""
+        base = ACCOUNT_ID_BASE + self.team_index[team_id] * ROSTER_SIZE
+        return list(range(base, base + ROSTER_SIZE))
+
+    def team(self, team_id):
+        """Payload of /teams/{team_id}, or None for an unknown team"""
+        if team_id not in self.team_index:
+            return None
+        index = self.team_index[team_id]
+        rng = self._rng("team", team_id)
+        return {
+            "team_id": team_id,
+            "rating": round(self.team_ratings[index], 2),
+            "wins": rng.randint(50, 500),
+            "losses": rng.randint(50, 500),
+            "last_match_time": self.end_time - rng.randint(0, 7 * 86400),
+            "name": f"Team {index}",
+            "tag": f"T{index}",
+            "logo_url": f"https://example.com/teams/{team_id}.png",
+        }
+
+    def teams(self):
+        """Payloads of /teams/{id} for every team"""
+        return [self.team(team_id) for team_id in self.team_ids]
+
+    def player(self, account_id):
+        """Payload of /players/{account_id}, or None for an account no team uses"""
+        index = account_id - ACCOUNT_ID_BASE
+        if not 0 <= index < self.team_count * ROSTER_SIZE:
+            return None
+        rng = self._rng("player", account_id)
+        team_id = self.team_ids[index // ROSTER_SIZE]
+        return {
+            "profile": {
+                "account_id": account_id,
+                "personaname": f"player{account_id}",
+                "name": f"Pro {account_id}",
+                "plus": rng.random() < 0.5,
+                "cheese": 0,
+                "steamid": str(76561197960265728 + account_id),
+                "avatar": f"https://example.com/avatars/{account_id}.jpg",
+                "profileurl": f"https://steamcommunity.com/profiles/{76561197960265728 + account_id}/",
+                "last_login": self.end_time - rng.randint(0, 30 * 86400),
+                "full_history_time": self.end_time - rng.randint(0, 365 * 86400),
+                "last_match_time": self.end_time,  # At or after every generated match of the player
+                "loccountrycode": rng.choice(COUNTRIES),
+                "is_contributor": False,
+                "is_subscriber": False,
+                "is_pro": True,
+                "team_id": team_id,
+            },
+            "rank_tier": 80,
+            "leaderboard_rank": rng.randint(1, 5000),
+        }
+
+    # Matches
+
+    def match_id(self, index):
+        return MATCH_ID_BASE + index
+
+    def _header(self, rng, index):
+        """Draws the fields shared by a match and its entries in the team match lists"""
+        radiant = rng.randrange(self.team_count)
+        dire = rng.randrange(self.team_count - 1)
+        dire += dire >= radiant
+        start_time = self.start_time + (self.end_time - self.start_time) * index // max(1, self.match_count)
+        rating_gap = self.team_ratings[dire] - self.team_ratings[radiant]
+        return {
+            "match_id": self.match_id(index),
+            "start_time": start_time,
+            "duration": int(rng.gauss(2400, 480)) if rng.random() > 0.002 else None,
+            "radiant_team_id": self.team_ids[radiant],
+            "dire_team_id": self.team_ids[dire],
+            "radiant_win": rng.random() < 1 / (1 + 10 ** (rating_gap / 400)),
+            "leagueid": 15000 + index % 40,
+        }
+
+    def match(self, match_id):
+        """Payload of /matches/{match_id}, or None for an unknown match"""
+        index = match_id - MATCH_ID_BASE
+        if not 0 <= index < self.match_count:
+            return None
+        rng = self._rng("match", index)
+        header = self._header(rng, index)
+        duration = header["duration"] or 0
+        minutes = duration // 60 + 1
+        parsed = rng.random() >= UNPARSED_SHARE
+
+        heroes = rng.sample(range(1, HERO_COUNT + 1), 10)
+        lineup = []
+        for team_id in (header["radiant_team_id"], header["dire_team_id"]):
+            roster = self.roster(team_id)
+            side = roster[:5]
+            if rng.random() < STANDIN_SHARE:
+                side[rng.randrange(5)] = rng.choice(roster[5:])
+            lineup += side
+
+        players = []
+        kills = {True: 0, False: 0}
+        for slot_index in range(10):
+            is_radiant = slot_index < 5
+            account_id = lineup[slot_index] if rng.random() >= ANONYMOUS_SHARE else None
+            player_kills = rng.randint(0, 15)
+            kills[is_radiant] += player_kills
+            gold_per_minute = rng.randint(250, 800)
+            xp_per_minute = rng.randint(300, 900)
+            players.append({
+                "match_id": header["match_id"],
+                "player_slot": slot_index if is_radiant else 128 + slot_index - 5,
+                "account_id": account_id,
+                "hero_id": heroes[slot_index],
+                "kills": player_kills,
+                "deaths": rng.randint(0, 12),
+                "assists": rng.randint(0, 25),
+                "last_hits": rng.randint(20, 600),
+                "denies": rng.randint(0, 30),
+                "gold_per_min": gold_per_minute,
+                "xp_per_min": xp_per_minute,
+                "total_gold": gold_per_minute * duration // 60,
+                "total_xp": xp_per_minute * duration // 60,
+                "level": rng.randint(12, 30),
+                "hero_damage": rng.randint(3000, 60000),
+                "tower_damage": rng.randint(0, 15000),
+                "hero_healing": rng.randint(0, 8000),
+                "tower_kills": rng.randint(0, 4),
+                "ancient_kills": rng.randint(0, 20),
+                "roshan_kills": rng.randint(0, 1),
+                "actions_per_min": rng.randint(100, 350),
+                **{f"item_{slot}": rng.randint(0, 250) for slot in range(6)},
+                "personaname": None if account_id is None else f"player{account_id}",
+                "name": None if account_id is None else f"Pro {account_id}",
+                "isRadiant": is_radiant,
+                "gold_t": [gold_per_minute * minute for minute in range(minutes)] if parsed else None,
+                "xp_t": [xp_per_minute * minute for minute in range(minutes)] if parsed else None,
+                "lh_t": [minute * 5 for minute in range(minutes)] if parsed else None,
+                "purchase_log": [
+                    {"time": rng.randint(-90, duration), "key": f"item_{rng.randint(1, 250)}"}
+                    for _ in range(rng.randint(15, 35))
+                ] if parsed else None,
+            })
+
+        match = dict(header)
+        match.update({
+            "game_mode": 2,
+            "lobby_type": 1,
+            "cluster": rng.choice([121, 122, 133, 151, 181]),
+            "first_blood_time": rng.randint(0, 300),
+            "teamfights": [
+                {"start": start, "end": start + rng.randint(10, 40), "deaths": rng.randint(1, 7)}
+                for start in sorted(rng.randint(300, max(301, duration)) for _ in range(rng.randint(5, 30)))
+            ] if parsed else None,
+            "version": 21 if parsed else None,
+            "patch": 50 + (header["start_time"] - self.start_time) // (PATCH_DAYS * 86400),
+            "radiant_score": kills[True],
+            "dire_score": kills[False],
+            "tower_status_radiant": rng.randint(0, 2047),
+            "tower_status_dire": rng.randint(0, 2047),
+            "barracks_status_radiant": rng.randint(0, 63),
+            "barracks_status_dire": rng.randint(0, 63),
+            "radiant_gold_adv": [rng.randint(-20000, 20000) for _ in range(minutes)] if parsed else None,
+            "radiant_xp_adv": [rng.randint(-20000, 20000) for _ in range(minutes)] if parsed else None,
+            "radiant_team": {"team_id": header["radiant_team_id"], "name": f"Team {self.team_index[header['radiant_team_id']]}"},
+            "dire_team": {"team_id": header["dire_team_id"], "name": f"Team {self.team_index[header['dire_team_id']]}"},
+            "chat": [{"time": rng.randint(0, duration), "type": "chat", "key": "gg", "slot": rng.randint(0, 9)}
+                     for _ in range(rng.randint(0, 20))] if parsed else None,
+            "players": players,
+        })
+        return match
+
+    def matches(self, start=0, stop=None):
+        """Yields match payloads for indexes start..stop-1 (all matches by default), oldest first"""
+        for index in range(start, self.match_count if stop is None else stop):
+            yield self.match(self.match_id(index))
+
+    def team_matches(self, team_id):
+        """Payload of /teams/{team_id}/matches: the team's matches, newest first"""
+        if self._team_matches is None:
+            # Only match indexes are kept per team; entries are rebuilt on request
+            by_team = {team: [] for team in self.team_ids}
+            for index in range(self.match_count):
+                header = self._header(self._rng("match", index), index)
+                by_team[header["radiant_team_id"]].append(index)
+                by_team[header["dire_team_id"]].append(index)
+            self._team_matches = by_team
+
+        entries = []
+        for index in reversed(self._team_matches.get(team_id, [])):
+            header = self._header(self._rng("match", index), index)
+            is_radiant = header["radiant_team_id"] == team_id
+            opponent_id = header["dire_team_id"] if is_radiant else header["radiant_team_id"]
+            entries.append({
+                "match_id": header["match_id"],
+                "radiant_win": header["radiant_win"],
+                "radiant": is_radiant,
+                "duration": header["duration"],
+                "start_time": header["start_time"],
+                "leagueid": header["leagueid"],
+                "league_name": f"League {header['leagueid']}",
+                "cluster": 121,
+                "opposing_team_id": opponent_id,
+                "opposing_team_name": f"Team {self.team_index[opponent_id]}",
+                "opposing_team_logo": f"https://example.com/teams/{opponent_id}.png",
+            })
+        return entries
+
+    def pro_matches(self, limit=100):
+        """Payload of /proMatches: the newest matches"""
+        return [
+            {key: match[key] for key in ("match_id", "start_time", "duration", "radiant_team_id",
+                                         "dire_team_id", "radiant_win", "leagueid")}
+            for match in self.matches(max(0, self.match_count - limit))
+        ][::-1]
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Write synthetic OpenDota match payloads as JSON lines")
+    parser.add_argument("--matches", type=int, default=1000, help="Number of matches to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed; the same seed yields the same data")
+    parser.add_argument("--teams", type=int, help="Number of teams (default: matches / 200, at least 8)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generator = DataGenerator(args.matches, seed=args.seed, team_count=args.teams)
+    for match in generator.matches():
+        sys.stdout.write(json.dumps(match, separators=(",", ":")) + "\n")
@@ -0,0 +1,362 @@
+# Standard library imports
+import os
+import re
+import json
+import time
+import hashlib
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Third party imports
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Local imports
+from data_pipeline.metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+API_KEY = os.getenv("DOTA2_API_KEY")  # Optional API key for higher rate limits
+
+# Requests per minute allowed by OpenDota for each API key tier
+RATE_LIMITS = {
+    "free": 60,
+    "premium": 1200,
+}
+
+# Configuration constants
+API_TIER = os.getenv("OPENDOTA_API_TIER", "premium" if API_KEY else "free")
+if API_TIER not in RATE_LIMITS:
+    raise ValueError(f"Unknown OPENDOTA_API_TIER {API_TIER!r}, expected one of: {', '.join(RATE_LIMITS)}")
+RATE_LIMIT_PER_MINUTE = float(os.getenv("API_RATE_LIMIT", RATE_LIMITS[API_TIER]))  # Override for custom quotas
+RATE_LIMIT_BURST = int(os.getenv("API_RATE_BURST", "1"))  # Requests allowed back-to-back before throttling
+RATE_LIMIT_BACKOFF = 0.8  # Rate multiplier applied when the API answers 429 anyway
+RATE_LIMIT_RECOVERY = 0.0005  # Share of the configured rate regained per request after a 429
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))  # Concurrent API requests in flight
+FETCH_IN_FLIGHT = int(os.getenv("FETCH_IN_FLIGHT", str(FETCH_WORKERS * 2)))  # Results buffered ahead of the consumer
+RETRY_ATTEMPTS = int(os.getenv("API_RETRY_ATTEMPTS", "5"))  # Number of attempts for failed API calls
+BACKOFF_FACTOR = 2  # Exponential backoff multiplier between retries
+BACKOFF_SCALE = float(os.getenv("API_BACKOFF_SCALE", "1"))  # Multiplies retry delays, e.g. 0.01 against a local mock
+MAX_RETRY_AFTER = 300  # Longest Retry-After delay honoured, in seconds
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}  # Rate limiting and transient server errors
+CACHE_ENABLED = os.getenv("API_CACHE", "true").lower() == "true"
+CACHE_DIR = os.getenv("API_CACHE_DIR", ".cache/opendota")  # On-disk response cache location
+TEAM_CACHE_TTL = int(os.getenv("TEAM_CACHE_TTL", "86400"))  # Seconds before /teams/{id} is revalidated
+PLAYER_CACHE_TTL = int(os.getenv("PLAYER_CACHE_TTL", "86400"))  # Seconds before /players/{id} is revalidated
+HEROES_CACHE_TTL = int(os.getenv("HEROES_CACHE_TTL", "604800"))  # Heroes only change with game patches
+UNPARSED_MATCH_TTL = 3600  # Unparsed matches gain replay data later, so they are not final yet
+
+# Cache lifetime per endpoint: None caches forever, 0 always revalidates
+CACHE_POLICIES = [
+    (re.compile(r"/matches/\d+$"), None),
+    (re.compile(r"/teams/\d+/matches$"), 0),
+    (re.compile(r"/teams/\d+$"), TEAM_CACHE_TTL),
+    (re.compile(r"/players/\d+$"), PLAYER_CACHE_TTL),
+    (re.compile(r"/heroes$"), HEROES_CACHE_TTL),
+]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to keep every API request under the account quota
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each request
+    takes one token and blocks until one is available, so any number of worker
+    threads sharing the bucket never exceed `capacity + rate * t` requests in `t` seconds.
+    When the API still refuses requests, throttle() lowers the rate and every
+    request after it regains a little, so the bucket settles just under the real quota.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.paused_seconds = 0.0  # Total time callers were held back by pause()
+        self.lock = threading.Lock()
+
+    def throttle(self, factor=RATE_LIMIT_BACKOFF):
+        """Lowers the rate after the API answered 429 Too Many Requests"""
+        with self.lock:
+            self.rate = max(self.max_rate * 0.1, self.rate * factor)
+
+    def pause(self, seconds):
+        """Holds back every caller for `seconds`, e.g. after the API answered 429 Too Many Requests"""
+        with self.lock:
+            now = time.monotonic()
+            resume_at = now + seconds
+            if resume_at > self.paused_until:
+                self.paused_seconds += resume_at - max(now, self.paused_until)
+                # No tokens accrue while paused, so callers resume at the normal rate instead of a burst
+                self.paused_until = resume_at
+                self.updated_at = resume_at
+                self.tokens = 0.0
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait_time = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_LIMIT_RECOVERY)
+                        return
+                    wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class ResponseCache:
+    """
+    On-disk cache of API responses keyed by URL
+
+    Each entry stores the decoded body together with the ETag/Last-Modified
+    validators, so stale entries can be revalidated with a conditional request
+    instead of being downloaded again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, url):
+        """Returns the cached entry for a URL, or None if it was never stored"""
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        """Writes an entry atomically so concurrent readers never see partial files"""
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+def endpoint_label(url):
+    """Collapses ids in a URL path so metrics group requests by endpoint, e.g. /teams/{id}/matches"""
+    path = url.split("://", 1)[-1].split("?", 1)[0]
+    return re.sub(r"/\d+", "/{id}", path[path.find("/"):] if "/" in path else "/")
+
+
+def cache_ttl(url, body=None):
+    """
+    Returns how long a response for this URL may be served without revalidation
+
+    Args:
+        url (str): The API endpoint URL
+        body (dict/list): Decoded response, used to tell parsed matches from unparsed ones
+
+    Returns:
+        int/None/bool: TTL in seconds, None to cache forever, False if the URL is not cacheable
+    """
+    for pattern, ttl in CACHE_POLICIES:
+        if pattern.search(url):
+            if ttl is None and isinstance(body, dict) and body.get("version") is None:
+                return UNPARSED_MATCH_TTL
+            return ttl
+    return False
+
+
+def is_fresh(entry):
+    """Checks whether a cached entry can be served without contacting the API"""
+    ttl = entry.get("ttl")
+    return ttl is None or time.time() - entry["fetched_at"] < ttl
+
+
+def parse_retry_after(value):
+    """
+    Reads a Retry-After header, given either in seconds or as an HTTP date
+
+    Returns:
+        float/None: Seconds to wait, capped at MAX_RETRY_AFTER, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with random jitter before retry number `attempt`"""
+    return (BACKOFF_FACTOR ** attempt + random.uniform(5, 10)) * BACKOFF_SCALE
+
+
+def create_session(pool_size=FETCH_WORKERS):
+    """Creates an HTTP session that keeps connections to the API alive across requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if API_KEY:
+        session.headers["Authorization"] = f"Bearer {API_KEY}"
+    return session
+
+
+# Shared limiter, connection pool and cache for every request made by this process
+rate_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE / 60, RATE_LIMIT_BURST)
+session = create_session()
+response_cache = ResponseCache(CACHE_DIR) if CACHE_ENABLED else None
+
+
+def request_with_retries(url, revalidate=False):
+    """
+    Makes an HTTP GET request to the OpenDota API with retry logic
+    Fresh cached responses are returned without a request; stale ones are
+    revalidated with If-None-Match/If-Modified-Since. Every network attempt
+    waits for a token from the shared rate limiter first
+
+    Timeouts, 429 and 5xx responses, dropped connections and truncated or
+    invalid JSON bodies are retried with exponential backoff, or after the
+    Retry-After delay when the API sends one. A 429 pauses the shared rate
+    limiter and lowers its rate, so all workers back off together. Other
+    errors are not retried
+
+    Args:
+        url (str): The API endpoint URL
+        revalidate (bool): Revalidate a cached response even if it is still fresh,
+            when the caller knows it may be outdated
+
+    Returns:
+        dict/None: JSON response if successful, None if all retries fail
+    """
+    endpoint = endpoint_label(url)
+    cacheable = response_cache is not None and cache_ttl(url) is not False
+    cached = response_cache.get(url) if cacheable else None
+
+    if cached and not revalidate and is_fresh(cached):
+        metrics.inc("api_cache_hits", endpoint=endpoint)
+        return cached["body"]
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        retry_after = None
+        try:
+            rate_limiter.acquire()
+            metrics.inc("api_attempts", endpoint=endpoint)
+            request_start = time.time()
+            response = session.get(url, headers=headers, timeout=30)
+            metrics.observe("api_request_seconds", time.time() - request_start, endpoint=endpoint)
+            metrics.inc("api_requests", endpoint=endpoint, status=response.status_code)
+            metrics.inc("api_bytes_fetched", len(response.content), endpoint=endpoint)
+
+            if response.status_code == 304 and cached:
+                metrics.inc("api_cache_revalidations", endpoint=endpoint)
+                cached["fetched_at"] = time.time()
+                response_cache.put(url, cached)
+                return cached["body"]
+
+            if response.status_code in RETRYABLE_STATUSES:
+                reason = f"HTTP {response.status_code}"
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            else:
+                response.raise_for_status()
+                data = response.json()
+                if cacheable:
+                    metrics.inc("api_cache_misses", endpoint=endpoint)
+                    response_cache.put(url, {
+                        "url": url,
+                        "fetched_at": time.time(),
+                        "ttl": cache_ttl(url, data),
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "body": data,
+                    })
+                return data
+        except requests.exceptions.Timeout:
+            metrics.inc("api_timeouts", endpoint=endpoint)
+            reason = "Timeout"
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, ValueError) as e:
+            # Dropped connections and truncated or malformed bodies are worth another try
+            metrics.inc("api_invalid_responses", endpoint=endpoint)
+            reason = type(e).__name__
+        except requests.exceptions.RequestException as e:
+            # Other client errors, e.g. 404 for an unknown id, fail the same way on every attempt
+            metrics.inc("api_errors", endpoint=endpoint)
+            print(f"Request failed: {e}")
+            return None
+
+        if attempt == RETRY_ATTEMPTS:
+            metrics.inc("api_failures", endpoint=endpoint)
+            print(f"🚨 {reason} for {url} after {attempt} attempts, skipping request.")
+            return None
+
+        metrics.inc("api_retries", endpoint=endpoint, reason=reason)
+        sleep_time = backoff_delay(attempt) if retry_after is None else retry_after
+        print(f"⏳ {reason} for {url}. Retrying {attempt}/{RETRY_ATTEMPTS - 1} in {sleep_time:.2f}s...")
+        if reason == "HTTP 429":
+            # The quota is shared, so every worker waits, not just the one that was refused
+            metrics.inc("api_rate_limited", endpoint=endpoint)
+            rate_limiter.throttle()
+            rate_limiter.pause(sleep_time)
+        else:
+            time.sleep(sleep_time)
+    return None
+
+
+_NO_KEY = object()  # Sentinel marking the end of the keys iterator
+
+
+def fetch_concurrently(fetch, keys, max_workers=FETCH_WORKERS, max_in_flight=FETCH_IN_FLIGHT):
+    """
+    Runs `fetch(key)` for every key on a thread pool and yields results as they complete
+    Throughput is bounded by the shared rate limiter, not by the number of workers.
+    At most `max_in_flight` keys are submitted but not yet consumed, so a slow
+    consumer (e.g. the database writer) holds back fetching instead of letting
+    finished responses pile up in memory
+
+    Args:
+        fetch (callable): Function taking a single key, e.g. get_match_details
+        keys (iterable): Keys to fetch (match ids, team ids, account ids), consumed lazily
+        max_workers (int): Number of requests allowed in flight at once
+        max_in_flight (int): Number of submitted results allowed to wait for the consumer
+
+    Yields:
+        tuple: (key, result) pairs in completion order
+    """
+    keys = iter(keys)
+    max_in_flight = max(max_in_flight, max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < max_in_flight:
+                key = next(keys, _NO_KEY)
+                exhausted = key is _NO_KEY
+                if not exhausted:
+                    futures[executor.submit(fetch, key)] = key
+            if not futures:
+                return
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures.pop(future), future.result()
@@ -0,0 +1,146 @@
+# Standard library imports
+import os
+import time
+
+# Third party imports
+from dotenv import load_dotenv
+
+# Local imports
+from data_pipeline import fetch_data
+from data_pipeline.api_client import fetch_concurrently
+from data_pipeline.metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+ENRICH_PLAYERS = os.getenv("ENRICH_PLAYERS", "true").lower() == "true"  # Set to false to keep stub profiles
+
+# Players in newly staged matches whose profile is missing, a stub, or older than
+# their latest match. dim_players.last_match_time is only set by full profiles
+STALE_PLAYERS_QUERY = """
+    SELECT p.account_id, d.last_match_time IS NOT NULL AS has_profile
+    FROM stg_match_players p
+    JOIN stg_matches m ON m.match_id = p.match_id
+    LEFT JOIN dim_players d ON d.account_id = p.account_id
+    WHERE m.stg_seq > %(from_seq)s AND m.stg_seq <= %(to_seq)s
+      AND p.account_id IS NOT NULL AND p.account_id NOT IN (0, %(anonymous)s)
+    GROUP BY p.account_id, d.last_match_time
+    HAVING d.last_match_time IS NULL OR TO_TIMESTAMP(MAX(m.start_time)) > d.last_match_time
+    ORDER BY p.account_id
+"""
+
+
+def get_batch(cursor):
+    """
+    Returns the stg_seq range staged since the last enrichment
+    The upper bound is read under the exclusive STAGING_LOCK, so every match
+    below it has committed; the caller's commit releases the lock
+
+    Returns:
+        tuple: (from_seq, to_seq)
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s);", fetch_data.STAGING_LOCK)
+    cursor.execute("""
+        INSERT INTO etl_watermarks (step_name) VALUES ('enrich_players') ON CONFLICT (step_name) DO NOTHING;
+        SELECT w.last_stg_seq, COALESCE((SELECT MAX(stg_seq) FROM stg_matches), w.last_stg_seq)
+        FROM etl_watermarks w
+        WHERE w.step_name = 'enrich_players';
+    """)
+    return cursor.fetchone()
+
+
+def get_stale_players(cursor, from_seq, to_seq):
+    """
+    Finds the players whose profile needs fetching
+
+    Returns:
+        list: (account_id, has_profile) pairs; players with a profile are
+            revalidated, so an unchanged profile costs a 304 and no download
+    """
+    cursor.execute(STALE_PLAYERS_QUERY, {
+        "from_seq": from_seq,
+        "to_seq": to_seq,
+        "anonymous": fetch_data.ANONYMOUS_ACCOUNT_ID,
+    })
+    return cursor.fetchall()
+
+
+def iter_profiles(players):
+    """
+    Fetches player profiles concurrently under the shared rate limit
+
+    Args:
+        players (list): (account_id, has_profile) pairs from get_stale_players
+
+    Yields:
+        dict: Full profiles as returned by the API
+    """
+    revalidate = {account_id for account_id, has_profile in players if has_profile}
+    fetch = lambda account_id: fetch_data.get_player_info(account_id, revalidate=account_id in revalidate)
+    for account_id, player in fetch_concurrently(fetch, [account_id for account_id, _ in players]):
+        if not player or not (player.get("profile") or {}).get("account_id"):
+            metrics.inc("players_enrichment_failed")
+            print(f"⚠️ No profile for player {account_id}, keeping the stored one.")
+            continue
+        yield player
+
+
+def enrich_players():
+    """
+    Replaces the stub or outdated profiles of players seen in matches staged
+    since the last run with full /players/{id} profiles. Players are only
+    fetched when they have no full profile yet or played after its
+    last_match_time, so each new or changed player costs one API call
+
+    Returns:
+        int: Number of profiles inserted or updated in stg_players
+    """
+    connection = fetch_data.get_connection()
+    with connection.cursor() as cursor:
+        from_seq, to_seq = get_batch(cursor)
+        players = get_stale_players(cursor, from_seq, to_seq)
+    connection.commit()
+
+    known = sum(1 for _, has_profile in players if has_profile)
+    print(f"👤 {len(players)} players to enrich: {len(players) - known} without a profile, {known} outdated")
+    stored = fetch_data.store_unique_players(iter_profiles(players)) if players else 0
+    metrics.inc("players_enriched", stored)
+
+    # Only this run's batch is marked done; a concurrent run that got there first wins
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE etl_watermarks SET last_stg_seq = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE step_name = 'enrich_players' AND last_stg_seq = %s;
+        """, (to_seq, from_seq))
+    connection.commit()
+    return stored
+
+
+def run(connection=None, fetch_config=None):
+    """
+    Runs the player enrichment step
+
+    Args:
+        connection: Open psycopg2 connection to use, e.g. from run_etl's pool.
+            When omitted, a connection to DATABASE_URL is opened and closed here
+        fetch_config (FetchConfig): API and database settings, FetchConfig.from_env() by default
+    """
+    if not ENRICH_PLAYERS:
+        print("⏭️ ENRICH_PLAYERS is false, skipping player enrichment")
+        return
+
+    fetch_data.config = fetch_config or fetch_data.FetchConfig.from_env()
+    fetch_data._connection = connection
+    try:
+        start_time = time.time()
+        stored = enrich_players()
+        print(f"✅ Enriched {stored} player profiles in {time.time() - start_time:.2f}s")
+    finally:
+        if connection is None and fetch_data._connection is not None:
+            fetch_data._connection.close()
+        elif connection is not None and not connection.closed:
+            connection.rollback()
+        fetch_data._connection = None
+
+
+if __name__ == "__main__":
+    run()
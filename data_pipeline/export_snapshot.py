@@ -0,0 +1,219 @@
+# Standard library imports
+import os
+import sys
+import json
+import time
+import shutil
+
+# Third party imports
+from dotenv import load_dotenv
+import psycopg2
+
+try:
+    import pyarrow as pa  # Columnar snapshots, see requirements-analytics.txt
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Local imports
+from data_pipeline.fetch_data import PARTITION_LOCK
+from data_pipeline.metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR")  # Where the snapshot is written, unset to skip the export
+EXPORT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "50000"))  # Rows fetched and written per batch
+
+# UTC month of a match, e.g. 2024-05, used with the patch to partition the fact tables
+MONTH = "to_char(to_timestamp({}) AT TIME ZONE 'UTC', 'YYYY-MM')"
+
+# (directory, query, partition columns) for every exported table
+SNAPSHOT_TABLES = [
+    ("dim_teams", "SELECT * FROM dim_teams", []),
+    ("dim_players", "SELECT * FROM dim_players", []),
+    ("dim_heroes", "SELECT * FROM dim_heroes", []),
+    (
+        "fact_matches",
+        f"SELECT m.*, {MONTH.format('m.start_time')} AS month FROM fact_matches m",
+        ["patch", "month"],
+    ),
+    (
+        "fact_team_match_stats",
+        f"""SELECT tm.*, m.patch, {MONTH.format('tm.start_time')} AS month
+        FROM fact_team_match_stats tm
+        LEFT JOIN fact_matches m ON m.match_id = tm.match_id AND m.start_time = tm.start_time""",
+        ["patch", "month"],
+    ),
+    (
+        "fact_player_match_stats",
+        f"""SELECT pm.*, m.patch, {MONTH.format('pm.start_time')} AS month
+        FROM fact_player_match_stats pm
+        LEFT JOIN fact_matches m ON m.match_id = pm.match_id AND m.start_time = pm.start_time""",
+        ["patch", "month"],
+    ),
+]
+
+# Arrow type for each PostgreSQL type oid in the exported tables; other types are exported as text
+ARROW_TYPES = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float",
+    701: "double",
+    25: "string",
+    1042: "string",
+    1043: "string",
+    1082: "date32",
+    1114: "timestamp[us]",
+}
+
+
+def arrow_schema(description):
+    """Builds the Arrow schema of a query result from its cursor description"""
+    return pa.schema([
+        (column.name, pa.type_for_alias(ARROW_TYPES.get(column.type_code, "string")))
+        for column in description
+    ])
+
+
+def record_batch(rows, schema):
+    """Converts fetched rows to an Arrow record batch, column by column"""
+    columns = list(zip(*rows))
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_string(field.type):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_table(connection, name, query, partition_by, target_dir, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Streams one query result into a Parquet dataset, hive-partitioned when
+    partition columns are given (e.g. fact_matches/patch=56/month=2024-05/)
+
+    Args:
+        connection: Open database connection, inside the snapshot transaction
+        name (str): Dataset directory name
+        query (str): Query producing the rows
+        partition_by (list): Partition columns, empty for a single unpartitioned dataset
+        target_dir (str): Snapshot directory
+        batch_size (int): Rows fetched and converted at a time
+
+    Returns:
+        int: Number of rows exported
+    """
+    path = os.path.join(target_dir, name)
+    exported = 0
+
+    with connection.cursor(name=f"snapshot_{name}") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query)
+        rows = cursor.fetchmany(batch_size)
+        schema = arrow_schema(cursor.description)
+
+        def batches(rows):
+            nonlocal exported
+            while rows:
+                exported += len(rows)
+                yield record_batch(rows, schema)
+                rows = cursor.fetchmany(batch_size)
+
+        if not rows:
+            # Keep an empty file, so readers still find the table and its schema
+            os.makedirs(path, exist_ok=True)
+            pq.write_table(schema.empty_table(), os.path.join(path, "part-0.parquet"))
+        else:
+            pads.write_dataset(
+                batches(rows),
+                path,
+                schema=schema,
+                format="parquet",
+                partitioning=partition_by or None,
+                partitioning_flavor="hive" if partition_by else None,
+                basename_template="part-{i}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+
+    metrics.inc("snapshot_rows_exported", exported, table=name)
+    return exported
+
+
+def export_snapshot(connection, snapshot_dir):
+    """
+    Writes every table in SNAPSHOT_TABLES to `snapshot_dir` from one consistent
+    read-only transaction. The snapshot is built next to the target and swapped
+    in when complete, so readers never see a half-written snapshot
+
+    Args:
+        connection: Open database connection without a transaction in progress
+        snapshot_dir (str): Directory the snapshot replaces
+
+    Returns:
+        dict: Rows exported per table
+    """
+    tmp_dir = f"{snapshot_dir}.tmp"
+    old_dir = f"{snapshot_dir}.old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    connection.rollback()
+    cursor = connection.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    # Reads the fact tables one after the other, so partition DDL must wait for the whole export
+    cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, %s);", PARTITION_LOCK)
+
+    exported = {}
+    for name, query, partition_by in SNAPSHOT_TABLES:
+        start_time = time.time()
+        exported[name] = export_table(connection, name, query, partition_by, tmp_dir)
+        print(f"📦 Exported {exported[name]} rows of {name} in {time.time() - start_time:.2f}s")
+    connection.rollback()
+
+    with open(os.path.join(tmp_dir, "snapshot.json"), "w", encoding="utf-8") as f:
+        json.dump({"exported_at": time.time(), "rows": exported}, f, indent=2)
+
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(snapshot_dir):
+        os.replace(snapshot_dir, old_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return exported
+
+
+def run(connection=None, snapshot_dir=None):
+    """
+    Exports the analytics snapshot read by analytics.queries
+
+    Args:
+        connection: Open psycopg2 connection to use, e.g. from run_etl's pool.
+            When omitted, a connection to DATABASE_URL is opened and closed here
+        snapshot_dir (str): Target directory, defaults to ANALYTICS_SNAPSHOT_DIR
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    if not snapshot_dir:
+        print("⏭️ ANALYTICS_SNAPSHOT_DIR is not set, skipping the snapshot export")
+        return
+    if pa is None:
+        raise RuntimeError("Snapshot export needs pyarrow: pip install -r requirements-analytics.txt")
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = psycopg2.connect(os.getenv("DATABASE_URL"))
+
+    try:
+        start_time = time.time()
+        exported = export_snapshot(connection, snapshot_dir)
+        print(f"✅ Snapshot of {sum(exported.values())} rows written to {snapshot_dir} "
+              f"in {time.time() - start_time:.2f}s")
+    finally:
+        if owns_connection:
+            connection.close()
+        else:
+            connection.rollback()
+
+
+if __name__ == "__main__":
+    run(snapshot_dir=sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,25 +1,94 @@
 # Standard library imports
-import requests
+import io
 import os
 import json
 import time
-import random
-import sys
+import socket
+import multiprocessing
+import zlib
+from dataclasses import dataclass, replace
+from typing import Optional
 
 # Third party imports
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import execute_values
+
+try:
+    import orjson  # Fast JSON encoder for bulk loads
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # Compression of the raw match archive
+except ImportError:
+    zstandard = None
+
+# Local imports
+from data_pipeline import api_client
+from data_pipeline.api_client import request_with_retries, fetch_concurrently
+from data_pipeline.metrics import metrics
 
 # Load environment variables from .env file
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")  # PostgreSQL connection string
-API_BASE_URL = os.getenv("OPENDOTA_API_BASE_URL")  # OpenDota API base URL
-API_KEY = os.getenv("DOTA2_API_KEY")  # Optional API key for higher rate limits
 
-# Establish database connection
-conn = psycopg2.connect(DATABASE_URL)
-cursor = conn.cursor()
+
+@dataclass
+class FetchConfig:
+    """Settings for one fetch run; from_env() reads them from the environment"""
+    database_url: Optional[str] = None  # PostgreSQL connection string
+    api_base_url: Optional[str] = None  # OpenDota API base URL
+    team_ids: str = "2163"  # Comma-separated team ids, or "discover" for teams in recent /proMatches
+    load_oldest: bool = False  # Load the oldest listed matches first
+    match_limit: Optional[int] = None  # New matches per team per run, None for 50 on an initial load and 3 after
+    match_history_depth: int = 100  # How far back to look in match history
+    shard_count: int = 1  # Number of hosts splitting the tracked teams
+    shard_index: int = 0  # This host's shard, 0 <= shard_index < shard_count
+    ingest_processes: int = 1  # Worker processes on this host, each owning a sub-shard
+    backfill: bool = False  # Walk each team's full history instead of the newest matches
+    backfill_page_size: int = 100  # Matches fetched and committed per checkpoint
+    backfill_max_pages: int = 0  # Pages per team per run, 0 for no limit
+    copy_batch_size: int = 200  # Rows per COPY round trip and commit
+    batch_teams: int = 10  # Teams claimed per load batch, so parallel workers share the tracked teams
+
+    @classmethod
+    def from_env(cls):
+        """Builds the configuration from environment variables (and .env)"""
+        match_limit = os.getenv("MATCH_LIMIT")
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            api_base_url=os.getenv("OPENDOTA_API_BASE_URL"),
+            team_ids=os.getenv("TEAM_IDS", "2163"),
+            load_oldest=os.getenv("LOAD_OLDEST", "false").lower() == "true",
+            match_limit=int(match_limit) if match_limit else None,
+            shard_count=int(os.getenv("SHARD_COUNT", "1")),
+            shard_index=int(os.getenv("SHARD_INDEX", "0")),
+            ingest_processes=int(os.getenv("INGEST_PROCESSES", "1")),
+            backfill=os.getenv("BACKFILL", "false").lower() == "true",
+            backfill_page_size=int(os.getenv("BACKFILL_PAGE_SIZE", "100")),
+            backfill_max_pages=int(os.getenv("BACKFILL_MAX_PAGES", "0")),
+            copy_batch_size=int(os.getenv("COPY_BATCH_SIZE", "200")),
+            batch_teams=int(os.getenv("LOAD_BATCH_TEAMS", "10")),
+        )
+
+
+# Active configuration and database connection. Nothing connects at import time:
+# the connection is opened on first use, or supplied by the caller of run()
+config = FetchConfig.from_env()
+_connection = None
+load_batch_id = None  # load_batches row of the batch being staged, written to stg_matches.load_batch_id
+
+# Advisory locks shared by concurrent loaders and transforms, as (namespace, id)
+# keys of the two-key pg_advisory_* functions
+STAGING_LOCK = (1, 0)  # Shared by staging writes; exclusive while a step fixes its stg_seq upper bound
+TEAM_LOCK_NAMESPACE = 2  # (2, team_id) is held by the worker loading a team
+PARTITION_LOCK = (3, 0)  # Exclusive around partition DDL; shared by transactions using the fact tables
+
+def get_connection():
+    """Returns the loader's database connection, connecting on first use"""
+    global _connection
+    if _connection is None or _connection.closed:
+        _connection = psycopg2.connect(config.database_url)
+    return _connection
 
 def is_initial_load():
     """
@@ -27,6 +96,7 @@ def is_initial_load():
     Returns:
         bool: True if this is an initial load (table doesn't exist or is empty), False otherwise
     """
+    cursor = get_connection().cursor()
     try:
         # Check if fact_matches table exists and has any rows
         cursor.execute("""
@@ -52,83 +122,314 @@ def is_initial_load():
         print(f"⚠️ Error checking table state: {e} - defaulting to initial load")
         return True
 
-# Configuration constants
-INITIAL_LOAD = is_initial_load()  # Auto-detect if this is initial load
-LOAD_OLDEST = os.getenv("LOAD_OLDEST", "false").lower() == "true"
-MATCH_LIMIT = int(os.getenv("MATCH_LIMIT", "50" if INITIAL_LOAD else "3"))  # Get from env or use default based on INITIAL_LOAD
-MATCH_HISTORY_DEPTH = 100  # How far back to look in match history
-RETRY_ATTEMPTS = 3  # Number of retry attempts for failed API calls
-BACKOFF_FACTOR = 2  # Exponential backoff multiplier between retries
-api_calls = 0  # Counter to track total API calls made
+ANONYMOUS_ACCOUNT_ID = 4294967295  # account_id reported for players hiding their profile
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zstd" if zstandard is not None else "zlib")  # Codec of stg_matches.raw_archive
+ARCHIVE_LEVELS = {"zstd": 3, "zlib": 6}  # Compression level per codec
+
+# Nested match fields kept in the slim stg_matches.raw_json. Other lists and objects
+# (players, per-minute series, logs, chat, teamfights) are only kept in the compressed
+# archive; the player fields the transforms use are normalized into stg_match_players
+SLIM_MATCH_FIELDS = {"radiant_team", "dire_team"}
+
+# Key column and key extractor used to deduplicate each staging table
+STAGING_KEYS = {
+    "stg_matches": ("match_id", lambda entry: entry.get("match_id")),
+    "stg_teams": ("team_id", lambda entry: entry.get("team_id")),
+    "stg_players": ("account_id", lambda entry: entry.get("profile", {}).get("account_id")),
+    "stg_heroes": ("hero_id", lambda entry: entry.get("id")),
+}
+
+# Typed match fields copied out of the API payload at ingest time (column name = API field)
+MATCH_COLUMNS = [
+    "start_time", "duration", "game_mode", "radiant_team_id", "dire_team_id",
+    "first_blood_time", "radiant_win", "version", "patch", "radiant_score", "dire_score",
+    "tower_status_radiant", "tower_status_dire", "barracks_status_radiant", "barracks_status_dire",
+]
+
+# Per-player fields normalized into stg_match_players (column name = API field)
+MATCH_PLAYER_COLUMNS = [
+    "player_slot", "account_id", "hero_id", "kills", "deaths", "assists",
+    "total_gold", "total_xp", "tower_kills", "ancient_kills", "roshan_kills",
+    "hero_damage", "actions_per_min", "item_0", "item_1", "item_2", "item_3", "item_4", "item_5",
+]
+
+# Columns written to each staging table with COPY, and the unique key used to skip duplicates
+STAGING_COLUMNS = {
+    "stg_matches": ["match_id", "raw_json", "raw_archive", "archive_codec"] + MATCH_COLUMNS + ["team_fights", "load_batch_id"],
+    "stg_match_players": ["match_id"] + MATCH_PLAYER_COLUMNS,
+    "stg_teams": ["team_id", "raw_json"],
+    "stg_players": ["account_id", "raw_json"],
+    "stg_heroes": ["hero_id", "raw_json"],
+}
+STAGING_CONFLICT_KEYS = {
+    "stg_matches": "match_id",
+    "stg_match_players": "match_id, player_slot",
+    "stg_teams": "team_id",
+    "stg_players": "account_id",
+    "stg_heroes": "hero_id",
+}
 
-def request_with_retries(url):
+def encode_json(entry):
+    """Serializes an API payload to compact UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(entry)
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def slim_match(match):
+    """Match payload without its lists and nested objects, except SLIM_MATCH_FIELDS"""
+    return {
+        key: value for key, value in match.items()
+        if key in SLIM_MATCH_FIELDS or not isinstance(value, (list, dict))
+    }
+
+def compress_payload(data, codec=None):
+    """Compresses an encoded payload for stg_matches.raw_archive with ARCHIVE_CODEC (zstd or zlib)"""
+    codec = codec or ARCHIVE_CODEC
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("ARCHIVE_CODEC=zstd needs the zstandard package: pip install zstandard")
+        return zstandard.ZstdCompressor(level=ARCHIVE_LEVELS["zstd"]).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, ARCHIVE_LEVELS["zlib"])
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+def decompress_payload(data, codec):
+    """Restores the encoded payload from stg_matches.raw_archive"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd archives needs the zstandard package: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+def copy_value(value):
+    """Formats one value for COPY text format (NULL, boolean, integer, encoded JSON or bytea)"""
+    if value is None:
+        return b"\\N"
+    if isinstance(value, bool):
+        return b"t" if value else b"f"
+    if isinstance(value, memoryview):
+        # bytea in hex format, with the backslash escaped for COPY
+        return b"\\\\x" + value.hex().encode("ascii")
+    if isinstance(value, bytes):
+        # JSON text never contains raw tabs or newlines, only backslashes need escaping
+        return value.replace(b"\\", b"\\\\")
+    return b"%d" % int(value)
+
+def player_stub(player):
+    """Minimal stg_players profile for a player seen in a match, or None for anonymous players"""
+    account_id = player.get("account_id")
+    if not account_id or account_id == ANONYMOUS_ACCOUNT_ID:
+        return None
+    personaname = player.get("personaname")
+    return {
+        "profile": {
+            "account_id": account_id,
+            "personaname": personaname or "Unknown",
+            "name": player.get("name") or personaname or "Unknown",
+        }
+    }
+
+def staging_rows(table_name, entry, key):
     """
-    Makes an HTTP GET request to the OpenDota API with retry logic
-    
+    Builds the COPY rows for one API entry
+    Matches are stored as a slim raw_json plus the compressed original payload.
+    They also produce one stg_match_players row per player and a stg_players
+    stub per known player, so players commit in the same batch as their match
+
+    Yields:
+        tuple: (table_name, list of column values in STAGING_COLUMNS order)
+    """
+    if table_name != "stg_matches":
+        yield table_name, [key, encode_json(entry)]
+        return
+
+    teamfights = entry.get("teamfights")
+    payload = encode_json(entry)
+    archive = compress_payload(payload)
+    metrics.inc("archive_payload_bytes", len(payload))
+    metrics.inc("archive_compressed_bytes", len(archive))
+    yield table_name, (
+        [key, encode_json(slim_match(entry)), memoryview(archive), ARCHIVE_CODEC.encode("ascii")]
+        + [entry.get(column) for column in MATCH_COLUMNS]
+        + [len(teamfights) if isinstance(teamfights, list) else None, load_batch_id]
+    )
+    for player in entry.get("players") or []:
+        yield "stg_match_players", [key] + [player.get(column) for column in MATCH_PLAYER_COLUMNS]
+        stub = player_stub(player)
+        if stub is not None:
+            yield "stg_players", [stub["profile"]["account_id"], encode_json(stub)]
+
+def copy_staging_batch(buffers, before_commit=None, replace_tables=()):
+    """
+    Loads one batch of COPY text rows into the staging tables and commits
+    Rows land in session temp tables first because COPY cannot skip
+    conflicting keys; the final INSERT ... ON CONFLICT does that, so a retried
+    or concurrent batch never duplicates rows. Tables are loaded in insertion
+    order so matches exist before their players. The transaction holds
+    STAGING_LOCK shared: a step reading MAX(stg_seq) takes it exclusively, so
+    it never sees a later stg_seq commit before an earlier one
+
     Args:
-        url (str): The API endpoint URL
-        
+        buffers (dict): Staging table name -> io.BytesIO of tab-separated rows
+        before_commit (callable): Called with the cursor right before the commit,
+            so bookkeeping (e.g. a backfill checkpoint) commits atomically with the rows
+        replace_tables (iterable): Tables whose existing rows are overwritten when
+            their payload changed, instead of being kept. With stg_match_players,
+            stored players that are missing from a replaced match are deleted.
+            A match whose row or players changed gets a new stg_seq
+
     Returns:
-        dict/None: JSON response if successful, None if all retries fail
+        dict: Staging table name -> number of rows actually inserted (or replaced)
     """
-    global api_calls
-    headers = {"Authorization": f"Bearer {API_KEY}"} if API_KEY else {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_xact_lock_shared(%s, %s);", STAGING_LOCK)
+    inserted = {}
+    changed_matches = set()  # Replaced matches whose row or players changed
+    for table_name, buffer in buffers.items():
+        columns = ", ".join(STAGING_COLUMNS[table_name])
+        temp_table = f"tmp_{table_name}"
 
-    for attempt in range(1, RETRY_ATTEMPTS + 1):
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            api_calls += 1
-            return response.json()
-        except requests.exceptions.Timeout:
-            if attempt < RETRY_ATTEMPTS:
-                # Implement exponential backoff with random jitter
-                sleep_time = BACKOFF_FACTOR ** attempt + random.uniform(5, 10)
-                print(f"⏳ Timeout for {url}. Retrying {attempt}/{RETRY_ATTEMPTS} in {sleep_time:.2f}s...")
-                time.sleep(sleep_time)
-            else:
-                print(f"🚨 Final timeout for {url}, skipping request.")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed: {e}")
-            return None
-    print(f"Exceeded retries for {url}, skipping...")
-    return None
-
-def store_raw_data(table_name, data):
-    """
-    Stores raw JSON data into the specified staging table
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {temp_table} ON COMMIT DELETE ROWS AS
+            SELECT {columns} FROM {table_name} WITH NO DATA;
+        """)
+        buffer.seek(0)
+        copy_start = time.time()
+        cursor.copy_expert(f"COPY {temp_table} ({columns}) FROM STDIN", buffer)
+        conflict_keys = STAGING_CONFLICT_KEYS[table_name]
+        conflict_action = "DO NOTHING"
+        returning = ""
+        if table_name in replace_tables:
+            # A replaced row keeps the load batch that first staged it
+            updated = [column for column in STAGING_COLUMNS[table_name]
+                       if column not in conflict_keys.split(", ") and column != "load_batch_id"]
+            stored = ", ".join(f"{table_name}.{column}" for column in updated)
+            excluded = ", ".join(f"EXCLUDED.{column}" for column in updated)
+            conflict_action = f"""DO UPDATE SET ({", ".join(updated)}) = ROW({excluded})
+                WHERE ROW({stored}) IS DISTINCT FROM ROW({excluded})"""
+            if "match_id" in STAGING_COLUMNS[table_name]:
+                returning = "RETURNING match_id"
+        # Rows are inserted in key order, so concurrent loaders staging the same
+        # players lock them in the same order instead of deadlocking
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({columns})
+            SELECT {columns} FROM {temp_table}
+            ORDER BY {conflict_keys}
+            ON CONFLICT ({conflict_keys}) {conflict_action}
+            {returning};
+        """)
+        inserted[table_name] = cursor.rowcount
+        if returning:
+            changed_matches.update(match_id for match_id, in cursor.fetchall())
+        metrics.inc("staging_copy_seconds", time.time() - copy_start, table=table_name)
+        metrics.inc("staging_bytes_copied", buffer.getbuffer().nbytes, table=table_name)
+        metrics.inc("staging_rows_inserted", cursor.rowcount, table=table_name)
+    if "stg_match_players" in replace_tables and "stg_matches" in buffers:
+        # A replaced match may have fewer players than the stored one; its other
+        # player rows would otherwise outlive the payload they came from
+        kept = """AND NOT EXISTS (SELECT 1 FROM tmp_stg_match_players AS new_player
+                  WHERE new_player.match_id = player.match_id
+                    AND new_player.player_slot = player.player_slot)""" if "stg_match_players" in buffers else ""
+        cursor.execute(f"""
+            DELETE FROM stg_match_players AS player
+            USING tmp_stg_matches AS matches
+            WHERE player.match_id = matches.match_id {kept}
+            RETURNING player.match_id;
+        """)
+        metrics.inc("staging_rows_deleted", cursor.rowcount, table="stg_match_players")
+        changed_matches.update(match_id for match_id, in cursor.fetchall())
+    if changed_matches:
+        # Changed matches move to a new stg_seq, past the watermarks of the
+        # incremental transforms, so the next run loads them into the facts again
+        cursor.execute("""
+            UPDATE stg_matches SET stg_seq = nextval(pg_get_serial_sequence('stg_matches', 'stg_seq'))
+            WHERE match_id = ANY(%s);
+        """, (sorted(changed_matches),))
+    if before_commit is not None:
+        before_commit(cursor)
+    conn.commit()
+    return inserted
+
+def store_raw_data(table_name, data, batch_size=None, before_commit=None, replace_existing=False):
+    """
+    Streams raw JSON data into the specified staging table with COPY FROM STDIN
+    Entries are serialized one at a time into a buffer that is flushed and
+    committed every `batch_size` rows, so `data` can be a generator and only
+    one batch is held in memory. Duplicates are skipped by the unique index
+    on the table's key column, so the cost depends on the batch size rather
+    than the table size. Matches are stored with their typed columns,
+    normalized players and player stubs
     
     Args:
         table_name (str): Name of the staging table
-        data (list): List of dictionaries containing the data to store
+        data (iterable): Dictionaries containing the data to store
+        batch_size (int): Rows per COPY batch and commit, config.copy_batch_size by default
+        before_commit (callable): Passed to copy_staging_batch for every batch; it still
+            runs once (in its own transaction) when `data` yields no rows
+        replace_existing (bool): Overwrite stored rows of `table_name` and their
+            normalized match players when they changed, e.g. player stubs by full
+            profiles. Player stubs derived from matches never overwrite profiles
+
+    Returns:
+        int: Number of rows actually inserted into `table_name`
     """
-    if not data:
-        return
-        
-    if table_name == "stg_matches":
-        # Get existing match IDs from staging table
-        cursor.execute("SELECT match_id FROM stg_matches;")
-        existing_stg_matches = {row[0] for row in cursor.fetchall()}
-        
-        # Filter out matches that already exist in staging
-        new_data = [entry for entry in data if entry.get("match_id") not in existing_stg_matches]
-        
-        if not new_data:
-            print("⚠️ All matches already exist in staging table, skipping insert.")
-            return
-            
-        # Special handling for matches to ensure match_id is set
-        query = f"INSERT INTO {table_name} (match_id, raw_json) VALUES %s;"
-        values = [(entry.get("match_id"), json.dumps(entry)) for entry in new_data]
-        print(f"Inserting {len(new_data)} new matches (skipped {len(data) - len(new_data)} existing matches)")
-    else:
-        # Default handling for other tables
-        query = f"INSERT INTO {table_name} (raw_json) VALUES %s;"
-        values = [(json.dumps(entry),) for entry in data]
-    
-    execute_values(cursor, query, values)
-    conn.commit()
+    key_column, get_key = STAGING_KEYS[table_name]
+    batch_size = batch_size or config.copy_batch_size
+    replace_tables = (table_name, "stg_match_players") if replace_existing else ()
+    buffers = {}
+    batch_players = set()  # Players stubbed in this batch, shared players are written once
+    inserted_by_table = {}
+    batch_rows = total_rows = inserted = missing_keys = 0
+    encode_seconds = 0.0
+
+    for entry in data:
+        key = get_key(entry)
+        if key is None:
+            missing_keys += 1
+            continue
+
+        encode_start = time.time()
+        for row_table, values in staging_rows(table_name, entry, key):
+            if row_table == "stg_players" and table_name != "stg_players":
+                if values[0] in batch_players:
+                    continue
+                batch_players.add(values[0])
+            buffer = buffers.setdefault(row_table, io.BytesIO())
+            buffer.write(b"\t".join(copy_value(value) for value in values) + b"\n")
+        encode_seconds += time.time() - encode_start
+        batch_rows += 1
+
+        if batch_rows >= batch_size:
+            for row_table, count in copy_staging_batch(buffers, before_commit, replace_tables).items():
+                inserted_by_table[row_table] = inserted_by_table.get(row_table, 0) + count
+            total_rows += batch_rows
+            buffers = {}
+            batch_players = set()
+            batch_rows = 0
+
+    if batch_rows or (before_commit is not None and not total_rows):
+        for row_table, count in copy_staging_batch(buffers, before_commit, replace_tables).items():
+            inserted_by_table[row_table] = inserted_by_table.get(row_table, 0) + count
+        total_rows += batch_rows
+
+    inserted = inserted_by_table.get(table_name, 0)
+
+    metrics.inc("staging_encode_seconds", encode_seconds, table=table_name)
+    metrics.inc("staging_rows_skipped", total_rows - inserted, table=table_name)
+    if missing_keys:
+        print(f"⚠️ Dropped {missing_keys} {table_name} entries without a {key_column}.")
+    if replace_existing and total_rows:
+        print(f"Inserted or updated {inserted} rows in {table_name} "
+              f"(skipped {total_rows - inserted} unchanged rows)")
+    elif total_rows:
+        print(f"Inserted {inserted} new rows into {table_name} "
+              f"(skipped {total_rows - inserted} existing rows)")
+    if inserted_by_table.get("stg_players") and table_name != "stg_players":
+        print(f"Inserted {inserted_by_table['stg_players']} new players seen in {table_name}")
+    return inserted
 
 def store_unique_teams(teams):
     """
@@ -137,58 +438,37 @@ def store_unique_teams(teams):
     Args:
         teams (list): List of team dictionaries from the API
     """
-    if not teams:
-        return
-
-    # Get existing team IDs from database
-    cursor.execute("SELECT (raw_json->>'team_id')::TEXT FROM stg_teams;")
-    existing_teams = {row[0] for row in cursor.fetchall()}
-
-    # Filter out teams that already exist
-    new_teams = [t for t in teams if str(t.get("team_id")) not in existing_teams]
-    print(f"🛠 Debug: Inserting {len(new_teams)} new teams (skipped {len(teams) - len(new_teams)} duplicates).")
-
-    if new_teams:
-        store_raw_data("stg_teams", new_teams)
+    return store_raw_data("stg_teams", teams)
 
 def store_unique_players(players):
     """
-    Inserts unique player data into stg_players table, avoiding duplicates
+    Inserts full player profiles into stg_players table, replacing stubs and
+    outdated profiles of the same players
     
     Args:
-        players (list): List of player dictionaries from the API
+        players (iterable): Player dictionaries from the API
     """
-    if not players:
-        return
-
-    # Get existing player account IDs from database
-    cursor.execute("SELECT (raw_json->'profile'->>'account_id')::TEXT FROM stg_players;")
-    existing_players = {row[0] for row in cursor.fetchall()}
-
-    # Filter out players that already exist
-    new_players = [p for p in players if str(p.get("profile", {}).get("account_id")) not in existing_players]
-    print(f"🛠 Debug: Inserting {len(new_players)} new players (skipped {len(players) - len(new_players)} duplicates).")
-    
-    if new_players:
-        store_raw_data("stg_players", new_players)
+    return store_raw_data("stg_players", players, replace_existing=True)
 
 # API endpoint functions
 def get_team_info(team_id):
     """Fetches detailed information about a specific team"""
-    return request_with_retries(f"{API_BASE_URL}/teams/{team_id}")
+    return request_with_retries(f"{config.api_base_url}/teams/{team_id}")
 
-def get_team_matches(team_id):
-    """Fetches recent matches for a specific team"""
-    matches = request_with_retries(f"{API_BASE_URL}/teams/{team_id}/matches")
+def get_team_matches(team_id, full_history=False):
+    """Fetches recent matches for a specific team, or its full history"""
+    matches = request_with_retries(f"{config.api_base_url}/teams/{team_id}/matches")
     if matches is None:
         print("⚠️ API returned no matches, setting to empty list.")
         return []
     
-    matches = matches[:MATCH_HISTORY_DEPTH]  # Look deeper into history
-    print(f"🛠 API returned {len(matches)} matches (Looking at last {MATCH_HISTORY_DEPTH} matches)")
+    depth = None if full_history else config.match_history_depth
+    if depth is not None:
+        matches = matches[:depth]  # Look deeper into history
+    print(f"🛠 API returned {len(matches)} matches (Looking at last {depth or 'all'} matches)")
     
     # Sort matches by timestamp
-    matches.sort(key=lambda x: x['start_time'], reverse=not LOAD_OLDEST)
+    matches.sort(key=lambda x: x['start_time'], reverse=not config.load_oldest)
     
     # Debug: Print first few matches timestamps
     for match in matches[:5]:
@@ -199,80 +479,280 @@ def get_team_matches(team_id):
 
 def get_match_details(match_id):
     """Fetches detailed information about a specific match"""
-    return request_with_retries(f"{API_BASE_URL}/matches/{match_id}")
+    return request_with_retries(f"{config.api_base_url}/matches/{match_id}")
 
 def get_heroes():
     """Fetches list of all heroes in the game"""
-    return request_with_retries(f"{API_BASE_URL}/heroes")
+    return request_with_retries(f"{config.api_base_url}/heroes")
 
-def get_player_info(player_id):
-    """
-    Fetches detailed information about a specific player
-    Includes rate limiting delay between requests
-    """
+def get_player_info(player_id, revalidate=False):
+    """Fetches a player's full profile; `revalidate` skips a fresh cached copy known to be outdated"""
     if not player_id or player_id == 0:
         return None
-    time.sleep(random.uniform(1, 3))  # Rate limiting delay
-    return request_with_retries(f"{API_BASE_URL}/players/{player_id}")
+    return request_with_retries(f"{config.api_base_url}/players/{player_id}", revalidate=revalidate)
 
-def get_latest_match_time():
-    """Get the most recent match time from fact_matches"""
+def get_latest_match_time(team_id=None):
+    """
+    Get the most recent match time from fact_matches, or for one team the
+    most recent match staged by a load batch of that team (or before load
+    batches existed). Matches another team's batch staged against it do not
+    count, so a concurrent worker cannot push the team past matches it has
+    not loaded yet
+    """
+    cursor = get_connection().cursor()
     try:
-        cursor.execute("SELECT MAX(start_time) FROM fact_matches;")
+        if team_id is None:
+            cursor.execute("SELECT MAX(start_time) FROM fact_matches;")
+        else:
+            # One index scan per side instead of an OR over the whole table
+            cursor.execute("""
+                SELECT MAX(s.start_time)
+                FROM (
+                    SELECT start_time, load_batch_id FROM stg_matches WHERE radiant_team_id = %(team_id)s
+                    UNION ALL
+                    SELECT start_time, load_batch_id FROM stg_matches WHERE dire_team_id = %(team_id)s
+                ) s
+                LEFT JOIN load_batches b ON b.batch_id = s.load_batch_id
+                WHERE s.load_batch_id IS NULL OR %(team_id)s = ANY(b.team_ids);
+            """, {"team_id": team_id})
         result = cursor.fetchone()[0]
         return result if result else 0
     except Exception as e:
         print(f"Error getting latest match time: {e}")
         return 0
 
-def get_existing_match_ids():
-    """Get set of existing match IDs from fact_matches"""
-    try:
-        cursor.execute("SELECT match_id FROM fact_matches;")
-        return {row[0] for row in cursor.fetchall()}
-    except Exception as e:
-        print(f"Error getting existing match IDs: {e}")
+def iter_match_details(match_ids, team_ids):
+    """
+    Fetches match details concurrently and yields them one at a time so they
+    can be streamed into staging. Only the participating team ids are kept;
+    player stubs are written with each match batch by store_raw_data
+
+    Args:
+        match_ids (list): Match ids to fetch
+        team_ids (set): Collects radiant and dire team ids
+
+    Yields:
+        dict: Match details as returned by the API
+    """
+    for match_id, match_details in fetch_concurrently(get_match_details, match_ids):
+        if not match_details:
+            print(f"⚠️ Skipping match {match_id} due to timeout or missing data.")
+            continue
+
+        team_ids.update(
+            team_id for team_id in [match_details.get("radiant_team_id"), match_details.get("dire_team_id")]
+            if team_id
+        )
+        yield match_details
+
+def get_existing_ids(table_name, ids):
+    """
+    Get the subset of ids that already exist in a staging table
+    Only the candidate ids are looked up, using the table's unique key index
+
+    Args:
+        table_name (str): Name of the staging table
+        ids (iterable): Candidate match, team or account ids
+
+    Returns:
+        set: Ids from `ids` that are already stored
+    """
+    ids = [int(i) for i in ids if i]
+    if not ids:
         return set()
 
-def get_existing_team_ids():
-    """Get set of existing team IDs from dim_teams"""
+    key_column, _ = STAGING_KEYS[table_name]
+    conn = get_connection()
+    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT team_id FROM dim_teams;")
+        cursor.execute(f"SELECT {key_column} FROM {table_name} WHERE {key_column} = ANY(%s);", (ids,))
         return {row[0] for row in cursor.fetchall()}
     except Exception as e:
-        print(f"Error getting existing team IDs: {e}")
+        print(f"Error getting existing ids from {table_name}: {e}")
+        conn.rollback()
         return set()
 
-def get_existing_player_ids():
-    """Get set of existing player IDs from dim_players"""
+def get_existing_match_ids(match_ids):
+    """Get set of match IDs from `match_ids` that are already staged"""
+    return get_existing_ids("stg_matches", match_ids)
+
+def get_existing_team_ids(team_ids):
+    """Get set of team IDs from `team_ids` that are already staged"""
+    return get_existing_ids("stg_teams", team_ids)
+
+def get_existing_player_ids(account_ids):
+    """Get set of account IDs from `account_ids` that are already staged"""
+    return get_existing_ids("stg_players", account_ids)
+
+def get_pro_team_ids():
+    """Discovers the teams playing recent professional matches via /proMatches"""
+    pro_matches = request_with_retries(f"{config.api_base_url}/proMatches") or []
+    team_ids = {
+        team_id for match in pro_matches
+        for team_id in (match.get("radiant_team_id"), match.get("dire_team_id"))
+        if team_id
+    }
+    print(f"🔍 Discovered {len(team_ids)} teams from {len(pro_matches)} recent pro matches")
+    return sorted(team_ids)
+
+def resolve_team_ids(spec=None):
+    """
+    Resolves the tracked teams from a team ids setting
+
+    Args:
+        spec (str): Comma-separated team ids, or "discover" to use /proMatches;
+            config.team_ids by default
+
+    Returns:
+        list: Sorted, unique team ids
+    """
+    spec = (spec or config.team_ids).strip()
+    if spec.lower() == "discover":
+        return get_pro_team_ids()
+    return sorted({int(team_id) for team_id in spec.split(",") if team_id.strip()})
+
+def shard_of(team_id, shard_count):
+    """Deterministic shard assignment, stable across hosts and runs (unlike hash())"""
+    return zlib.crc32(str(team_id).encode("ascii")) % shard_count
+
+def match_owner(team_id, match, tracked):
+    """
+    Picks the one tracked team responsible for fetching a match
+    A match between two tracked teams appears in both teams' match lists; it is
+    owned by the lower team id so exactly one shard fetches it
+    """
+    opposing_team_id = match.get("opposing_team_id")
+    if opposing_team_id in tracked:
+        return min(team_id, opposing_team_id)
+    return team_id
+
+def claim_teams(team_ids, limit):
+    """
+    Takes the session advisory locks of up to `limit` teams, in order
+    Teams locked by another worker are set aside: that worker is staging
+    their matches, and loading them at the same time would only repeat its
+    API calls
+
+    Returns:
+        tuple: (claimed team ids, team ids held by another worker, team ids not examined yet)
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    claimed, held = [], []
+    for position, team_id in enumerate(team_ids):
+        if len(claimed) >= limit:
+            conn.commit()
+            return claimed, held, team_ids[position:]
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s);", (TEAM_LOCK_NAMESPACE, team_id))
+        if cursor.fetchone()[0]:
+            claimed.append(team_id)
+        else:
+            held.append(team_id)
+            print(f"🔒 Team {team_id}: being loaded by another worker, retrying at the end of the run")
+    conn.commit()  # Session locks outlive the transaction
+    return claimed, held, []
+
+def release_teams(team_ids):
+    """Releases the advisory locks taken by claim_teams"""
+    if _connection is None or _connection.closed:
+        return  # Session locks end with the session
+    _connection.rollback()  # A failed batch can leave its transaction aborted
+    cursor = _connection.cursor()
+    cursor.execute("SELECT pg_advisory_unlock(%s, team_id) FROM unnest(%s::INT[]) AS team_id;",
+                   (TEAM_LOCK_NAMESPACE, list(team_ids)))
+    _connection.commit()
+
+def start_load_batch(team_ids):
+    """
+    Records a new load batch in load_batches and commits it
+
+    Returns:
+        int: batch_id, written to stg_matches.load_batch_id by the batch's staging writes
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO load_batches (worker, team_ids) VALUES (%s, %s) RETURNING batch_id;
+    """, (f"{socket.gethostname()}:{os.getpid()}", list(team_ids)))
+    batch_id = cursor.fetchone()[0]
+    conn.commit()
+    return batch_id
+
+def finish_load_batch(batch_id, status, matches_staged=None):
+    """Marks a load batch completed or failed"""
     try:
-        cursor.execute("SELECT account_id FROM dim_players;")
-        return {row[0] for row in cursor.fetchall()}
-    except Exception as e:
-        print(f"Error getting existing player IDs: {e}")
-        return set()
+        conn = get_connection()
+        conn.rollback()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE load_batches SET status = %s, matches_staged = %s, finished_at = CURRENT_TIMESTAMP
+            WHERE batch_id = %s;
+        """, (status, matches_staged, batch_id))
+        conn.commit()
+    except psycopg2.Error as e:
+        print(f"⚠️ Could not mark load batch {batch_id} {status}: {e}")
 
-# Main execution block
-if __name__ == "__main__":
-    team_id = 2163  # Team ID to analyze
-    
-    print(f"Running in {'INITIAL LOAD' if INITIAL_LOAD else 'INCREMENTAL'} mode")
-    print(f"Loading {'OLDEST' if LOAD_OLDEST else 'NEWEST'} matches first")
-    print(f"Will process up to {MATCH_LIMIT} new matches per run")
-    
-    # Get existing data to avoid duplicates
-    existing_match_ids = get_existing_match_ids()
-    existing_team_ids = get_existing_team_ids()
-    existing_player_ids = get_existing_player_ids()
-    latest_match_time = get_latest_match_time()
-    
-    print(f"Latest match time in DB: {latest_match_time} "
+def ingest_in_batches(ingest, team_ids, tracked=None, load_heroes=True):
+    """
+    Runs ingest_teams or backfill_teams over a shard in load batches of up to
+    config.batch_teams teams. Each batch holds the advisory locks of its teams
+    and is recorded in load_batches, and the matches it stages carry its
+    batch_id. Workers with overlapping teams split them between their batches
+    instead of loading the same team at the same time. Teams another worker
+    held are retried once after the others; those still held then are
+    counted in load_teams_deferred and left to the next run
+
+    Returns:
+        int: Number of new matches stored
+    """
+    global load_batch_id
+    stored_matches = 0
+    remaining, deferred, retried = list(team_ids), [], False
+    while remaining or (deferred and not retried):
+        if not remaining:
+            print(f"🔁 Retrying {len(deferred)} teams held by other workers")
+            remaining, deferred, retried = deferred, [], True
+        claimed, held, remaining = claim_teams(remaining, config.batch_teams or len(remaining))
+        deferred += held
+        if not claimed:
+            continue
+        load_batch_id = start_load_batch(claimed)
+        status, stored = "failed", None
+        try:
+            stored = ingest(claimed, tracked=tracked or team_ids, load_heroes=load_heroes)
+            status = "completed"
+        finally:
+            finish_load_batch(load_batch_id, status, stored)
+            release_teams(claimed)
+            load_batch_id = None
+        print(f"📦 Load batch of {len(claimed)} teams stored {stored} new matches")
+        stored_matches += stored
+        load_heroes = False
+
+    if deferred:
+        metrics.inc("load_teams_deferred", len(deferred))
+        print(f"⏭️ {len(deferred)} teams still held by other workers, deferred to the next run: "
+              f"{', '.join(str(team_id) for team_id in deferred)}")
+    return stored_matches
+
+def select_new_matches(team_id, matches):
+    """
+    Filters one team's match list down to the matches that still need fetching
+
+    Args:
+        team_id (int): Team the match list belongs to
+        matches (list): Matches from get_team_matches, already sorted
+
+    Returns:
+        list: Up to config.match_limit new matches
+    """
+    latest_match_time = get_latest_match_time(team_id)
+    print(f"Team {team_id}: latest match time in DB: {latest_match_time} "
           f"({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(latest_match_time))})")
-    print(f"Existing matches in DB: {len(existing_match_ids)}")
 
-    # Step 1: Fetch basic match data
-    print("Fetching matches...")
-    matches = get_team_matches(team_id)
+    # Look up only the listed matches to avoid duplicates
+    existing_match_ids = get_existing_match_ids(m["match_id"] for m in matches)
+    print(f"Team {team_id}: listed matches already in DB: {len(existing_match_ids)}")
     
     # Filter out matches we already have
     new_matches = []
@@ -280,7 +760,7 @@ if __name__ == "__main__":
         match_id = int(m["match_id"])
         match_time = int(m["start_time"])
         
-        if LOAD_OLDEST:
+        if config.load_oldest:
             # When loading oldest first, we want matches that are:
             # 1. Not already in our database
             # 2. Newer than our latest_match_time (which is 0 initially)
@@ -299,88 +779,85 @@ if __name__ == "__main__":
                   f"(timestamp: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(match_time))})")
     
     # When loading oldest first, sort by timestamp ascending
-    if LOAD_OLDEST:
+    if config.load_oldest:
         new_matches.sort(key=lambda x: x['start_time'])
     
     # Apply the processing limit to new matches
-    new_matches = new_matches[:MATCH_LIMIT]
+    new_matches = new_matches[:config.match_limit]
     
-    print(f"✅ Found {len(new_matches)} new matches to process out of {len(matches)} matches checked")
+    print(f"✅ Team {team_id}: found {len(new_matches)} new matches to process out of {len(matches)} matches checked")
+    return new_matches
 
-    if not new_matches:
-        print("No new matches to process, exiting...")
-        sys.exit(0)
+def ingest_teams(team_ids, tracked=None, load_heroes=True):
+    """
+    Fetches and stages new matches, players and teams for a set of teams
+    Match lists and match details are fetched concurrently across all teams,
+    and every match is fetched once even if several of the teams played in it
 
-    # Step 2: Fetch and store detailed match data
-    print("Fetching match details...")
-    detailed_matches = []
-    all_players = []
-    
-    for match in new_matches:  # No need for slice here as we already limited new_matches
-        match_details = get_match_details(match["match_id"])
-        
-        if not match_details:
-            print(f"⚠️ Skipping match {match['match_id']} due to timeout or missing data.")
+    Args:
+        team_ids (list): Teams handled by this shard
+        tracked (set): All tracked teams across shards, used to assign shared matches
+        load_heroes (bool): Also load hero reference data if it is missing
+
+    Returns:
+        int: Number of new matches stored
+    """
+    tracked = set(tracked or team_ids)
+
+    # Step 1: Fetch basic match data
+    print(f"Fetching match lists for {len(team_ids)} teams...")
+    owned_matches = {
+        team_id: [m for m in matches if match_owner(team_id, m, tracked) == team_id]
+        for team_id, matches in fetch_concurrently(get_team_matches, team_ids)
+    }
+
+    # One lookup for every listed match; teams whose listed matches are all
+    # staged already need no further queries
+    staged_match_ids = get_existing_match_ids(m["match_id"] for matches in owned_matches.values() for m in matches)
+    match_ids = []
+    seen_match_ids = set()
+    for team_id, matches in owned_matches.items():
+        unstaged = [m for m in matches if m["match_id"] not in staged_match_ids]
+        if not unstaged:
+            print(f"✅ Team {team_id}: no new matches among {len(matches)} listed")
             continue
+        for match in select_new_matches(team_id, unstaged):
+            if match["match_id"] not in seen_match_ids:
+                seen_match_ids.add(match["match_id"])
+                match_ids.append(match["match_id"])
 
-        # Extract players from match details
-        if "players" in match_details:
-            match_players = [
-                player for player in match_details["players"]
-                if player.get("account_id") and 
-                   player["account_id"] != 4294967295 and  # Filter out anonymous players
-                   player["account_id"] not in existing_player_ids  # Filter out existing players
-            ]
-            all_players.extend(match_players)
-
-        detailed_matches.append(match_details)
-        time.sleep(random.uniform(3, 7))
-
-    # Store the detailed match data
-    if detailed_matches:
-        print(f"Storing {len(detailed_matches)} new detailed matches...")
-        store_raw_data("stg_matches", detailed_matches)
-    else:
-        print("⚠️ No new detailed matches to store!")
-
-    # Process and store player data
-    if all_players:
-        print(f"Processing {len(all_players)} new players from matches...")
-        unique_players = {}
-        for player in all_players:
-            account_id = str(player["account_id"])
-            if account_id not in unique_players and int(account_id) not in existing_player_ids:
-                unique_players[account_id] = {
-                    "profile": {
-                        "account_id": player["account_id"],
-                        "personaname": player.get("personaname", "Unknown"),
-                        "name": player.get("name", player.get("personaname", "Unknown")),
-                    }
-                }
-        
-        player_list = list(unique_players.values())
-        if player_list:
-            print(f"Storing {len(player_list)} new unique players...")
-            store_unique_players(player_list)
-        else:
-            print("⚠️ No new players to store!")
+    stored_matches = 0
+    match_team_ids = set()
+    if not match_ids:
+        print("No new matches to process")
     else:
-        print("⚠️ No new players found in matches!")
+        # Step 2: Fetch and store detailed match data
+        print(f"Fetching {len(match_ids)} match details ({api_client.FETCH_WORKERS} workers, "
+              f"{api_client.rate_limiter.rate * 60:.0f} requests/min)...")
+        # Matches stream from the fetch threads straight into COPY batches: at most
+        # FETCH_IN_FLIGHT responses wait in memory and every batch commits with its players
+        stored_matches = store_raw_data("stg_matches", iter_match_details(match_ids, match_team_ids))
+        if not stored_matches:
+            print("⚠️ No new detailed matches to store!")
 
-    # Step 3: Extract and store team data from matches
+    # Step 3: Extract and store team data from matches (tracked teams are stored even without new matches)
+    store_new_teams(match_team_ids | set(team_ids))
+
+    # Step 4: Update hero reference data only if needed
+    if load_heroes:
+        load_heroes_if_missing()
+
+    return stored_matches
+
+def store_new_teams(team_ids):
+    """Fetches and stores team info for every team not yet in stg_teams"""
     print("Fetching team info from match history...")
-    team_data = []
-    fetched_team_ids = set()
-
-    for match in detailed_matches:
-        for team_id in [match.get("radiant_team_id"), match.get("dire_team_id")]:
-            if (team_id and 
-                str(team_id) not in fetched_team_ids and 
-                team_id not in existing_team_ids):
-                team_info = get_team_info(team_id)
-                if team_info:
-                    team_data.append(team_info)
-                    fetched_team_ids.add(str(team_id))
+    team_ids_to_fetch = set(team_ids) - get_existing_team_ids(team_ids)
+
+    team_data = [
+        team_info for _, team_info in fetch_concurrently(get_team_info, team_ids_to_fetch)
+        if team_info
+    ]
 
     if team_data:
         print(f"Found {len(team_data)} new unique teams...")
@@ -388,8 +865,10 @@ if __name__ == "__main__":
     else:
         print("⚠️ No new team data to store!")
 
-    # Step 4: Update hero reference data only if needed
+def load_heroes_if_missing():
+    """Loads hero reference data when stg_heroes is empty"""
     print("Checking for hero updates...")
+    cursor = get_connection().cursor()
     cursor.execute("SELECT COUNT(*) FROM stg_heroes;")
     hero_count = cursor.fetchone()[0]
     
@@ -404,8 +883,261 @@ if __name__ == "__main__":
     else:
         print(f"✅ Hero data already exists ({hero_count} heroes)")
 
-    # Cleanup and summary
-    print(f"🔄 Total API Calls Made: {api_calls}")
-    cursor.close()
-    conn.close()
-    print("✅ Data fetching complete!")
+def get_backfill_checkpoint(team_id):
+    """
+    Reads a team's backfill progress
+
+    Returns:
+        dict/None: last_match_id, last_start_time, matches_processed and completed, or None if never started
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT last_match_id, last_start_time, matches_processed, completed
+        FROM backfill_checkpoints WHERE team_id = %s;
+    """, (team_id,))
+    row = cursor.fetchone()
+    conn.commit()
+    if row is None:
+        return None
+    return dict(zip(["last_match_id", "last_start_time", "matches_processed", "completed"], row))
+
+def save_backfill_checkpoint(cur, team_id, last_match, processed, completed):
+    """
+    Records that every listed match down to `last_match` is staged
+    Runs on the cursor of the batch being committed, so the checkpoint and the
+    matches it covers commit together
+
+    Args:
+        cur: Cursor of the open staging transaction
+        team_id (int): Team being backfilled
+        last_match (dict): Oldest match of the page, or None if the team has no matches
+        processed (int): Number of listed matches the page covered
+        completed (bool): Whether the team's whole history is now staged
+    """
+    cur.execute("""
+        INSERT INTO backfill_checkpoints
+            (team_id, last_match_id, last_start_time, matches_processed, completed, updated_at)
+        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (team_id) DO UPDATE SET
+            last_match_id = COALESCE(EXCLUDED.last_match_id, backfill_checkpoints.last_match_id),
+            last_start_time = COALESCE(EXCLUDED.last_start_time, backfill_checkpoints.last_start_time),
+            matches_processed = backfill_checkpoints.matches_processed + EXCLUDED.matches_processed,
+            completed = EXCLUDED.completed,
+            updated_at = CURRENT_TIMESTAMP;
+    """, (
+        team_id,
+        last_match["match_id"] if last_match else None,
+        last_match["start_time"] if last_match else None,
+        processed,
+        completed,
+    ))
+
+def backfill_team(team_id, tracked):
+    """
+    Walks a team's complete match history from newest to oldest in pages of
+    config.backfill_page_size matches. Each page's matches are committed together
+    with the checkpoint, so a crashed backfill resumes after the last committed
+    page without fetching any earlier match details again
+
+    Args:
+        team_id (int): Team to backfill
+        tracked (set): All tracked teams, used to assign shared matches
+
+    Returns:
+        int: Number of new matches stored
+    """
+    checkpoint = get_backfill_checkpoint(team_id)
+    if checkpoint and checkpoint["completed"]:
+        print(f"✅ Team {team_id}: backfill already completed ({checkpoint['matches_processed']} matches)")
+        return 0
+
+    matches = [m for m in get_team_matches(team_id, full_history=True) if match_owner(team_id, m, tracked) == team_id]
+    matches.sort(key=lambda m: (m["start_time"], m["match_id"]), reverse=True)
+    if checkpoint and checkpoint["last_match_id"] is not None:
+        resume_after = (checkpoint["last_start_time"], checkpoint["last_match_id"])
+        matches = [m for m in matches if (m["start_time"], m["match_id"]) < resume_after]
+        print(f"⏩ Team {team_id}: resuming backfill after match {checkpoint['last_match_id']}, "
+              f"{len(matches)} matches left")
+
+    page_size = config.backfill_page_size
+    pages = [matches[i:i + page_size] for i in range(0, len(matches), page_size)]
+    if not pages:
+        conn = get_connection()
+        save_backfill_checkpoint(conn.cursor(), team_id, None, 0, True)
+        conn.commit()
+        return 0
+
+    stored_matches = 0
+    for page_number, page in enumerate(pages):
+        if config.backfill_max_pages and page_number >= config.backfill_max_pages:
+            print(f"⏸ Team {team_id}: stopping after {config.backfill_max_pages} pages, next run resumes here")
+            break
+
+        existing_match_ids = get_existing_match_ids(m["match_id"] for m in page)
+        match_ids = [m["match_id"] for m in page if m["match_id"] not in existing_match_ids]
+        print(f"📚 Team {team_id}: page {page_number + 1}/{len(pages)}, fetching {len(match_ids)} "
+              f"of {len(page)} matches")
+
+        # Details are held for one page so teams are staged before the checkpoint
+        # moves past their matches; re-running a page is harmless
+        match_team_ids = set()
+        details = list(iter_match_details(match_ids, match_team_ids))
+        store_new_teams(match_team_ids)
+
+        # A match whose details could not be fetched stops the checkpoint just
+        # before it, so the next run fetches it again instead of passing over it
+        fetched_ids = {int(match["match_id"]) for match in details}
+        failed = [position for position, m in enumerate(page)
+                  if m["match_id"] not in existing_match_ids and int(m["match_id"]) not in fetched_ids]
+        covered = page[:failed[0]] if failed else page
+        completed = not failed and page_number == len(pages) - 1
+        stored_matches += store_raw_data(
+            "stg_matches", details, batch_size=len(page),
+            before_commit=(lambda cur: save_backfill_checkpoint(cur, team_id, covered[-1], len(covered), completed))
+            if covered else None,
+        )
+        if failed:
+            metrics.inc("backfill_matches_failed", len(failed))
+            print(f"⏸ Team {team_id}: {len(failed)} matches of page {page_number + 1} failed, "
+                  f"next run resumes at match {page[failed[0]]['match_id']}")
+            break
+
+    return stored_matches
+
+def backfill_teams(team_ids, tracked=None, load_heroes=True):
+    """Backfills the full history of every team in a shard, one team at a time"""
+    tracked = set(tracked or team_ids)
+    store_new_teams(team_ids)
+    stored_matches = sum(backfill_team(team_id, tracked) for team_id in team_ids)
+    if load_heroes:
+        load_heroes_if_missing()
+    print(f"📚 Backfill stored {stored_matches} new matches")
+    return stored_matches
+
+def run_shard(fetch_config, shard, shard_count, team_ids, rate_per_minute):
+    """
+    Ingests the teams of one shard; also the entry point of ingestion worker processes
+
+    Args:
+        fetch_config (FetchConfig): Configuration of the run
+        shard (int): Global shard index handled by this worker
+        shard_count (int): Total number of shards across all hosts and processes
+        team_ids (list): All tracked team ids
+        rate_per_minute (float): This worker's share of the API quota
+
+    Returns:
+        dict: The worker's metrics, merged by the parent process
+    """
+    global config
+    config = fetch_config
+    api_client.rate_limiter = api_client.TokenBucket(rate_per_minute / 60, api_client.RATE_LIMIT_BURST)
+    shard_team_ids = [team_id for team_id in team_ids if shard_of(team_id, shard_count) == shard]
+    print(f"🧩 Shard {shard}/{shard_count}: {len(shard_team_ids)} teams")
+    ingest = backfill_teams if config.backfill else ingest_teams
+    ingest_in_batches(ingest, shard_team_ids, tracked=team_ids, load_heroes=shard == 0)
+    return metrics.to_dict()
+
+def run(fetch_config=None, connection=None):
+    """
+    Fetches new data from the OpenDota API into the staging tables
+
+    Args:
+        fetch_config (FetchConfig): Settings for this run, FetchConfig.from_env() by default
+        connection: Open psycopg2 connection to use (e.g. from a pool); it is left
+            open for the caller. A new connection is opened and closed otherwise
+
+    Returns:
+        int: Number of teams processed
+    """
+    global config, _connection
+    config = fetch_config or FetchConfig.from_env()
+    _connection = connection
+
+    try:
+        team_ids = resolve_team_ids()
+        if not team_ids:
+            print("No teams to process, exiting...")
+            return 0
+
+        initial_load = is_initial_load()  # Auto-detect if this is initial load
+        get_connection().commit()  # Waiting on STAGING_LOCK must not hold a lock on fact_matches
+        if config.match_limit is None:
+            config = replace(config, match_limit=50 if initial_load else 3)
+
+        # This host handles shards shard_index * ingest_processes .. + ingest_processes - 1
+        processes = config.ingest_processes
+        shard_count = config.shard_count * processes
+        shards = [config.shard_index * processes + process for process in range(processes)]
+
+        print(f"Running in {'BACKFILL' if config.backfill else 'INITIAL LOAD' if initial_load else 'INCREMENTAL'} mode")
+        print(f"Loading {'OLDEST' if config.load_oldest else 'NEWEST'} matches first")
+        print(f"Will process up to {config.match_limit} new matches per team per run")
+        print(f"Tracking {len(team_ids)} teams, host shard {config.shard_index + 1}/{config.shard_count}, "
+              f"{processes} worker processes")
+
+        if processes == 1:
+            run_shard(config, shards[0], shard_count, team_ids, api_client.RATE_LIMIT_PER_MINUTE)
+        else:
+            # Workers share the API quota, so each one gets an equal slice of it
+            rate_per_worker = api_client.RATE_LIMIT_PER_MINUTE / processes
+            context = multiprocessing.get_context("spawn")  # Fresh interpreter, no inherited DB connection
+            with context.Pool(processes) as pool:
+                results = pool.starmap(
+                    run_shard,
+                    [(config, shard, shard_count, team_ids, rate_per_worker) for shard in shards],
+                )
+            for worker_metrics in results:
+                metrics.merge(worker_metrics)
+
+        # Summary
+        print(f"🔄 Total API Calls Made: {metrics.total('api_requests')}")
+        print(f"🗄️ Response cache: {metrics.total('api_cache_hits')} hits, {metrics.total('api_cache_misses')} misses, "
+              f"{metrics.total('api_cache_revalidations')} revalidated")
+        print("✅ Data fetching complete!")
+        return len(team_ids)
+
+    finally:
+        if connection is None and _connection is not None:
+            _connection.close()
+        elif connection is not None and not connection.closed:
+            connection.rollback()  # End any open read transaction before handing the connection back
+        _connection = None
+
+def poll(fetch_config=None, connection=None):
+    """
+    One cycle of the ingestion daemon (run_etl.py --daemon): stages the new
+    matches of this host's tracked teams. Unlike run(), it does not check for an
+    initial load and only caps the matches per team when MATCH_LIMIT is set.
+    Match lists are revalidated with conditional requests, so a team without
+    new matches costs a 304 response
+
+    Args:
+        fetch_config (FetchConfig): Settings for this cycle, FetchConfig.from_env() by default
+        connection: Open psycopg2 connection to use; it is left open for the caller
+
+    Returns:
+        int: Number of new matches stored
+    """
+    global config, _connection
+    config = fetch_config or FetchConfig.from_env()
+    _connection = connection
+
+    try:
+        team_ids = resolve_team_ids()
+        shard_team_ids = [team_id for team_id in team_ids if shard_of(team_id, config.shard_count) == config.shard_index]
+        if not shard_team_ids:
+            print("No teams to poll")
+            return 0
+        return ingest_in_batches(ingest_teams, shard_team_ids, tracked=team_ids, load_heroes=False)
+
+    finally:
+        if connection is None and _connection is not None:
+            _connection.close()
+        elif connection is not None and not connection.closed:
+            connection.rollback()
+        _connection = None
+
+# Main execution block
+if __name__ == "__main__":
+    run()
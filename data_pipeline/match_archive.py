@@ -0,0 +1,136 @@
+# Standard library imports
+import sys
+import json
+import time
+import argparse
+
+# Local imports
+from data_pipeline import fetch_data
+
+# Configuration constants
+READ_BATCH_SIZE = 200  # Archived matches fetched per round trip
+
+
+def full_payload(raw_json, raw_archive, archive_codec):
+    """
+    Restores the original /matches/{id} payload of a stg_matches row
+
+    Rows staged before the archive existed have no raw_archive and still
+    hold the full payload in raw_json
+
+    Returns:
+        dict: The match as returned by the API
+    """
+    if raw_archive is None:
+        return raw_json
+    return json.loads(fetch_data.decompress_payload(bytes(raw_archive), archive_codec))
+
+
+def iter_matches(connection, match_ids=None, batch_size=READ_BATCH_SIZE):
+    """
+    Streams the original payloads of staged matches in staging order
+    Matches are read in stg_seq pages with short queries, so the same
+    connection can write and commit between pages
+
+    Args:
+        connection: Open database connection
+        match_ids (list): Matches to read, all staged matches by default
+        batch_size (int): Rows fetched per query
+
+    Yields:
+        dict: Match payloads as returned by the API
+    """
+    filters = ["stg_seq > %(after)s"]
+    params = {"limit": batch_size, "after": 0}
+    if match_ids:
+        filters.append("match_id = ANY(%(match_ids)s)")
+        params["match_ids"] = [int(match_id) for match_id in match_ids]
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT stg_seq, raw_json, raw_archive, archive_codec
+                FROM stg_matches
+                WHERE {" AND ".join(filters)}
+                ORDER BY stg_seq
+                LIMIT %(limit)s
+            """, params)
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        for _, raw_json, raw_archive, archive_codec in rows:
+            yield full_payload(raw_json, raw_archive, archive_codec)
+        params["after"] = rows[-1][0]
+
+
+def load_match(match_id, connection=None):
+    """Returns the original payload of one staged match, or None if it is not staged"""
+    connection = connection or fetch_data.get_connection()
+    for match in iter_matches(connection, [match_id]):
+        return match
+    return None
+
+
+def rederive(connection, match_ids=None):
+    """
+    Rebuilds the slim raw_json, archive, typed columns and stg_match_players
+    rows of staged matches from their original payloads, e.g. after a column
+    was added to MATCH_COLUMNS. Rows staged before the archive are compacted
+    on the way. Matches whose rows changed get a new stg_seq, so the next ETL
+    run reloads their facts
+
+    Returns:
+        int: Number of stg_matches rows that changed
+    """
+    fetch_data._connection = connection
+    try:
+        return fetch_data.store_raw_data("stg_matches", iter_matches(connection, match_ids), replace_existing=True)
+    finally:
+        fetch_data._connection = None
+
+
+def archive_stats(connection):
+    """Sizes of the stg_matches payload columns and of the table with its TOAST and indexes"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT
+                COUNT(*) AS matches,
+                COUNT(raw_archive) AS archived,
+                pg_size_pretty(SUM(pg_column_size(raw_json))) AS raw_json,
+                pg_size_pretty(SUM(pg_column_size(raw_archive))) AS raw_archive,
+                pg_size_pretty(pg_total_relation_size('stg_matches')) AS stg_matches_total
+            FROM stg_matches
+        """)
+        columns = [column.name for column in cursor.description]
+        return dict(zip(columns, cursor.fetchone()))
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Read and re-derive archived match payloads")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="Print the original payload of matches as JSON lines")
+    show.add_argument("match_ids", nargs="+", type=int)
+    derive = commands.add_parser("rederive", help="Rebuild staging rows from the archive (default: all matches)")
+    derive.add_argument("match_ids", nargs="*", type=int)
+    commands.add_parser("stats", help="Show the size of the payload columns")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    connection = fetch_data.get_connection()
+    try:
+        if args.command == "show":
+            for match in iter_matches(connection, args.match_ids):
+                sys.stdout.write(json.dumps(match) + "\n")
+        elif args.command == "rederive":
+            start_time = time.time()
+            changed = rederive(connection, args.match_ids)
+            print(f"✅ Re-derived {changed} matches in {time.time() - start_time:.2f}s")
+            print("Run VACUUM FULL stg_matches to return the space of compacted rows to the operating system")
+        else:
+            for name, value in archive_stats(connection).items():
+                print(f"{name}: {value}")
+    finally:
+        connection.close()
@@ -0,0 +1,163 @@
+# Standard library imports
+import os
+import json
+import time
+import threading
+
+# Default histogram buckets in seconds, suited to API and database latencies
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Cumulative bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            "count": self.count,
+            "sum": round(self.sum, 6),
+        }
+
+
+class RunMetrics:
+    """
+    Thread-safe registry of counters, histograms and per-step records for one ETL run
+
+    Counters and histograms are keyed by name plus optional labels, e.g.
+    inc("staging_rows_inserted", 10, table="stg_matches"). Step records hold
+    free-form details (duration, rows, buffer stats) for each pipeline step.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.steps = {}
+        self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Adds `value` to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Records one observation in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def counter(self, name, **labels):
+        """Returns the current value of a counter"""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def total(self, name):
+        """Returns the sum of a counter across all of its labels"""
+        with self.lock:
+            return sum(value for (counter_name, _), value in self.counters.items() if counter_name == name)
+
+    def record_step(self, step, **details):
+        """Stores (or extends) the details recorded for a pipeline step"""
+        with self.lock:
+            self.steps.setdefault(step, {}).update(details)
+
+    def to_dict(self):
+        """Returns the whole registry as JSON-serializable data"""
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "steps": dict(self.steps),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.to_dict()}
+                    for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+    def merge(self, data):
+        """Adds counters, histograms and steps exported by another process with to_dict()"""
+        for counter in data.get("counters", []):
+            self.inc(counter["name"], counter["value"], **counter["labels"])
+
+        with self.lock:
+            for entry in data.get("histograms", []):
+                key = (entry["name"], tuple(sorted(entry["labels"].items())))
+                histogram = self.histograms.setdefault(key, Histogram())
+                for i, bound in enumerate(histogram.buckets):
+                    histogram.counts[i] += entry["buckets"].get(str(bound), 0)
+                histogram.count += entry["count"]
+                histogram.sum += entry["sum"]
+
+            for step, details in data.get("steps", {}).items():
+                self.steps.setdefault(step, {}).update(details)
+
+    def write_json(self, path, **extra):
+        """Writes the run report as JSON, with any extra top-level fields"""
+        report = {**self.to_dict(), **extra}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    def write_prometheus(self, path, prefix="dota_etl"):
+        """Writes counters, histograms and numeric step details in Prometheus text format"""
+        lines = []
+
+        def labels_text(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{prefix}_{name}{labels_text(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {prefix}_{name} histogram")
+                for (histogram_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{prefix}_{name}_bucket{labels_text(labels + (('le', bound),))} {count}")
+                    lines.append(f"{prefix}_{name}_bucket{labels_text(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{prefix}_{name}_sum{labels_text(labels)} {histogram.sum}")
+                    lines.append(f"{prefix}_{name}_count{labels_text(labels)} {histogram.count}")
+
+            fields = sorted({
+                field for details in self.steps.values() for field, value in details.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            })
+            for field in fields:
+                lines.append(f"# TYPE {prefix}_step_{field} gauge")
+                for step, details in sorted(self.steps.items()):
+                    value = details.get(field)
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        lines.append(f"{prefix}_step_{field}{labels_text((('step', step),))} {value}")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+# Process-wide registry shared by the API client, the loader and the ETL runner
+metrics = RunMetrics()
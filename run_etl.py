@@ -1,191 +1,568 @@
 #!/usr/bin/env python3
 
-import subprocess
+import argparse
+import importlib
 import logging
 import sys
 import os
+import re
+import json
+import signal
+import threading
 from pathlib import Path
 import time
 import psycopg2
-from datetime import datetime
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
+from data_pipeline import fetch_data
+from data_pipeline.metrics import metrics
 
 # Load environment variables
 load_dotenv()
 
+# Run report configuration
+ETL_REPORT_PATH = os.getenv("ETL_REPORT_PATH", "logs/etl_run_report.json")  # JSON report written after every run
+ETL_PROMETHEUS_PATH = os.getenv("ETL_PROMETHEUS_PATH")  # Optional Prometheus text file (node_exporter textfile format)
+ETL_PROFILE = os.getenv("ETL_PROFILE", "false").lower() == "true"  # Run DML under EXPLAIN (ANALYZE, BUFFERS)
+ETL_NOTIFY_CHANNEL = "etl_completed"  # NOTIFY channel signalled after every successful run, e.g. for analytics/service.py
+
+# Daemon mode configuration
+DAEMON_POLL_INTERVAL = int(os.getenv("DAEMON_POLL_INTERVAL", "60"))  # Seconds between match list polls
+DAEMON_STEPS = os.getenv(  # Steps run as a micro-batch after a poll staged new matches
+    "DAEMON_STEPS",
+    "enrich_players,dim_players,partitions,fact_matches,dim_teams,"
+    "fact_team_match_stats,fact_player_match_stats,rollups",
+).split(",")
+
+# Statements that can be profiled with EXPLAIN ANALYZE (they run exactly as they would without it)
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+# Comments, which may precede a statement or fill a fragment between two of them
+SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# Row counters for each DML command, keyed by the command tag / ModifyTable operation
+ROW_FIELDS = {
+    "INSERT": "rows_inserted",  # Includes rows changed by ON CONFLICT DO UPDATE unless profiling
+    "UPDATE": "rows_updated",
+    "DELETE": "rows_deleted",
+    "SELECT": "rows_returned",
+}
+
+# Buffer counters reported by EXPLAIN (BUFFERS) on the plan root, which include all child nodes
+BUFFER_FIELDS = {
+    "Shared Hit Blocks": "shared_hit_blocks",
+    "Shared Read Blocks": "shared_read_blocks",
+    "Shared Dirtied Blocks": "shared_dirtied_blocks",
+    "Shared Written Blocks": "shared_written_blocks",
+    "Temp Read Blocks": "temp_read_blocks",
+    "Temp Written Blocks": "temp_written_blocks",
+    "I/O Read Time": "io_read_ms",
+    "I/O Write Time": "io_write_ms",
+}
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
     handlers=[
         logging.FileHandler('etl.log'),
         logging.StreamHandler(sys.stdout)
     ]
 )
 
+# Pipeline steps in declaration (topological) order:
+# (name, kind, target, description, dependencies)
+PIPELINE = [
+    ("schema", "sql", "tables_schema.sql", "Creating database schema", []),
+    ("fetch_data", "python", "data_pipeline.fetch_data", "Fetching data from API", ["schema"]),
+    ("dim_heroes", "sql", "dim_heroes.sql", "Loading heroes dimension", ["fetch_data"]),
+    ("enrich_players", "python", "data_pipeline.enrich_players", "Fetching new and outdated player profiles",
+     ["fetch_data"]),
+    ("dim_players", "sql", "dim_players.sql", "Loading players dimension", ["enrich_players"]),
+    ("partitions", "sql", "partitions.sql", "Creating fact table partitions", ["fetch_data"]),
+    ("fact_matches", "sql", "fact_matches.sql", "Loading matches fact table", ["partitions"]),
+    ("dim_teams", "sql", "dim_teams.sql", "Loading team dimension", ["fact_matches"]),
+    ("fact_team_match_stats", "sql", "fact_team_match_stats.sql", "Loading team match statistics",
+     ["dim_teams"]),
+    ("fact_player_match_stats", "sql", "fact_player_match_stats.sql", "Loading player match statistics",
+     ["dim_heroes", "dim_players", "dim_teams"]),
+    ("rollups", "sql", "rollups.sql", "Refreshing rollups and team statistics",
+     ["fact_team_match_stats", "fact_player_match_stats"]),
+    ("export_snapshot", "python", "data_pipeline.export_snapshot", "Exporting analytics snapshot", ["rollups"]),
+]
+
+def split_sql_statements(sql):
+    """
+    Split a SQL script into individual statements
+    Semicolons inside quotes, dollar-quoted bodies (DO $$ ... $$) and comments
+    do not end a statement
+
+    Args:
+        sql (str): Script text
+
+    Returns:
+        list: Statement texts without the trailing semicolon
+    """
+    statements = []
+    start = i = 0
+    length = len(sql)
+    while i < length:
+        char = sql[i]
+        if sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = length if newline == -1 else newline + 1
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+        elif char in ("'", '"'):
+            end = sql.find(char, i + 1)
+            while end != -1 and sql.startswith(char, end + 1):  # Doubled quote is an escape
+                end = sql.find(char, end + 2)
+            i = length if end == -1 else end + 1
+        elif char == "$":
+            tag = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if tag:
+                end = sql.find(tag.group(), i + len(tag.group()))
+                i = length if end == -1 else end + len(tag.group())
+            else:
+                i += 1
+        elif char == ";":
+            statements.append(sql[start:i])
+            start = i = i + 1
+        else:
+            i += 1
+    statements.append(sql[start:])
+
+    # Drop fragments that hold nothing but whitespace and comments
+    return [statement.strip() for statement in statements if SQL_COMMENT.sub("", statement).strip()]
+
+def plan_stats(plan):
+    """
+    Summarize an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result
+
+    Args:
+        plan (dict): Top-level plan object (the single element of the JSON array)
+
+    Returns:
+        dict: Rows written by the statement, buffer counters and timings
+    """
+    root = plan["Plan"]
+    stats = {
+        "planning_ms": plan.get("Planning Time", 0),
+        "execution_ms": plan.get("Execution Time", 0),
+    }
+    for field, name in BUFFER_FIELDS.items():
+        stats[name] = root.get(field, 0)
+
+    if root.get("Node Type") == "ModifyTable":
+        # Plain DML reports no tuple counts of its own: its input rows are the rows written
+        child = (root.get("Plans") or [{}])[0]
+        written = child.get("Actual Rows", 0) * child.get("Actual Loops", 1)
+        operation = root.get("Operation", "").upper()
+        if operation == "INSERT" and "Tuples Inserted" in root:
+            stats["rows_inserted"] = root["Tuples Inserted"]
+            stats["rows_conflicting"] = root.get("Conflicting Tuples", 0)  # Updated or skipped by ON CONFLICT
+        elif operation in ROW_FIELDS:
+            stats[ROW_FIELDS[operation]] = written
+    else:
+        stats["rows_returned"] = root.get("Actual Rows", 0)
+    return stats
+
 class ETL:
-    def __init__(self):
+    def __init__(self, max_workers=None, profile=ETL_PROFILE):
         self.db_name = os.getenv("POSTGRES_DB", "dota2_analytics")
         self.db_user = os.getenv("POSTGRES_USER", "postgres")
         self.db_password = os.getenv("POSTGRES_PASSWORD")
         self.db_host = os.getenv("POSTGRES_HOST", "db")  # Changed from "localhost" to "db"
         self.scripts_dir = Path("sql_scripts")
-        
-        # Set PGPASSWORD for all child processes
-        os.environ["PGPASSWORD"] = self.db_password
-        
-    def execute_sql(self, script_name, description):
-        """Execute a SQL script and handle errors"""
+        self.max_workers = max_workers or int(os.getenv("ETL_MAX_WORKERS", "4"))
+        self.profile = profile
+        self.pool = None
+
+    def connect(self):
+        """Open a new connection to the analytics database"""
+        return psycopg2.connect(
+            host=self.db_host,
+            dbname=self.db_name,
+            user=self.db_user,
+            password=self.db_password,
+        )
+
+    def execute_sql(self, script_name, description, step_name=None):
+        """Execute a SQL script on a pooled connection, record its statistics and handle errors"""
+        conn = None
         try:
             start_time = time.time()
             logging.info(f"Starting {description}...")
-            
-            result = subprocess.run([
-                "psql",
-                "-h", self.db_host,
-                "-U", self.db_user,
-                "-d", self.db_name,
-                "-f", str(self.scripts_dir / script_name)
-            ], capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logging.error(f"Error in {script_name}: {result.stderr}")
-                raise Exception(f"SQL script {script_name} failed")
-            
+
+            sql = (self.scripts_dir / script_name).read_text()
+            conn = self.pool.getconn()
+            conn.autocommit = True  # Scripts manage their own transactions
+            totals = {}
+            statements = []
+            with conn.cursor() as cursor:
+                # One statement at a time so each reports its own row count and timing
+                for statement in split_sql_statements(sql):
+                    stats = self.execute_statement(cursor, statement)
+                    statements.append(stats)
+                    for field, value in stats.items():
+                        if isinstance(value, (int, float)) and field != "statement":
+                            totals[field] = totals.get(field, 0) + value
+
             duration = time.time() - start_time
+            metrics.record_step(step_name or Path(script_name).stem, statement_count=len(statements),
+                                statements=statements, **totals)
             logging.info(f"Completed {description} in {duration:.2f} seconds")
             return True
-            
+
         except Exception as e:
             logging.error(f"Failed to execute {script_name}: {str(e)}")
+            if conn is not None and not conn.closed:
+                # conn.rollback() is a no-op under autocommit, so end the script's own BEGIN
+                # explicitly; the next step must not borrow an aborted transaction
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("ROLLBACK")
+                except psycopg2.Error:
+                    conn.close()
             return False
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=conn.closed != 0)
+
+    def execute_statement(self, cursor, statement):
+        """
+        Execute one statement, under EXPLAIN (ANALYZE, BUFFERS) when profiling
+
+        Returns:
+            dict: Statement summary with its duration and row/buffer statistics
+        """
+        start_time = time.time()
+        code = " ".join(SQL_COMMENT.sub("", statement).split())
+        stats = {"statement": code[:120]}
+
+        if self.profile and EXPLAINABLE.match(code):
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            stats.update(plan_stats(plan[0]))
+        else:
+            cursor.execute(statement)
+            command = (cursor.statusmessage or "").split(" ", 1)[0]
+            if command in ROW_FIELDS and cursor.rowcount >= 0:
+                stats[ROW_FIELDS[command]] = cursor.rowcount
+
+        stats["duration_seconds"] = round(time.time() - start_time, 4)
+        return stats
 
     def wait_for_postgres(self, max_retries=30, delay=2):
         """Wait for PostgreSQL to be ready"""
         logging.info("Waiting for PostgreSQL to be ready...")
-        
+
         for attempt in range(max_retries):
             try:
-                result = subprocess.run([
-                    "psql",
-                    "-h", self.db_host,
-                    "-U", self.db_user,
-                    "-d", self.db_name,
-                    "-c", "SELECT 1"
-                ], capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    logging.info("PostgreSQL is ready!")
-                    return True
-                    
-            except Exception:
+                self.connect().close()
+                logging.info("PostgreSQL is ready!")
+                return True
+
+            except psycopg2.OperationalError:
                 pass
-            
+
             logging.info(f"PostgreSQL not ready, waiting {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
             time.sleep(delay)
-        
+
         logging.error("PostgreSQL failed to become ready")
         return False
 
-    def run(self):
-        """Execute the full ETL pipeline in the correct order"""
+    def select_steps(self, only=None, start_from=None):
+        """
+        Pick the pipeline steps to run
+
+        Args:
+            only (list): Run exactly these steps
+            start_from (str): Run this step and every step declared after it
+
+        Returns:
+            list: Selected PIPELINE entries, in declaration order
+        """
+        names = [step[0] for step in PIPELINE]
+        for name in (only or []) + ([start_from] if start_from else []):
+            if name not in names:
+                raise ValueError(f"Unknown step '{name}', expected one of: {', '.join(names)}")
+
+        if only:
+            return [step for step in PIPELINE if step[0] in only]
+        if start_from:
+            return PIPELINE[names.index(start_from):]
+        return list(PIPELINE)
+
+    def run_step(self, step):
+        """Run a single pipeline step and return (success, duration)"""
+        name, kind, target, description, _ = step
+        start_time = time.time()
+        if kind == "sql":
+            success = self.execute_sql(target, description, step_name=name)
+        else:
+            success = self.run_python_step(target, description)
+
+        duration = time.time() - start_time
+        metrics.record_step(name, kind=kind, success=success, duration_seconds=round(duration, 3))
+        return success, duration
+
+    def run_steps(self, steps):
+        """
+        Run steps as a dependency graph: every step starts as soon as all of its
+        selected dependencies have finished, so independent steps run concurrently
+
+        Returns:
+            dict: Step name -> duration in seconds, or None if a step failed
+        """
+        selected = {step[0] for step in steps}
+        pending = list(steps)
+        running = {}
+        durations = {}
+        failed = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="step") as executor:
+            while (pending and not failed) or running:
+                if not failed:
+                    for step in list(pending):
+                        name, _, _, _, depends_on = step
+                        if all(dep in durations or dep not in selected for dep in depends_on):
+                            running[executor.submit(self.run_step, step)] = name
+                            pending.remove(step)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    success, duration = future.result()
+                    if success:
+                        durations[name] = duration
+                    else:
+                        logging.error(f"Step {name} failed, not starting remaining steps")
+                        failed = True
+
+        return None if failed else durations
+
+    def log_critical_path(self, steps, durations, wall_time):
+        """Log the longest dependency chain, which bounds the pipeline's wall-clock time"""
+        selected = {step[0] for step in steps}
+        finish = {}
+        previous = {}
+        for name, _, _, _, depends_on in steps:
+            deps = [dep for dep in depends_on if dep in selected]
+            slowest = max(deps, key=lambda dep: finish[dep], default=None)
+            previous[name] = slowest
+            finish[name] = durations[name] + (finish[slowest] if slowest else 0)
+
+        step = max(finish, key=finish.get)
+        path = []
+        while step:
+            path.append(step)
+            step = previous[step]
+
+        logging.info(f"Critical path: {' -> '.join(reversed(path))} ({finish[path[0]]:.2f} seconds)")
+        logging.info(f"Wall clock {wall_time:.2f} seconds, sum of step times {sum(durations.values()):.2f} seconds")
+        return list(reversed(path))
+
+    def run(self, only=None, start_from=None):
+        """Execute the ETL pipeline, running independent steps concurrently"""
         try:
+            steps = self.select_steps(only, start_from)
+
             # Wait for PostgreSQL to be ready
             if not self.wait_for_postgres():
                 sys.exit(1)
 
-            # Step 1: Create schema and tables
-            if not self.execute_sql("tables_schema.sql", "Creating database schema"):
-                sys.exit(1)
+            self.pool = ThreadedConnectionPool(
+                1, self.max_workers,
+                host=self.db_host,
+                dbname=self.db_name,
+                user=self.db_user,
+                password=self.db_password,
+            )
 
-            # Step 2: Fetch raw data from API
-            if not self.run_python_script("data_pipeline/fetch_data.py", "Fetching data from API"):
+            start_time = time.time()
+            durations = self.run_steps(steps)
+            if durations is None:
                 sys.exit(1)
 
-            # Step 3: Load dimension tables that don't depend on facts
-            if not self.execute_sql("dim_heroes.sql", "Loading heroes dimension"):
-                sys.exit(1)
-                
-            if not self.execute_sql("dim_players.sql", "Loading players dimension"):
-                sys.exit(1)
+            critical_path = self.log_critical_path(steps, durations, time.time() - start_time)
+            metrics.record_step("pipeline", critical_path=critical_path)
+            self.notify_completed()
+            logging.info("ETL pipeline completed successfully!")
 
-            # Step 4: Load fact matches
-            if not self.execute_sql("fact_matches.sql", "Loading matches fact table"):
-                sys.exit(1)
+        except Exception as e:
+            logging.error(f"ETL pipeline failed: {str(e)}")
+            sys.exit(1)
+        finally:
+            if self.pool is not None:
+                self.pool.closeall()
+            self.write_report()
 
-            # Step 5: Initial team dimension load
-            if not self.execute_sql("dim_teams.sql", "Initial team dimension load"):
-                sys.exit(1)
+    def run_daemon(self, poll_interval=DAEMON_POLL_INTERVAL, max_cycles=None):
+        """
+        Keep the pipeline running: after one full run, poll the tracked teams'
+        match lists every `poll_interval` seconds and run the DAEMON_STEPS
+        micro-batch whenever a poll staged new matches. The process, connection
+        pool, HTTP session and rate limiter stay alive between cycles.
+        SIGTERM/SIGINT stop the daemon after the current cycle, and so does
+        reaching `max_cycles` polls when it is set (e.g. in tests)
+        """
+        stop = threading.Event()
+        handlers = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
 
-            # Step 6: Load team match statistics
-            if not self.execute_sql("fact_team_match_stats.sql", "Loading team match statistics"):
-                sys.exit(1)
+        try:
+            steps = self.select_steps(only=DAEMON_STEPS)
 
-            # Step 7: Update team dimension with statistics
-            if not self.execute_sql("dim_teams.sql", "Updating team statistics"):
+            if not self.wait_for_postgres():
                 sys.exit(1)
 
-            # Step 8: Load remaining fact tables
-            if not self.execute_sql("fact_player_match_stats.sql", "Loading player match statistics"):
+            self.pool = ThreadedConnectionPool(
+                1, self.max_workers,
+                host=self.db_host,
+                dbname=self.db_name,
+                user=self.db_user,
+                password=self.db_password,
+            )
+
+            # Creates the schema, does the initial load and catches up on anything staged while stopped
+            if self.run_steps(self.select_steps()) is None:
                 sys.exit(1)
+            self.notify_completed()
+            self.write_report()
+            logging.info(f"Daemon started, polling every {poll_interval} seconds")
 
-            logging.info("ETL pipeline completed successfully!")
+            fetch_config = fetch_data.FetchConfig.from_env()
+            next_poll = time.time() + poll_interval
+            cycles = 0
+            while cycles != max_cycles and not stop.wait(max(0.0, next_poll - time.time())):
+                next_poll = time.time() + poll_interval
+                self.run_cycle(fetch_config, steps)
+                self.write_report()
+                cycles += 1
+
+            logging.info("Daemon stopped")
 
         except Exception as e:
-            logging.error(f"ETL pipeline failed: {str(e)}")
+            logging.error(f"ETL daemon failed: {str(e)}")
             sys.exit(1)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            if self.pool is not None:
+                self.pool.closeall()
+            self.write_report()
+
+    def run_cycle(self, fetch_config, steps):
+        """
+        One daemon cycle: stage new matches, then load them into the fact tables.
+        A failed cycle is logged and retried at the next poll, since every step is
+        incremental and resumes from its watermark
+
+        Returns:
+            int: Number of new matches loaded
+        """
+        start_time = time.time()
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            conn.autocommit = False
+            stored = fetch_data.poll(fetch_config, connection=conn)
+        except Exception as e:
+            logging.error(f"Poll failed: {str(e)}")
+            return 0
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=conn.closed != 0)
+
+        metrics.inc("daemon_polls")
+        if not stored:
+            metrics.observe("daemon_cycle_seconds", time.time() - start_time, stage="poll")
+            return 0
+
+        if self.run_steps(steps) is None:
+            logging.error("Micro-batch failed, retrying at the next poll")
+            return 0
+
+        self.notify_completed()
+        duration = time.time() - start_time
+        metrics.inc("daemon_matches_loaded", stored)
+        metrics.observe("daemon_cycle_seconds", duration, stage="micro_batch")
+        logging.info(f"Loaded {stored} new matches into the fact tables in {duration:.2f} seconds")
+        return stored
 
-    def run_python_script(self, script_name, description):
-        """Execute a Python script and handle errors"""
+    def notify_completed(self):
+        """Signal ETL_NOTIFY_CHANNEL so listeners drop results computed from the previous data"""
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"NOTIFY {ETL_NOTIFY_CHANNEL}")
+        except psycopg2.Error as e:
+            logging.error(f"Failed to notify {ETL_NOTIFY_CHANNEL}: {str(e)}")
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=conn.closed != 0)
+
+    def write_report(self):
+        """Write the run report (and the Prometheus file when configured)"""
+        try:
+            metrics.write_json(ETL_REPORT_PATH, finished_at=time.time(), profile=self.profile,
+                               wall_seconds=round(time.time() - metrics.started_at, 3))
+            logging.info(f"Run report written to {ETL_REPORT_PATH}")
+            if ETL_PROMETHEUS_PATH:
+                metrics.write_prometheus(ETL_PROMETHEUS_PATH)
+        except OSError as e:
+            logging.error(f"Failed to write run report: {str(e)}")
+
+    def run_python_step(self, module_name, description):
+        """Run a Python pipeline module's run() in-process on a pooled connection"""
+        conn = None
         try:
             start_time = time.time()
             logging.info(f"Starting {description}...")
-            
-            # Pass environment variables to the child process
-            env = os.environ.copy()
-            env['PYTHONUNBUFFERED'] = '1'  # Force unbuffered output
-            
-            # Run the script and stream output in real-time
-            process = subprocess.Popen([
-                "python3", "-u",  # -u flag forces unbuffered output
-                script_name
-            ], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-               text=True, bufsize=1, universal_newlines=True)
-            
-            # Print output in real-time
-            while True:
-                output = process.stdout.readline()
-                if output:
-                    print(output.strip(), flush=True)
-                
-                error = process.stderr.readline()
-                if error:
-                    print(error.strip(), file=sys.stderr, flush=True)
-                
-                # Check if process has finished
-                if process.poll() is not None:
-                    # Get any remaining output
-                    remaining_output, remaining_error = process.communicate()
-                    if remaining_output:
-                        print(remaining_output.strip(), flush=True)
-                    if remaining_error:
-                        print(remaining_error.strip(), file=sys.stderr, flush=True)
-                    break
-            
-            # Get the return code
-            return_code = process.wait()
-            
-            if return_code != 0:
-                raise Exception(f"Python script {script_name} failed")
-            
+
+            module = importlib.import_module(module_name)
+            conn = self.pool.getconn()
+            conn.autocommit = False  # Loaders commit their own batches
+            module.run(connection=conn)
+
             duration = time.time() - start_time
             logging.info(f"Completed {description} in {duration:.2f} seconds")
             return True
-            
+
         except Exception as e:
-            logging.error(f"Failed to execute {script_name}: {str(e)}")
+            logging.error(f"Failed to execute {module_name}: {str(e)}")
             return False
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=conn.closed != 0)
+
+def parse_args():
+    """Parse command line options for step selection"""
+    parser = argparse.ArgumentParser(description="Run the Dota 2 analytics ETL pipeline")
+    step_names = [step[0] for step in PIPELINE]
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--only", help=f"Comma-separated steps to run ({', '.join(step_names)})")
+    selection.add_argument("--from", dest="start_from", metavar="STEP",
+                           help="Run this step and every step declared after it")
+    parser.add_argument("--workers", type=int, help="Maximum number of steps running at once")
+    parser.add_argument("--profile", action="store_true", default=ETL_PROFILE,
+                        help="Run SQL statements under EXPLAIN (ANALYZE, BUFFERS) and report buffer/IO stats")
+    selection.add_argument("--daemon", action="store_true",
+                           help="Keep running: poll for new matches and load them in micro-batches")
+    parser.add_argument("--poll-interval", type=int, default=DAEMON_POLL_INTERVAL,
+                        help="Seconds between polls in daemon mode")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    etl = ETL()
-    etl.run() 
\ No newline at end of file
+    args = parse_args()
+    etl = ETL(max_workers=args.workers, profile=args.profile)
+    if args.daemon:
+        etl.run_daemon(args.poll_interval)
+    else:
+        etl.run(only=args.only.split(",") if args.only else None, start_from=args.start_from)
@@ -1,4 +1,10 @@
--- First, insert teams from fact_matches and stg_teams
+-- Insert teams from fact_matches and stg_teams
+BEGIN;
+
+-- Reads fact_matches, so it waits for partition DDL like the fact transforms
+-- (fetch_data.PARTITION_LOCK)
+SELECT pg_advisory_xact_lock_shared(3, 0);
+
 INSERT INTO dim_teams (team_id, team_name, region)
 SELECT DISTINCT 
     teams.id,
@@ -20,71 +26,4 @@ ON CONFLICT (team_id) DO UPDATE SET
     team_name = EXCLUDED.team_name,
     region = EXCLUDED.region;
 
--- Then, insert team match statistics for radiant teams
-INSERT INTO fact_team_match_stats (match_id, team_id, total_kills, total_deaths, total_assists, 
-                                 gold_earned, gold_spent, xp_earned, tower_kills, roshan_kills, win_flag)
-SELECT 
-    m.match_id,
-    m.radiant_team_id,
-    SUM(pms.kills) as total_kills,
-    SUM(pms.deaths) as total_deaths,
-    SUM(pms.assists) as total_assists,
-    SUM(pms.total_gold) as gold_earned,
-    0 as gold_spent,
-    SUM(pms.total_xp) as xp_earned,
-    SUM(pms.tower_kills) as tower_kills,
-    0 as roshan_kills,
-    m.radiant_win as win_flag
-FROM fact_matches m
-JOIN fact_player_match_stats pms ON m.match_id = pms.match_id
-GROUP BY m.match_id, m.radiant_team_id, m.radiant_win
-HAVING COUNT(*) <= 5;
-
--- And insert team match statistics for dire teams
-INSERT INTO fact_team_match_stats (match_id, team_id, total_kills, total_deaths, total_assists, 
-                                 gold_earned, gold_spent, xp_earned, tower_kills, roshan_kills, win_flag)
-SELECT 
-    m.match_id,
-    m.dire_team_id,
-    SUM(pms.kills) as total_kills,
-    SUM(pms.deaths) as total_deaths,
-    SUM(pms.assists) as total_assists,
-    SUM(pms.total_gold) as gold_earned,
-    0 as gold_spent,
-    SUM(pms.total_xp) as xp_earned,
-    SUM(pms.tower_kills) as tower_kills,
-    0 as roshan_kills,
-    NOT m.radiant_win as win_flag
-FROM fact_matches m
-JOIN fact_player_match_stats pms ON m.match_id = pms.match_id
-GROUP BY m.match_id, m.dire_team_id, m.radiant_win
-HAVING COUNT(*) <= 5;
-
--- Finally, update team statistics
-UPDATE dim_teams t SET
-    total_matches = s.match_count,
-    win_count = s.wins,
-    loss_count = s.losses,
-    avg_match_gold = s.avg_gold,
-    avg_match_xp = s.avg_xp,
-    avg_match_kills = s.avg_kills,
-    avg_match_deaths = s.avg_deaths,
-    avg_match_kda = CASE 
-        WHEN s.avg_deaths = 0 THEN s.avg_kills::numeric 
-        ELSE ((s.avg_kills + s.avg_assists) / s.avg_deaths)::numeric 
-    END
-FROM (
-    SELECT 
-        team_id,
-        COUNT(*) as match_count,
-        SUM(CASE WHEN win_flag THEN 1 ELSE 0 END) as wins,
-        SUM(CASE WHEN NOT win_flag THEN 1 ELSE 0 END) as losses,
-        ROUND(AVG(gold_earned)::numeric, 2) as avg_gold,
-        ROUND(AVG(xp_earned)::numeric, 2) as avg_xp,
-        ROUND(AVG(total_kills)::numeric, 2) as avg_kills,
-        ROUND(AVG(total_deaths)::numeric, 2) as avg_deaths,
-        ROUND(AVG(total_assists)::numeric, 2) as avg_assists
-    FROM fact_team_match_stats
-    GROUP BY team_id
-) s
-WHERE t.team_id = s.team_id; 
\ No newline at end of file
+COMMIT;
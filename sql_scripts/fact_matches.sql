@@ -1,9 +1,33 @@
--- Temporarily disable foreign key constraints
-ALTER TABLE fact_team_match_stats DROP CONSTRAINT IF EXISTS fact_team_match_stats_match_id_fkey;
-ALTER TABLE fact_player_match_stats DROP CONSTRAINT IF EXISTS fact_player_match_stats_match_id_fkey;
+-- Incremental load: only stg_matches rows staged since the last successful run
+-- are transformed, so foreign keys on the child fact tables stay in place
+BEGIN;
 
--- Clear existing data
-TRUNCATE TABLE fact_matches;
+INSERT INTO etl_watermarks (step_name) VALUES ('fact_matches') ON CONFLICT (step_name) DO NOTHING;
+
+-- Lock the watermark so concurrent runs cannot process the same batch, and
+-- fix the upper bound up front so rows staged during this run wait for the next one.
+-- Bounded by the matches partitions.sql has already created partitions for
+SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'fact_matches' FOR UPDATE;
+
+-- Held before touching the fact tables, see ensure_monthly_partitions (fetch_data.PARTITION_LOCK)
+SELECT pg_advisory_xact_lock_shared(3, 0);
+
+CREATE TEMP TABLE fact_matches_batch ON COMMIT DROP AS
+SELECT 
+    w.last_stg_seq AS from_seq,
+    GREATEST(w.last_stg_seq, COALESCE(p.last_stg_seq, 0)) AS to_seq
+FROM etl_watermarks w
+LEFT JOIN etl_watermarks p ON p.step_name = 'partitions'
+WHERE w.step_name = 'fact_matches';
+
+-- match_id stays unique although the key includes the partition key: a match
+-- staged again with another start_time loses its old row, and with it its team
+-- and player rows (ON DELETE CASCADE), which the later steps reload from this batch
+DELETE FROM fact_matches f
+USING stg_matches, fact_matches_batch b
+WHERE stg_matches.stg_seq > b.from_seq AND stg_matches.stg_seq <= b.to_seq
+    AND f.match_id = stg_matches.match_id
+    AND f.start_time IS DISTINCT FROM stg_matches.start_time;
 
 -- Insert only new match data
 INSERT INTO fact_matches (
@@ -19,27 +43,22 @@ INSERT INTO fact_matches (
     version, 
     patch
 )
-SELECT DISTINCT ON ((raw_json->>'match_id')::BIGINT)
-    (raw_json->>'match_id')::BIGINT AS match_id,
-    (raw_json->>'start_time')::BIGINT AS start_time,
-    (raw_json->>'duration')::INT AS duration,
-    (raw_json->>'game_mode')::INT AS game_mode,
-    (raw_json->>'radiant_team_id')::INT AS radiant_team_id,      
-    (raw_json->>'dire_team_id')::INT AS dire_team_id,       
-    (raw_json->>'first_blood_time')::INT AS first_blood_time,
-    jsonb_array_length(raw_json->'teamfights') AS team_fights,
-    (raw_json->>'radiant_win')::BOOLEAN AS radiant_win,
-    (raw_json->>'version')::INT AS version,
-    (raw_json->>'patch')::INT AS patch
+SELECT
+    stg_matches.match_id,
+    stg_matches.start_time,
+    stg_matches.duration,
+    stg_matches.game_mode,
+    stg_matches.radiant_team_id,
+    stg_matches.dire_team_id,
+    stg_matches.first_blood_time,
+    stg_matches.team_fights,
+    stg_matches.radiant_win,
+    stg_matches.version,
+    stg_matches.patch
 FROM stg_matches
-WHERE (raw_json->>'match_id') IS NOT NULL
-AND NOT EXISTS (
-    SELECT 1 
-    FROM fact_matches fm 
-    WHERE fm.match_id = (raw_json->>'match_id')::BIGINT
-)
-ON CONFLICT (match_id) DO UPDATE SET
-    start_time = EXCLUDED.start_time,
+JOIN fact_matches_batch b ON stg_matches.stg_seq > b.from_seq AND stg_matches.stg_seq <= b.to_seq
+WHERE stg_matches.start_time IS NOT NULL  -- Partition key
+ON CONFLICT (match_id, start_time) DO UPDATE SET
     duration = EXCLUDED.duration,
     game_mode = EXCLUDED.game_mode,
     radiant_team_id = EXCLUDED.radiant_team_id,
@@ -50,20 +69,16 @@ ON CONFLICT (match_id) DO UPDATE SET
     version = EXCLUDED.version,
     patch = EXCLUDED.patch;
 
--- Restore foreign key constraints
-ALTER TABLE fact_team_match_stats 
-ADD CONSTRAINT fact_team_match_stats_match_id_fkey 
-FOREIGN KEY (match_id) REFERENCES fact_matches(match_id) ON DELETE CASCADE;
-
-ALTER TABLE fact_player_match_stats 
-ADD CONSTRAINT fact_player_match_stats_match_id_fkey 
-FOREIGN KEY (match_id) REFERENCES fact_matches(match_id) ON DELETE CASCADE;
-
 -- Verify the newly added data
 SELECT COUNT(*) AS new_matches 
-FROM fact_matches fm
-WHERE NOT EXISTS (
-    SELECT 1 
-    FROM fact_team_match_stats ftms 
-    WHERE ftms.match_id = fm.match_id
-);
+FROM stg_matches
+JOIN fact_matches_batch b ON stg_matches.stg_seq > b.from_seq AND stg_matches.stg_seq <= b.to_seq;
+
+-- Advance the watermark past the processed batch
+UPDATE etl_watermarks w SET
+    last_stg_seq = b.to_seq,
+    updated_at = CURRENT_TIMESTAMP
+FROM fact_matches_batch b
+WHERE w.step_name = 'fact_matches';
+
+COMMIT;
@@ -1,3 +1,55 @@
+-- Incremental load: only matches staged since the last successful run are
+-- read, bounded by what fact_matches has already loaded (and created partitions for)
+BEGIN;
+
+INSERT INTO etl_watermarks (step_name) VALUES ('fact_player_match_stats') ON CONFLICT (step_name) DO NOTHING;
+
+-- Lock the watermark so concurrent runs cannot process the same batch
+SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'fact_player_match_stats' FOR UPDATE;
+
+-- Held before touching the fact tables, see ensure_monthly_partitions (fetch_data.PARTITION_LOCK)
+SELECT pg_advisory_xact_lock_shared(3, 0);
+
+CREATE TEMP TABLE fact_player_match_stats_batch ON COMMIT DROP AS
+SELECT 
+    w.last_stg_seq AS from_seq,
+    GREATEST(w.last_stg_seq, COALESCE(fm.last_stg_seq, 0)) AS to_seq
+FROM etl_watermarks w
+LEFT JOIN etl_watermarks fm ON fm.step_name = 'fact_matches'
+WHERE w.step_name = 'fact_player_match_stats';
+
+-- Players staged by a loader that committed after dim_players ran get a stub
+-- row, so the foreign key holds; the next dim_players run fills in the profile
+INSERT INTO dim_players (account_id, player_name)
+SELECT DISTINCT player.account_id, 'Unknown Player'
+FROM stg_matches AS matches
+JOIN fact_player_match_stats_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+JOIN stg_match_players AS player ON player.match_id = matches.match_id
+WHERE player.account_id > 0
+    AND matches.start_time IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM dim_players d WHERE d.account_id = player.account_id)
+ON CONFLICT (account_id) DO NOTHING;
+
+-- Likewise for teams of matches an overlapping run loaded after dim_teams ran
+INSERT INTO dim_teams (team_id, team_name, region)
+SELECT DISTINCT side.team_id, 'Team ' || side.team_id, 'unknown'
+FROM stg_matches AS matches
+JOIN fact_player_match_stats_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+CROSS JOIN LATERAL (VALUES (matches.radiant_team_id), (matches.dire_team_id)) AS side(team_id)
+WHERE side.team_id IS NOT NULL
+    AND matches.start_time IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM dim_teams t WHERE t.team_id = side.team_id)
+ON CONFLICT (team_id) DO NOTHING;
+
+-- A match staged again (e.g. by match_archive rederive) may have lost players;
+-- their rows from the earlier load go
+DELETE FROM fact_player_match_stats f
+USING stg_matches AS matches, fact_player_match_stats_batch b
+WHERE matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+    AND f.match_id = matches.match_id
+    AND NOT EXISTS (SELECT 1 FROM stg_match_players player
+                    WHERE player.match_id = f.match_id AND player.account_id = f.account_id);
+
 -- Insert player match statistics
 INSERT INTO fact_player_match_stats (
     match_id,
@@ -26,49 +78,49 @@ INSERT INTO fact_player_match_stats (
     item_5
 )
 SELECT 
-    (matches.raw_json->>'match_id')::BIGINT AS match_id,
-    (player->>'account_id')::BIGINT AS account_id,
-    (player->>'hero_id')::INT AS hero_id,
-    (matches.raw_json->>'start_time')::BIGINT AS start_time,
+    matches.match_id,
+    player.account_id,
+    player.hero_id,
+    matches.start_time,
     CASE 
-        WHEN (player->>'player_slot')::INT < 128 THEN (matches.raw_json->>'radiant_team_id')::INT
-        ELSE (matches.raw_json->>'dire_team_id')::INT
+        WHEN player.player_slot < 128 THEN matches.radiant_team_id
+        ELSE matches.dire_team_id
     END AS team_id,
     CASE 
-        WHEN (player->>'player_slot')::INT < 128 THEN (matches.raw_json->>'radiant_win')::BOOLEAN
-        ELSE NOT (matches.raw_json->>'radiant_win')::BOOLEAN
+        WHEN player.player_slot < 128 THEN matches.radiant_win
+        ELSE NOT matches.radiant_win
     END AS win_flag,
     CASE 
-        WHEN (player->>'deaths')::INT = 0 THEN ((player->>'kills')::INT + (player->>'assists')::INT)::FLOAT
-        ELSE (((player->>'kills')::INT + (player->>'assists')::INT)::FLOAT / NULLIF((player->>'deaths')::INT, 0))::NUMERIC(10,2)
+        WHEN player.deaths = 0 THEN (player.kills + player.assists)::FLOAT
+        ELSE ((player.kills + player.assists)::FLOAT / NULLIF(player.deaths, 0))::NUMERIC(10,2)
     END AS kda,
-    (player->>'kills')::INT AS kills,
-    (player->>'deaths')::INT AS deaths,
-    (player->>'assists')::INT AS assists,
-    (player->>'total_gold')::INT AS total_gold,
-    (player->>'total_xp')::INT AS total_xp,
-    COALESCE((player->>'tower_kills')::INT, 0) + COALESCE((player->>'ancient_kills')::INT, 0) + COALESCE((player->>'roshan_kills')::INT, 0) AS objectives,
-    COALESCE((player->>'tower_kills')::INT, 0) AS tower_kills,
-    COALESCE((player->>'ancient_kills')::INT, 0) AS ancient_kills,
-    (player->>'kills')::INT AS hero_kills,
-    COALESCE((player->>'hero_damage')::INT, 0) AS hero_damage,
-    COALESCE((player->>'actions_per_min')::INT, 0) AS actions_per_minute,
-    COALESCE((player->>'item_0')::INT, 0) AS item_0,
-    COALESCE((player->>'item_1')::INT, 0) AS item_1,
-    COALESCE((player->>'item_2')::INT, 0) AS item_2,
-    COALESCE((player->>'item_3')::INT, 0) AS item_3,
-    COALESCE((player->>'item_4')::INT, 0) AS item_4,
-    COALESCE((player->>'item_5')::INT, 0) AS item_5
+    player.kills,
+    player.deaths,
+    player.assists,
+    player.total_gold,
+    player.total_xp,
+    COALESCE(player.tower_kills, 0) + COALESCE(player.ancient_kills, 0) + COALESCE(player.roshan_kills, 0) AS objectives,
+    COALESCE(player.tower_kills, 0) AS tower_kills,
+    COALESCE(player.ancient_kills, 0) AS ancient_kills,
+    player.kills AS hero_kills,
+    COALESCE(player.hero_damage, 0) AS hero_damage,
+    COALESCE(player.actions_per_min, 0) AS actions_per_minute,
+    COALESCE(player.item_0, 0) AS item_0,
+    COALESCE(player.item_1, 0) AS item_1,
+    COALESCE(player.item_2, 0) AS item_2,
+    COALESCE(player.item_3, 0) AS item_3,
+    COALESCE(player.item_4, 0) AS item_4,
+    COALESCE(player.item_5, 0) AS item_5
 FROM stg_matches AS matches
-CROSS JOIN LATERAL jsonb_array_elements(matches.raw_json->'players') AS player
+JOIN fact_player_match_stats_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+JOIN stg_match_players AS player ON player.match_id = matches.match_id
 WHERE 
-    (matches.raw_json->>'match_id') IS NOT NULL
-    AND (player->>'account_id') IS NOT NULL
-    AND (player->>'account_id')::BIGINT > 0  -- Filter out anonymous players
+    player.account_id IS NOT NULL
+    AND player.account_id > 0  -- Filter out anonymous players
+    AND matches.start_time IS NOT NULL  -- Partition key
 
-ON CONFLICT (match_id, account_id) DO UPDATE SET
+ON CONFLICT (match_id, account_id, start_time) DO UPDATE SET
     hero_id = EXCLUDED.hero_id,
-    start_time = EXCLUDED.start_time,
     team_id = EXCLUDED.team_id,
     win_flag = EXCLUDED.win_flag,
     kda = EXCLUDED.kda,
@@ -88,7 +140,36 @@ ON CONFLICT (match_id, account_id) DO UPDATE SET
     item_2 = EXCLUDED.item_2,
     item_3 = EXCLUDED.item_3,
     item_4 = EXCLUDED.item_4,
-    item_5 = EXCLUDED.item_5;
+    item_5 = EXCLUDED.item_5
+-- Skip rewriting rows whose values did not change
+WHERE (
+    fact_player_match_stats.hero_id, fact_player_match_stats.team_id,
+    fact_player_match_stats.win_flag, fact_player_match_stats.kda, fact_player_match_stats.kills,
+    fact_player_match_stats.deaths, fact_player_match_stats.assists, fact_player_match_stats.total_gold,
+    fact_player_match_stats.total_xp, fact_player_match_stats.objectives, fact_player_match_stats.tower_kills,
+    fact_player_match_stats.ancient_kills, fact_player_match_stats.hero_kills, fact_player_match_stats.hero_damage,
+    fact_player_match_stats.actions_per_minute, fact_player_match_stats.item_0, fact_player_match_stats.item_1,
+    fact_player_match_stats.item_2, fact_player_match_stats.item_3, fact_player_match_stats.item_4,
+    fact_player_match_stats.item_5
+) IS DISTINCT FROM (
+    EXCLUDED.hero_id, EXCLUDED.team_id,
+    EXCLUDED.win_flag, EXCLUDED.kda, EXCLUDED.kills,
+    EXCLUDED.deaths, EXCLUDED.assists, EXCLUDED.total_gold,
+    EXCLUDED.total_xp, EXCLUDED.objectives, EXCLUDED.tower_kills,
+    EXCLUDED.ancient_kills, EXCLUDED.hero_kills, EXCLUDED.hero_damage,
+    EXCLUDED.actions_per_minute, EXCLUDED.item_0, EXCLUDED.item_1,
+    EXCLUDED.item_2, EXCLUDED.item_3, EXCLUDED.item_4,
+    EXCLUDED.item_5
+);
 
 -- Verify the updated data
-SELECT * FROM fact_player_match_stats ORDER BY match_id, account_id LIMIT 10;
\ No newline at end of file
+SELECT * FROM fact_player_match_stats ORDER BY match_id, account_id LIMIT 10;
+
+-- Advance the watermark past the processed batch
+UPDATE etl_watermarks w SET
+    last_stg_seq = b.to_seq,
+    updated_at = CURRENT_TIMESTAMP
+FROM fact_player_match_stats_batch b
+WHERE w.step_name = 'fact_player_match_stats';
+
+COMMIT;
@@ -1,19 +1,42 @@
--- Clear existing data (optional) - uncomment if needed
--- TRUNCATE TABLE fact_team_match_stats;
+-- Incremental load: only matches staged since the last successful run are
+-- read, bounded by what fact_matches has already loaded.
+-- The normalized players of each match are aggregated once for both sides
+-- with FILTER, then split into a radiant row and a dire row
+BEGIN;
+
+INSERT INTO etl_watermarks (step_name) VALUES ('fact_team_match_stats') ON CONFLICT (step_name) DO NOTHING;
+
+-- Lock the watermark so concurrent runs cannot process the same batch
+SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'fact_team_match_stats' FOR UPDATE;
+
+-- Held before touching the fact tables, see ensure_monthly_partitions (fetch_data.PARTITION_LOCK)
+SELECT pg_advisory_xact_lock_shared(3, 0);
+
+CREATE TEMP TABLE fact_team_match_stats_batch ON COMMIT DROP AS
+SELECT
+    w.last_stg_seq AS from_seq,
+    GREATEST(w.last_stg_seq, COALESCE(fm.last_stg_seq, 0)) AS to_seq
+FROM etl_watermarks w
+LEFT JOIN etl_watermarks fm ON fm.step_name = 'fact_matches'
+WHERE w.step_name = 'fact_team_match_stats';
+
+-- An overlapping ETL run may have loaded matches into fact_matches after this
+-- run's dim_teams step. Their teams get a stub row, so the foreign key holds;
+-- the next dim_teams run fills in the name
+INSERT INTO dim_teams (team_id, team_name, region)
+SELECT DISTINCT side.team_id, 'Team ' || side.team_id, 'unknown'
+FROM stg_matches AS matches
+JOIN fact_team_match_stats_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+CROSS JOIN LATERAL (VALUES (matches.radiant_team_id), (matches.dire_team_id)) AS side(team_id)
+WHERE side.team_id IS NOT NULL
+    AND matches.start_time IS NOT NULL
+    AND NOT EXISTS (SELECT 1 FROM dim_teams t WHERE t.team_id = side.team_id)
+ON CONFLICT (team_id) DO NOTHING;
 
--- Insert team match statistics only for new matches
-WITH new_matches AS (
-    SELECT match_id 
-    FROM fact_matches fm
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM fact_team_match_stats ftms 
-        WHERE ftms.match_id = fm.match_id
-    )
-)
 INSERT INTO fact_team_match_stats (
     match_id,
     team_id,
+    start_time,
     total_kills,
     total_deaths,
     total_assists,
@@ -24,77 +47,65 @@ INSERT INTO fact_team_match_stats (
     roshan_kills,
     win_flag
 )
--- RADIANT TEAM STATS for new matches
 SELECT 
-    (matches.raw_json->>'match_id')::BIGINT AS match_id, 
-    (matches.raw_json->>'radiant_team_id')::INT AS team_id,
-    (matches.raw_json->>'radiant_score')::INT AS total_kills,
-    (matches.raw_json->>'dire_score')::INT AS total_deaths,
-    (
-        SELECT COALESCE(SUM((player->>'assists')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT < 128
-    ) AS total_assists,
-    (
-        SELECT COALESCE(SUM((player->>'total_gold')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT < 128
-    ) AS gold_earned,
-    (
-        SELECT FLOOR(COALESCE(SUM((player->>'total_gold')::INT), 0) * 0.85)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT < 128
-    ) AS gold_spent,
-    (
-        SELECT COALESCE(SUM((player->>'total_xp')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT < 128
-    ) AS xp_earned,
-    (matches.raw_json->>'tower_status_radiant')::INT AS tower_kills,
-    (matches.raw_json->>'barracks_status_radiant')::INT AS roshan_kills,
-    (matches.raw_json->>'radiant_win')::BOOLEAN AS win_flag
+    matches.match_id,
+    side.team_id,
+    matches.start_time,
+    side.total_kills,
+    side.total_deaths,
+    side.total_assists,
+    side.gold_earned,
+    FLOOR(side.gold_earned * 0.85) AS gold_spent,
+    side.xp_earned,
+    side.tower_kills,
+    side.roshan_kills,
+    side.win_flag
 FROM stg_matches AS matches
-JOIN new_matches nm ON (matches.raw_json->>'match_id')::BIGINT = nm.match_id
-WHERE (matches.raw_json->>'radiant_team_id') IS NOT NULL
-AND (matches.raw_json->>'radiant_team_id')::INT > 0
-
-UNION ALL
-
--- DIRE TEAM STATS for new matches
-SELECT 
-    (matches.raw_json->>'match_id')::BIGINT AS match_id, 
-    (matches.raw_json->>'dire_team_id')::INT AS team_id,
-    (matches.raw_json->>'dire_score')::INT AS total_kills,
-    (matches.raw_json->>'radiant_score')::INT AS total_deaths,
-    (
-        SELECT COALESCE(SUM((player->>'assists')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT >= 128
-    ) AS total_assists,
-    (
-        SELECT COALESCE(SUM((player->>'total_gold')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT >= 128
-    ) AS gold_earned,
-    (
-        SELECT FLOOR(COALESCE(SUM((player->>'total_gold')::INT), 0) * 0.85)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT >= 128
-    ) AS gold_spent,
-    (
-        SELECT COALESCE(SUM((player->>'total_xp')::INT), 0)
-        FROM jsonb_array_elements(matches.raw_json->'players') AS player
-        WHERE (player->>'player_slot')::INT >= 128
-    ) AS xp_earned,
-    (matches.raw_json->>'tower_status_dire')::INT AS tower_kills,
-    (matches.raw_json->>'barracks_status_dire')::INT AS roshan_kills,
-    NOT (matches.raw_json->>'radiant_win')::BOOLEAN AS win_flag
-FROM stg_matches AS matches
-JOIN new_matches nm ON (matches.raw_json->>'match_id')::BIGINT = nm.match_id
-WHERE (matches.raw_json->>'dire_team_id') IS NOT NULL
-AND (matches.raw_json->>'dire_team_id')::INT > 0
+JOIN fact_team_match_stats_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+CROSS JOIN LATERAL (
+    SELECT 
+        COALESCE(SUM(player.assists) FILTER (WHERE player.player_slot < 128), 0) AS radiant_assists,
+        COALESCE(SUM(player.total_gold) FILTER (WHERE player.player_slot < 128), 0) AS radiant_gold,
+        COALESCE(SUM(player.total_xp) FILTER (WHERE player.player_slot < 128), 0) AS radiant_xp,
+        COALESCE(SUM(player.assists) FILTER (WHERE player.player_slot >= 128), 0) AS dire_assists,
+        COALESCE(SUM(player.total_gold) FILTER (WHERE player.player_slot >= 128), 0) AS dire_gold,
+        COALESCE(SUM(player.total_xp) FILTER (WHERE player.player_slot >= 128), 0) AS dire_xp
+    FROM stg_match_players AS player
+    WHERE player.match_id = matches.match_id
+) AS players
+CROSS JOIN LATERAL (
+    VALUES
+        -- RADIANT TEAM STATS
+        (
+            matches.radiant_team_id,
+            matches.radiant_score,
+            matches.dire_score,
+            players.radiant_assists,
+            players.radiant_gold,
+            players.radiant_xp,
+            matches.tower_status_radiant,
+            matches.barracks_status_radiant,
+            matches.radiant_win
+        ),
+        -- DIRE TEAM STATS
+        (
+            matches.dire_team_id,
+            matches.dire_score,
+            matches.radiant_score,
+            players.dire_assists,
+            players.dire_gold,
+            players.dire_xp,
+            matches.tower_status_dire,
+            matches.barracks_status_dire,
+            NOT matches.radiant_win
+        )
+) AS side(team_id, total_kills, total_deaths, total_assists, gold_earned, xp_earned, tower_kills, roshan_kills, win_flag)
+WHERE side.team_id IS NOT NULL
+AND side.team_id > 0
+AND matches.start_time IS NOT NULL  -- Only matches loaded into fact_matches
 
 ON CONFLICT (match_id, team_id) DO UPDATE SET
+    start_time = EXCLUDED.start_time,
     total_kills = EXCLUDED.total_kills,
     total_deaths = EXCLUDED.total_deaths,
     total_assists = EXCLUDED.total_assists,
@@ -106,4 +117,13 @@ ON CONFLICT (match_id, team_id) DO UPDATE SET
     win_flag = EXCLUDED.win_flag;
 
 -- Verify the updated data
-SELECT COUNT(*) AS new_team_match_stats FROM fact_team_match_stats;
\ No newline at end of file
+SELECT COUNT(*) AS new_team_match_stats FROM fact_team_match_stats;
+
+-- Advance the watermark past the processed batch
+UPDATE etl_watermarks w SET
+    last_stg_seq = b.to_seq,
+    updated_at = CURRENT_TIMESTAMP
+FROM fact_team_match_stats_batch b
+WHERE w.step_name = 'fact_team_match_stats';
+
+COMMIT;
@@ -0,0 +1,52 @@
+-- Partition maintenance: creates the monthly partitions of the fact tables for
+-- every month with matches staged since the last run, plus the current and
+-- next month, before the fact transforms insert into them
+BEGIN;
+
+INSERT INTO etl_watermarks (step_name) VALUES ('partitions') ON CONFLICT (step_name) DO NOTHING;
+
+-- Lock the watermark so concurrent runs cannot process the same batch.
+-- fact_matches only loads matches up to this watermark, so a match staged
+-- after this point waits until a later run has created its partition
+SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'partitions' FOR UPDATE;
+
+-- Staging writes hold this lock shared (fetch_data.STAGING_LOCK). Taking it
+-- exclusively waits for the ones in flight, so no stg_seq below MAX(stg_seq)
+-- can still commit after the watermark has passed it
+SELECT pg_advisory_xact_lock(1, 0);
+
+CREATE TEMP TABLE partitions_batch ON COMMIT DROP AS
+SELECT
+    w.last_stg_seq AS from_seq,
+    COALESCE((SELECT MAX(stg_seq) FROM stg_matches), w.last_stg_seq) AS to_seq
+FROM etl_watermarks w
+WHERE w.step_name = 'partitions';
+
+SELECT
+    parent,
+    ensure_monthly_partitions(
+        parent,
+        LEAST(r.min_start_time, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP)::BIGINT),
+        GREATEST(r.max_start_time, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP + INTERVAL '1 month')::BIGINT)
+    ) AS created_partitions
+FROM (
+    SELECT MIN(matches.start_time) AS min_start_time, MAX(matches.start_time) AS max_start_time
+    FROM stg_matches AS matches
+    JOIN partitions_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq
+) r
+CROSS JOIN unnest(ARRAY['fact_matches', 'fact_player_match_stats']) AS parent;
+
+-- Verify the partitions
+SELECT inhparent::regclass AS parent, COUNT(*) AS partitions
+FROM pg_inherits
+WHERE inhparent IN ('fact_matches'::regclass, 'fact_player_match_stats'::regclass)
+GROUP BY inhparent;
+
+-- Advance the watermark past the processed batch
+UPDATE etl_watermarks w SET
+    last_stg_seq = b.to_seq,
+    updated_at = CURRENT_TIMESTAMP
+FROM partitions_batch b
+WHERE w.step_name = 'partitions';
+
+COMMIT;
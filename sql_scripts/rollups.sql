@@ -0,0 +1,169 @@
+-- Incremental rollups: only the team/day, team/hero and team/player rows
+-- touched by matches loaded since the last run are recomputed from the fact
+-- tables; every other rollup row is left as it is
+BEGIN;
+
+INSERT INTO etl_watermarks (step_name) VALUES ('rollups') ON CONFLICT (step_name) DO NOTHING;
+
+-- Lock the watermark so concurrent runs cannot process the same batch
+SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'rollups' FOR UPDATE;
+
+-- Held before touching the fact tables, see ensure_monthly_partitions (fetch_data.PARTITION_LOCK)
+SELECT pg_advisory_xact_lock_shared(3, 0);
+
+-- Bounded by what every fact transform it reads has already loaded
+CREATE TEMP TABLE rollups_batch ON COMMIT DROP AS
+SELECT
+    w.last_stg_seq AS from_seq,
+    GREATEST(w.last_stg_seq, LEAST(
+        COALESCE(fm.last_stg_seq, 0), COALESCE(ft.last_stg_seq, 0), COALESCE(fp.last_stg_seq, 0)
+    )) AS to_seq
+FROM etl_watermarks w
+LEFT JOIN etl_watermarks fm ON fm.step_name = 'fact_matches'
+LEFT JOIN etl_watermarks ft ON ft.step_name = 'fact_team_match_stats'
+LEFT JOIN etl_watermarks fp ON fp.step_name = 'fact_player_match_stats'
+WHERE w.step_name = 'rollups';
+
+CREATE TEMP TABLE rollups_matches ON COMMIT DROP AS
+SELECT matches.match_id, matches.start_time, matches.radiant_team_id, matches.dire_team_id
+FROM stg_matches AS matches
+JOIN rollups_batch b ON matches.stg_seq > b.from_seq AND matches.stg_seq <= b.to_seq;
+
+-- Affected keys
+CREATE TEMP TABLE rollups_team_days ON COMMIT DROP AS
+SELECT DISTINCT
+    side.team_id,
+    (to_timestamp(COALESCE(m.start_time, 0)) AT TIME ZONE 'UTC')::date AS day
+FROM rollups_matches m
+CROSS JOIN LATERAL (VALUES (m.radiant_team_id), (m.dire_team_id)) AS side(team_id)
+WHERE side.team_id > 0;
+
+CREATE TEMP TABLE rollups_player_keys ON COMMIT DROP AS
+SELECT DISTINCT pm.team_id, pm.hero_id, pm.account_id
+FROM rollups_matches m
+JOIN fact_player_match_stats pm ON pm.match_id = m.match_id AND pm.start_time = m.start_time
+WHERE pm.team_id IS NOT NULL;
+
+-- Statistics for the planner, which otherwise guesses the key table sizes and
+-- can pick a full scan of the fact tables per key on a large refresh
+ANALYZE rollups_matches;
+ANALYZE rollups_team_days;
+ANALYZE rollups_player_keys;
+
+-- Team per day: the matches of one team and day are found through the
+-- (team, start_time) indexes of fact_matches, one per side, in the
+-- partition of that day only
+DELETE FROM rollup_team_daily r
+USING rollups_team_days a
+WHERE r.team_id = a.team_id AND r.day = a.day;
+
+INSERT INTO rollup_team_daily (
+    team_id, day, matches, wins, losses, duration_sum, timed_matches,
+    gold_sum, xp_sum, kills_sum, deaths_sum, assists_sum
+)
+SELECT
+    a.team_id,
+    a.day,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE tm.win_flag),
+    COUNT(*) FILTER (WHERE NOT tm.win_flag),
+    SUM(m.duration),
+    COUNT(m.duration),
+    SUM(tm.gold_earned),
+    SUM(tm.xp_earned),
+    SUM(tm.total_kills),
+    SUM(tm.total_deaths),
+    SUM(tm.total_assists)
+FROM rollups_team_days a
+CROSS JOIN LATERAL (
+    SELECT match_id, duration FROM fact_matches
+    WHERE radiant_team_id = a.team_id
+    AND start_time >= EXTRACT(EPOCH FROM a.day::timestamp)::BIGINT AND start_time < EXTRACT(EPOCH FROM a.day::timestamp)::BIGINT + 86400
+    UNION ALL
+    SELECT match_id, duration FROM fact_matches
+    WHERE dire_team_id = a.team_id
+    AND start_time >= EXTRACT(EPOCH FROM a.day::timestamp)::BIGINT AND start_time < EXTRACT(EPOCH FROM a.day::timestamp)::BIGINT + 86400
+) AS m
+JOIN fact_team_match_stats tm ON tm.match_id = m.match_id AND tm.team_id = a.team_id
+GROUP BY a.team_id, a.day;
+
+-- Team per hero
+DELETE FROM rollup_team_hero r
+USING (SELECT DISTINCT team_id, hero_id FROM rollups_player_keys) a
+WHERE r.team_id = a.team_id AND r.hero_id = a.hero_id;
+
+INSERT INTO rollup_team_hero (team_id, hero_id, matches, wins)
+SELECT
+    pm.team_id,
+    pm.hero_id,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE pm.win_flag)
+FROM (SELECT DISTINCT team_id, hero_id FROM rollups_player_keys WHERE hero_id IS NOT NULL) a
+JOIN fact_player_match_stats pm ON pm.team_id = a.team_id AND pm.hero_id = a.hero_id
+GROUP BY pm.team_id, pm.hero_id;
+
+-- Team per player
+DELETE FROM rollup_team_player r
+USING (SELECT DISTINCT team_id, account_id FROM rollups_player_keys) a
+WHERE r.team_id = a.team_id AND r.account_id = a.account_id;
+
+INSERT INTO rollup_team_player (team_id, account_id, matches, wins, kda_sum, kda_matches, kills_sum, deaths_sum, assists_sum)
+SELECT
+    pm.team_id,
+    pm.account_id,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE pm.win_flag),
+    SUM(pm.kda),
+    COUNT(pm.kda),
+    SUM(pm.kills),
+    SUM(pm.deaths),
+    SUM(pm.assists)
+FROM (SELECT DISTINCT team_id, account_id FROM rollups_player_keys) a
+JOIN fact_player_match_stats pm ON pm.account_id = a.account_id AND pm.team_id = a.team_id
+GROUP BY pm.team_id, pm.account_id;
+
+-- Team statistics in dim_teams, for the affected teams only, from their daily rollups
+UPDATE dim_teams t SET
+    total_matches = s.match_count,
+    win_count = s.wins,
+    loss_count = s.losses,
+    avg_match_gold = s.avg_gold,
+    avg_match_xp = s.avg_xp,
+    avg_match_kills = s.avg_kills,
+    avg_match_deaths = s.avg_deaths,
+    avg_match_kda = CASE
+        WHEN s.avg_deaths = 0 THEN s.avg_kills::numeric
+        ELSE ((s.avg_kills + s.avg_assists) / s.avg_deaths)::numeric
+    END
+FROM (
+    SELECT
+        team_id,
+        SUM(matches) as match_count,
+        SUM(wins) as wins,
+        SUM(losses) as losses,
+        ROUND(SUM(gold_sum)::numeric / SUM(matches), 2) as avg_gold,
+        ROUND(SUM(xp_sum)::numeric / SUM(matches), 2) as avg_xp,
+        ROUND(SUM(kills_sum)::numeric / SUM(matches), 2) as avg_kills,
+        ROUND(SUM(deaths_sum)::numeric / SUM(matches), 2) as avg_deaths,
+        ROUND(SUM(assists_sum)::numeric / SUM(matches), 2) as avg_assists
+    FROM rollup_team_daily
+    WHERE team_id IN (SELECT team_id FROM rollups_team_days)
+    GROUP BY team_id
+) s
+WHERE t.team_id = s.team_id;
+
+-- Verify the updated data
+SELECT
+    (SELECT COUNT(*) FROM rollups_matches) AS rolled_up_matches,
+    (SELECT COUNT(*) FROM rollup_team_daily) AS team_days,
+    (SELECT COUNT(*) FROM rollup_team_hero) AS team_heroes,
+    (SELECT COUNT(*) FROM rollup_team_player) AS team_players;
+
+-- Advance the watermark past the processed batch
+UPDATE etl_watermarks w SET
+    last_stg_seq = b.to_seq,
+    updated_at = CURRENT_TIMESTAMP
+FROM rollups_batch b
+WHERE w.step_name = 'rollups';
+
+COMMIT;
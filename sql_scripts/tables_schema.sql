@@ -4,10 +4,56 @@ CREATE TABLE IF NOT EXISTS stg_matches (
     raw_json JSONB,           
     radiant_team_id INT,      
     dire_team_id INT,        
-    players_info JSONB        
+    stg_seq BIGSERIAL,        -- Load order, used as the watermark for incremental transforms
+    -- Typed fields extracted by the loader so transforms do not detoast raw_json
+    start_time BIGINT,
+    duration INT,
+    game_mode INT,
+    first_blood_time INT,
+    team_fights INT,
+    radiant_win BOOLEAN,
+    version INT,
+    patch INT,
+    radiant_score INT,
+    dire_score INT,
+    tower_status_radiant INT,
+    tower_status_dire INT,
+    barracks_status_radiant INT,
+    barracks_status_dire INT,
+    -- raw_json keeps the slim payload; the full original is compressed here.
+    -- See data_pipeline/match_archive.py to read it back or re-derive staging
+    raw_archive BYTEA,
+    archive_codec TEXT,       -- zstd or zlib
+    load_batch_id BIGINT      -- load_batches row of the load that first staged the match
+);
+
+-- One row per player per match, normalized from raw_json->'players' by the loader
+CREATE TABLE IF NOT EXISTS stg_match_players (
+    match_id BIGINT REFERENCES stg_matches(match_id) ON DELETE CASCADE,
+    player_slot INT,
+    account_id BIGINT,
+    hero_id INT,
+    kills INT,
+    deaths INT,
+    assists INT,
+    total_gold INT,
+    total_xp INT,
+    tower_kills INT,
+    ancient_kills INT,
+    roshan_kills INT,
+    hero_damage INT,
+    actions_per_min INT,
+    item_0 INT,
+    item_1 INT,
+    item_2 INT,
+    item_3 INT,
+    item_4 INT,
+    item_5 INT,
+    PRIMARY KEY (match_id, player_slot)
 );
 
 CREATE TABLE IF NOT EXISTS stg_players (
+    account_id BIGINT,
     raw_json JSONB,
     last_login TIMESTAMP,
     full_history_time TIMESTAMP,
@@ -17,13 +63,164 @@ CREATE TABLE IF NOT EXISTS stg_players (
 );
 
 CREATE TABLE IF NOT EXISTS stg_teams (
+    team_id INT,
     raw_json JSONB
 );
 
 CREATE TABLE IF NOT EXISTS stg_heroes (
+    hero_id INT,
     raw_json JSONB
 );
 
+-- Key columns for staging tables created before they were added.
+-- Backfill them from the JSON and drop duplicate rows once, so uniqueness
+-- can be enforced and the loader can deduplicate with INSERT ... ON CONFLICT
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'stg_matches' AND column_name = 'stg_seq') THEN
+        ALTER TABLE stg_matches ADD COLUMN stg_seq BIGSERIAL;
+    END IF;
+
+    -- Typed match columns and normalized players, backfilled once from raw_json
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'stg_matches' AND column_name = 'start_time') THEN
+        ALTER TABLE stg_matches
+            DROP COLUMN IF EXISTS players_info,
+            ADD COLUMN start_time BIGINT,
+            ADD COLUMN duration INT,
+            ADD COLUMN game_mode INT,
+            ADD COLUMN first_blood_time INT,
+            ADD COLUMN team_fights INT,
+            ADD COLUMN radiant_win BOOLEAN,
+            ADD COLUMN version INT,
+            ADD COLUMN patch INT,
+            ADD COLUMN radiant_score INT,
+            ADD COLUMN dire_score INT,
+            ADD COLUMN tower_status_radiant INT,
+            ADD COLUMN tower_status_dire INT,
+            ADD COLUMN barracks_status_radiant INT,
+            ADD COLUMN barracks_status_dire INT;
+
+        UPDATE stg_matches SET
+            radiant_team_id = (raw_json->>'radiant_team_id')::INT,
+            dire_team_id = (raw_json->>'dire_team_id')::INT,
+            start_time = (raw_json->>'start_time')::BIGINT,
+            duration = (raw_json->>'duration')::INT,
+            game_mode = (raw_json->>'game_mode')::INT,
+            first_blood_time = (raw_json->>'first_blood_time')::INT,
+            team_fights = jsonb_array_length(raw_json->'teamfights'),
+            radiant_win = (raw_json->>'radiant_win')::BOOLEAN,
+            version = (raw_json->>'version')::INT,
+            patch = (raw_json->>'patch')::INT,
+            radiant_score = (raw_json->>'radiant_score')::INT,
+            dire_score = (raw_json->>'dire_score')::INT,
+            tower_status_radiant = (raw_json->>'tower_status_radiant')::INT,
+            tower_status_dire = (raw_json->>'tower_status_dire')::INT,
+            barracks_status_radiant = (raw_json->>'barracks_status_radiant')::INT,
+            barracks_status_dire = (raw_json->>'barracks_status_dire')::INT;
+
+        INSERT INTO stg_match_players
+        SELECT 
+            matches.match_id,
+            (player->>'player_slot')::INT,
+            (player->>'account_id')::BIGINT,
+            (player->>'hero_id')::INT,
+            (player->>'kills')::INT,
+            (player->>'deaths')::INT,
+            (player->>'assists')::INT,
+            (player->>'total_gold')::INT,
+            (player->>'total_xp')::INT,
+            (player->>'tower_kills')::INT,
+            (player->>'ancient_kills')::INT,
+            (player->>'roshan_kills')::INT,
+            (player->>'hero_damage')::INT,
+            (player->>'actions_per_min')::INT,
+            (player->>'item_0')::INT,
+            (player->>'item_1')::INT,
+            (player->>'item_2')::INT,
+            (player->>'item_3')::INT,
+            (player->>'item_4')::INT,
+            (player->>'item_5')::INT
+        FROM stg_matches AS matches
+        CROSS JOIN LATERAL jsonb_array_elements(matches.raw_json->'players') AS player
+        ON CONFLICT (match_id, player_slot) DO NOTHING;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'stg_players' AND column_name = 'account_id') THEN
+        ALTER TABLE stg_players ADD COLUMN account_id BIGINT;
+        UPDATE stg_players SET account_id = (raw_json->'profile'->>'account_id')::BIGINT;
+        DELETE FROM stg_players a USING stg_players b
+        WHERE a.account_id = b.account_id AND a.ctid < b.ctid;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'stg_teams' AND column_name = 'team_id') THEN
+        ALTER TABLE stg_teams ADD COLUMN team_id INT;
+        UPDATE stg_teams SET team_id = (raw_json->>'team_id')::INT;
+        DELETE FROM stg_teams a USING stg_teams b
+        WHERE a.team_id = b.team_id AND a.ctid < b.ctid;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'stg_heroes' AND column_name = 'hero_id') THEN
+        ALTER TABLE stg_heroes ADD COLUMN hero_id INT;
+        UPDATE stg_heroes SET hero_id = (raw_json->>'id')::INT;
+        DELETE FROM stg_heroes a USING stg_heroes b
+        WHERE a.hero_id = b.hero_id AND a.ctid < b.ctid;
+    END IF;
+END $$;
+
+-- Archive columns for stg_matches created before them; older rows keep their
+-- full raw_json until match_archive rederive compacts them
+ALTER TABLE stg_matches
+    ADD COLUMN IF NOT EXISTS raw_archive BYTEA,
+    ADD COLUMN IF NOT EXISTS archive_codec TEXT;
+-- The archive is already compressed, so PostgreSQL should not try again
+ALTER TABLE stg_matches ALTER COLUMN raw_archive SET STORAGE EXTERNAL;
+ALTER TABLE stg_matches ADD COLUMN IF NOT EXISTS load_batch_id BIGINT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stg_players_account_id ON stg_players(account_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stg_teams_team_id ON stg_teams(team_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stg_heroes_hero_id ON stg_heroes(hero_id);
+CREATE INDEX IF NOT EXISTS idx_stg_matches_stg_seq ON stg_matches(stg_seq);
+CREATE INDEX IF NOT EXISTS idx_stg_matches_radiant_team_id ON stg_matches(radiant_team_id);
+CREATE INDEX IF NOT EXISTS idx_stg_matches_dire_team_id ON stg_matches(dire_team_id);
+CREATE INDEX IF NOT EXISTS idx_stg_match_players_account_id ON stg_match_players(account_id);
+CREATE INDEX IF NOT EXISTS idx_stg_match_players_hero_id ON stg_match_players(hero_id);
+
+-- Highest stg_matches.stg_seq each incremental transform has already processed.
+-- Reset last_stg_seq to 0 for a step to rebuild it from all of staging
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+    step_name TEXT PRIMARY KEY,
+    last_stg_seq BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Historical backfill progress per team: every listed match newer than
+-- last_match_id has been staged. Delete a team's row to backfill it again
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    team_id BIGINT PRIMARY KEY,
+    last_match_id BIGINT,
+    last_start_time BIGINT,
+    matches_processed INT NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- One row per loader batch: the teams a worker claimed (with advisory locks,
+-- see fetch_data.claim_teams) and the matches it staged for them
+CREATE TABLE IF NOT EXISTS load_batches (
+    batch_id BIGSERIAL PRIMARY KEY,
+    worker TEXT NOT NULL,                    -- host:pid of the loader
+    team_ids INT[] NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',  -- running, completed or failed
+    matches_staged INT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
 -- 2. Then create dimension tables (no dependencies)
 CREATE TABLE IF NOT EXISTS dim_players (
     account_id INT PRIMARY KEY,
@@ -57,9 +254,33 @@ CREATE TABLE IF NOT EXISTS dim_teams (
 );
 
 -- 3. Then create fact_matches (no dependencies)
+-- Fact tables created before monthly partitioning are copied aside and their
+-- rows moved into the partitioned tables below. Dropping fact_matches also
+-- drops the foreign keys on fact_matches(match_id): a partitioned table can only
+-- enforce uniqueness together with its partition key, so the child tables
+-- reference (match_id, start_time) instead, see below
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class
+               WHERE oid = to_regclass('fact_player_match_stats') AND relkind = 'r') THEN
+        CREATE TABLE fact_player_match_stats_unpartitioned AS SELECT * FROM fact_player_match_stats;
+        DROP TABLE fact_player_match_stats;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM pg_class
+               WHERE oid = to_regclass('fact_matches') AND relkind = 'r') THEN
+        CREATE TABLE fact_matches_unpartitioned AS SELECT * FROM fact_matches;
+        DROP TABLE fact_matches CASCADE;
+    END IF;
+END $$;
+
+-- Partitioned by month of start_time (see ensure_monthly_partitions), so
+-- time-windowed queries only scan the partitions inside the window. The key
+-- includes start_time, so fact_matches.sql keeps match_id unique itself: a
+-- match loaded again with another start_time replaces its old row
 CREATE TABLE IF NOT EXISTS fact_matches (
-    match_id BIGINT PRIMARY KEY,
-    start_time BIGINT,
+    match_id BIGINT,
+    start_time BIGINT NOT NULL,
     duration INT,
     game_mode INT,
     radiant_team_id INT,      
@@ -68,13 +289,16 @@ CREATE TABLE IF NOT EXISTS fact_matches (
     team_fights INT,
     radiant_win BOOLEAN,
     version INT,
-    patch INT
-);
+    patch INT,
+    PRIMARY KEY (match_id, start_time)
+) PARTITION BY RANGE (start_time);
 
--- 4. Then create fact tables with foreign keys
+-- 4. Then create fact tables with foreign keys. Both carry the start_time of
+-- their match, so they can reference the partitioned fact_matches
 CREATE TABLE IF NOT EXISTS fact_team_match_stats (
     match_id BIGINT,
     team_id INT,
+    start_time BIGINT NOT NULL,
     total_kills INT,
     total_deaths INT,
     total_assists INT,
@@ -85,15 +309,17 @@ CREATE TABLE IF NOT EXISTS fact_team_match_stats (
     roshan_kills INT,
     win_flag BOOLEAN,
     PRIMARY KEY (match_id, team_id),
-    FOREIGN KEY (match_id) REFERENCES fact_matches(match_id) ON DELETE CASCADE,
+    CONSTRAINT fact_team_match_stats_match_fkey FOREIGN KEY (match_id, start_time)
+        REFERENCES fact_matches(match_id, start_time) ON DELETE CASCADE,
     FOREIGN KEY (team_id) REFERENCES dim_teams(team_id) ON DELETE CASCADE
 );
 
+-- Partitioned like fact_matches, with the match start_time copied onto every row
 CREATE TABLE IF NOT EXISTS fact_player_match_stats (
     match_id BIGINT,
     account_id INT,
     hero_id INT,
-    start_time BIGINT,
+    start_time BIGINT NOT NULL,
     team_id INT,
     win_flag BOOLEAN,
     kda FLOAT,
@@ -114,14 +340,164 @@ CREATE TABLE IF NOT EXISTS fact_player_match_stats (
     item_3 INT,
     item_4 INT,
     item_5 INT,
-    PRIMARY KEY (match_id, account_id),
-    FOREIGN KEY (match_id) REFERENCES fact_matches(match_id) ON DELETE CASCADE,
+    PRIMARY KEY (match_id, account_id, start_time),
+    CONSTRAINT fact_player_match_stats_match_fkey FOREIGN KEY (match_id, start_time)
+        REFERENCES fact_matches(match_id, start_time) ON DELETE CASCADE,
     FOREIGN KEY (account_id) REFERENCES dim_players(account_id) ON DELETE CASCADE,
     FOREIGN KEY (hero_id) REFERENCES dim_heroes(hero_id) ON DELETE SET NULL,
     FOREIGN KEY (team_id) REFERENCES dim_teams(team_id) ON DELETE SET NULL
+) PARTITION BY RANGE (start_time);
+
+-- Creates the missing monthly partitions of a fact table for every UTC month
+-- between two epoch timestamps, named e.g. fact_matches_2024_05.
+-- The DDL locks the fact tables it references one at a time, so it first takes
+-- advisory lock (3, 0) (fetch_data.PARTITION_LOCK) exclusively: the transforms
+-- hold it shared, and the DDL waits for them to finish instead of deadlocking.
+-- Returns the number of partitions created
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, from_time BIGINT, to_time BIGINT)
+RETURNS INT AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', to_timestamp(from_time) AT TIME ZONE 'UTC');
+    partition_name TEXT;
+    created INT := 0;
+BEGIN
+    WHILE month_start <= to_timestamp(to_time) AT TIME ZONE 'UTC' LOOP
+        partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            PERFORM pg_advisory_xact_lock(3, 0);
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+                partition_name, parent,
+                EXTRACT(EPOCH FROM month_start)::BIGINT,
+                EXTRACT(EPOCH FROM month_start + INTERVAL '1 month')::BIGINT
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move the rows of fact tables set aside above into their partitions.
+-- Matches without a start_time cannot be placed in a partition and are dropped
+DO $$
+BEGIN
+    IF to_regclass('fact_matches_unpartitioned') IS NOT NULL THEN
+        PERFORM ensure_monthly_partitions(parent, MIN(start_time), MAX(start_time))
+        FROM fact_matches_unpartitioned, unnest(ARRAY['fact_matches', 'fact_player_match_stats']) AS parent
+        GROUP BY parent;
+
+        INSERT INTO fact_matches SELECT * FROM fact_matches_unpartitioned WHERE start_time IS NOT NULL;
+        DROP TABLE fact_matches_unpartitioned;
+    END IF;
+
+    IF to_regclass('fact_player_match_stats_unpartitioned') IS NOT NULL THEN
+        PERFORM ensure_monthly_partitions('fact_player_match_stats', MIN(start_time), MAX(start_time))
+        FROM fact_player_match_stats_unpartitioned;
+
+        INSERT INTO fact_player_match_stats
+        SELECT * FROM fact_player_match_stats_unpartitioned WHERE start_time IS NOT NULL;
+        DROP TABLE fact_player_match_stats_unpartitioned;
+    END IF;
+END $$;
+
+-- Foreign keys to fact_matches for child tables created before they were
+-- added. Team rows get the start_time of their match; rows of matches that
+-- are no longer in fact_matches are dropped, as ON DELETE CASCADE would have
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'fact_team_match_stats' AND column_name = 'start_time') THEN
+        ALTER TABLE fact_team_match_stats ADD COLUMN start_time BIGINT;
+        UPDATE fact_team_match_stats tm SET start_time = m.start_time
+        FROM fact_matches m
+        WHERE m.match_id = tm.match_id;
+        DELETE FROM fact_team_match_stats WHERE start_time IS NULL;
+        ALTER TABLE fact_team_match_stats ALTER COLUMN start_time SET NOT NULL;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'fact_team_match_stats'::regclass AND conname = 'fact_team_match_stats_match_fkey') THEN
+        DELETE FROM fact_team_match_stats tm
+        WHERE NOT EXISTS (SELECT 1 FROM fact_matches m
+                          WHERE m.match_id = tm.match_id AND m.start_time = tm.start_time);
+        ALTER TABLE fact_team_match_stats ADD CONSTRAINT fact_team_match_stats_match_fkey
+            FOREIGN KEY (match_id, start_time) REFERENCES fact_matches(match_id, start_time) ON DELETE CASCADE;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'fact_player_match_stats'::regclass AND conname = 'fact_player_match_stats_match_fkey') THEN
+        DELETE FROM fact_player_match_stats pm
+        WHERE NOT EXISTS (SELECT 1 FROM fact_matches m
+                          WHERE m.match_id = pm.match_id AND m.start_time = pm.start_time);
+        ALTER TABLE fact_player_match_stats ADD CONSTRAINT fact_player_match_stats_match_fkey
+            FOREIGN KEY (match_id, start_time) REFERENCES fact_matches(match_id, start_time) ON DELETE CASCADE;
+    END IF;
+END $$;
+
+-- 5. Rollups over the fact tables, kept current by rollups.sql. Every row holds
+-- additive totals, so any coarser grouping (a week, all time) is a SUM over rows
+CREATE TABLE IF NOT EXISTS rollup_team_daily (
+    team_id INT,
+    day DATE,  -- UTC day of the match start
+    matches INT NOT NULL,
+    wins INT NOT NULL,
+    losses INT NOT NULL,
+    duration_sum BIGINT,
+    timed_matches INT NOT NULL,  -- Matches with a known duration
+    gold_sum BIGINT,
+    xp_sum BIGINT,
+    kills_sum BIGINT,
+    deaths_sum BIGINT,
+    assists_sum BIGINT,
+    PRIMARY KEY (team_id, day)
 );
 
--- 5. Finally create indexes
+CREATE TABLE IF NOT EXISTS rollup_team_hero (
+    team_id INT,
+    hero_id INT,
+    matches INT NOT NULL,
+    wins INT NOT NULL,
+    PRIMARY KEY (team_id, hero_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_team_player (
+    team_id INT,
+    account_id INT,
+    matches INT NOT NULL,
+    wins INT NOT NULL,
+    kda_sum FLOAT,
+    kda_matches INT NOT NULL,  -- Matches with a known KDA
+    kills_sum BIGINT,
+    deaths_sum BIGINT,
+    assists_sum BIGINT,
+    PRIMARY KEY (team_id, account_id)
+);
+
+-- Rollups created before kda_matches was added count it once from the facts
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'rollup_team_player' AND column_name = 'kda_matches') THEN
+        ALTER TABLE rollup_team_player ADD COLUMN kda_matches INT NOT NULL DEFAULT 0;
+        ALTER TABLE rollup_team_player ALTER COLUMN kda_matches DROP DEFAULT;
+        UPDATE rollup_team_player r SET kda_matches = s.kda_matches
+        FROM (
+            SELECT team_id, account_id, COUNT(kda) AS kda_matches
+            FROM fact_player_match_stats
+            GROUP BY team_id, account_id
+        ) s
+        WHERE r.team_id = s.team_id AND r.account_id = s.account_id;
+    END IF;
+END $$;
+
+-- 6. Finally create indexes
 CREATE INDEX IF NOT EXISTS idx_team_match_team_id ON fact_team_match_stats(team_id);
 CREATE INDEX IF NOT EXISTS idx_player_match_account_id ON fact_player_match_stats(account_id);
-CREATE INDEX IF NOT EXISTS idx_player_match_hero_id ON fact_player_match_stats(hero_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_player_match_hero_id ON fact_player_match_stats(hero_id);
+CREATE INDEX IF NOT EXISTS idx_player_match_team_hero ON fact_player_match_stats(team_id, hero_id);
+CREATE INDEX IF NOT EXISTS idx_player_match_team_time ON fact_player_match_stats(team_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_fact_matches_start_time ON fact_matches(start_time);
+CREATE INDEX IF NOT EXISTS idx_fact_matches_radiant_team_time ON fact_matches(radiant_team_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_fact_matches_dire_team_time ON fact_matches(dire_team_id, start_time);
\ No newline at end of file
@@ -0,0 +1,157 @@
+# Standard library imports
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third party imports
+import psycopg2
+import pytest
+
+# Local imports
+from benchmarks.run_benchmarks import ROOT, reset_database, run_script, run_transforms
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client, fetch_data
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")  # Scratch database emptied by the database tests
+
+
+class StubAPI(ThreadingHTTPServer):
+    """
+    Local HTTP server standing in for the OpenDota API
+
+    `respond(path, headers, index)` is called for every GET with the request
+    path, its headers and the 0-based number of the request, and returns
+    (status, response headers, JSON body); a bytes body is sent as is, e.g. to
+    send a truncated payload. Every request is recorded in
+    `requests` as (time.monotonic(), path, headers)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, respond):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.respond = respond
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api"
+
+    def times(self):
+        """Arrival times of the requests, in arrival order"""
+        return sorted(received for received, _, _ in self.requests)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the API
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def do_GET(self):
+        with self.server.lock:
+            index = len(self.server.requests)
+            self.server.requests.append((time.monotonic(), self.path, dict(self.headers)))
+        status, headers, body = self.server.respond(self.path, self.headers, index)
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """
+    Starts StubAPI servers and points the API client at fresh state: no
+    response cache, a new connection pool and short retry backoff
+
+    Returns:
+        callable: respond -> running StubAPI
+    """
+    servers = []
+    monkeypatch.setattr(api_client, "response_cache", None)
+    monkeypatch.setattr(api_client, "session", api_client.create_session())
+    monkeypatch.setattr(api_client, "BACKOFF_SCALE", 0.01)
+
+    def start(respond):
+        server = StubAPI(respond)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def database_url():
+    """TEST_DATABASE_URL; tests using it are skipped when it is not set"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    if TEST_DATABASE_URL == os.getenv("DATABASE_URL"):
+        pytest.fail("TEST_DATABASE_URL must not be DATABASE_URL: the tests drop every table in it")
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def database(database_url):
+    """Connection to the emptied test database with the schema of tables_schema.sql"""
+    connection = psycopg2.connect(database_url)
+    reset_database(connection)
+    run_script(connection, ROOT / "sql_scripts" / "tables_schema.sql")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def loader(database, database_url, monkeypatch):
+    """Points fetch_data at the test database on its own connection"""
+    connection = psycopg2.connect(database_url)
+    monkeypatch.setattr(fetch_data, "config", fetch_data.FetchConfig(database_url=database_url, batch_teams=1))
+    monkeypatch.setattr(fetch_data, "_connection", connection)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def question_data(loader):
+    """
+    Loads and transforms matches with the edge cases of the analytical
+    questions: unknown KDAs, unknown durations (every one of a team) and ties
+    on the averages and win rates
+
+    Returns:
+        DataGenerator: Generator of the loaded data
+    """
+    generator = DataGenerator(200, team_count=4, history_days=365)
+    fetch_data.store_raw_data("stg_heroes", generator.heroes())
+    fetch_data.store_raw_data("stg_teams", generator.teams())
+    fetch_data.store_unique_players(generator.player(account_id)
+                                    for team_id in generator.team_ids for account_id in generator.roster(team_id))
+    fetch_data.store_raw_data("stg_matches", generator.matches())
+
+    tied_players = generator.roster(generator.team_ids[0])[:2]
+    with loader.cursor() as cursor:
+        # Every known duration is the same, so the teams' averages tie, and the last team has none
+        cursor.execute("UPDATE stg_matches SET duration = CASE WHEN match_id % 5 = 0 THEN NULL ELSE 1800 END")
+        cursor.execute("UPDATE stg_matches SET duration = NULL WHERE %s IN (radiant_team_id, dire_team_id)",
+                       (generator.team_ids[-1],))
+        cursor.execute("UPDATE stg_match_players SET deaths = NULL WHERE match_id % 7 = 0")
+        cursor.execute("UPDATE stg_match_players SET kills = 40, deaths = 1, assists = 40 WHERE account_id = ANY(%s)",
+                       (tied_players,))
+    loader.commit()
+    run_transforms(loader, None, "")
+    return generator
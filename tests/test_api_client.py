@@ -0,0 +1,149 @@
+# Standard library imports
+import os
+import sys
+import json
+import time
+import subprocess
+
+# Local imports
+from data_pipeline import api_client
+from data_pipeline.api_client import ResponseCache, TokenBucket, fetch_concurrently, request_with_retries
+
+RATE = 50  # Requests per second allowed by the tests' rate limiter
+SLACK = 1  # Requests that may arrive early because of scheduling and network jitter
+
+
+def excess_requests(times, rate, capacity=1):
+    """
+    Largest number of requests above the token bucket bound, capacity + rate * t
+    requests in any t seconds, over every window between two arrivals
+    """
+    return max(
+        (j - i + 1) - (capacity + rate * (times[j] - times[i]))
+        for i in range(len(times)) for j in range(i, len(times))
+    )
+
+
+def fetch_all(server, count, workers=8):
+    """Fetches /matches/0..count-1 concurrently through request_with_retries"""
+    fetch = lambda match_id: request_with_retries(f"{server.url}/matches/{match_id}")
+    return dict(fetch_concurrently(fetch, range(count), max_workers=workers))
+
+
+def test_unknown_tier_is_rejected():
+    env = dict(os.environ, OPENDOTA_API_TIER="gold")
+    env.pop("API_RATE_LIMIT", None)
+    result = subprocess.run([sys.executable, "-c", "import data_pipeline.api_client"],
+                            env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "ValueError: Unknown OPENDOTA_API_TIER 'gold', expected one of: free, premium" in result.stderr
+
+
+def test_token_bucket_pause_holds_back_callers():
+    bucket = TokenBucket(1000)
+    bucket.pause(0.2)
+    start_time = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start_time >= 0.19
+
+
+def test_token_bucket_throttle_is_floored():
+    bucket = TokenBucket(100)
+    bucket.throttle()
+    assert bucket.rate == 80
+    for _ in range(50):
+        bucket.throttle()
+    assert bucket.rate == 10
+
+
+def test_concurrent_requests_stay_under_quota(stub_api, monkeypatch):
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(RATE))
+    server = stub_api(lambda path, headers, index: (200, {}, {"path": path}))
+
+    results = fetch_all(server, 60)
+
+    assert sorted(results) == list(range(60))
+    assert all(result == {"path": f"/api/matches/{key}"} for key, result in results.items())
+    times = server.times()
+    assert excess_requests(times, RATE) <= SLACK
+    assert (len(times) - 1) / (times[-1] - times[0]) <= RATE
+
+
+def test_quota_holds_after_429(stub_api, monkeypatch):
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(RATE))
+    retry_after = 0.3
+
+    def respond(path, headers, index):
+        if index == 10:
+            return 429, {"Retry-After": str(retry_after)}, {"error": "rate limit exceeded"}
+        return 200, {}, {"path": path}
+
+    server = stub_api(respond)
+    results = fetch_all(server, 40)
+
+    # The refused request is retried, and nothing is lost
+    assert len(server.requests) == 41
+    assert all(result is not None for result in results.values())
+
+    refused_at = server.requests[10][0]
+    after = [received for received in server.times() if received > refused_at]
+    # Every worker waits for Retry-After, except a request already past the limiter
+    assert sum(1 for received in after if received < refused_at + retry_after - 0.02) <= SLACK
+    # and the bucket resumes below the quota rather than with a burst
+    assert excess_requests(after, RATE) <= SLACK
+    assert api_client.rate_limiter.rate < RATE
+
+
+def test_server_errors_and_truncated_bodies_are_retried(stub_api, monkeypatch):
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(1000))
+    match = {"match_id": 1, "players": []}
+    responses = [
+        (503, {}, {"error": "Service Unavailable"}),
+        (502, {}, None),
+        (200, {}, json.dumps(match).encode("utf-8")[:10]),
+        (200, {}, match),
+    ]
+    server = stub_api(lambda path, headers, index: responses[index])
+
+    assert request_with_retries(f"{server.url}/matches/1") == match
+    assert len(server.requests) == 4
+
+
+def test_client_errors_are_not_retried_and_retries_give_up(stub_api, monkeypatch):
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(1000))
+    monkeypatch.setattr(api_client, "RETRY_ATTEMPTS", 3)
+    server = stub_api(lambda path, headers, index: (404 if path.endswith("/1") else 500, {}, {"error": "failed"}))
+
+    assert request_with_retries(f"{server.url}/matches/1") is None
+    assert len(server.requests) == 1
+    assert request_with_retries(f"{server.url}/matches/2") is None
+    assert len(server.requests) == 1 + 3
+
+
+def test_cached_responses_are_revalidated_with_etag(stub_api, monkeypatch, tmp_path):
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(1000))
+    monkeypatch.setattr(api_client, "response_cache", ResponseCache(str(tmp_path)))
+    team = {"team_id": 1, "name": "Team One"}
+
+    def respond(path, headers, index):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, None
+        return 200, {"ETag": '"v1"'}, [team] if path.endswith("/matches") else team
+
+    server = stub_api(respond)
+
+    # /teams/{id} is fresh for TEAM_CACHE_TTL: served from disk without a request
+    assert request_with_retries(f"{server.url}/teams/1") == team
+    assert request_with_retries(f"{server.url}/teams/1") == team
+    assert len(server.requests) == 1
+
+    # A forced revalidation sends the stored ETag, and the 304 keeps the cached body
+    assert request_with_retries(f"{server.url}/teams/1", revalidate=True) == team
+    assert len(server.requests) == 2
+    assert server.requests[1][2].get("If-None-Match") == '"v1"'
+
+    # Match lists are always revalidated
+    assert request_with_retries(f"{server.url}/teams/1/matches") == [team]
+    assert request_with_retries(f"{server.url}/teams/1/matches") == [team]
+    assert "If-None-Match" not in server.requests[2][2]
+    assert server.requests[3][2].get("If-None-Match") == '"v1"'
@@ -0,0 +1,104 @@
+# Standard library imports
+from dataclasses import replace
+
+# Third party imports
+import psycopg2
+import pytest
+
+# Local imports
+from benchmarks.run_benchmarks import ROOT, run_script
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client, enrich_players, fetch_data
+from data_pipeline.api_client import TokenBucket
+
+
+@pytest.fixture
+def generator():
+    return DataGenerator(20, team_count=2)
+
+
+@pytest.fixture
+def player_api(loader, stub_api, generator, monkeypatch):
+    """Serves the generator's player profiles; `requests` of the server holds the fetched paths"""
+    def respond(path, headers, index):
+        player = generator.player(int(path.rsplit("/", 1)[-1])) if "/players/" in path else None
+        return (404, {}, {"error": "Not Found"}) if player is None else (200, {}, player)
+
+    server = stub_api(respond)
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(1000))
+    monkeypatch.setattr(fetch_data, "config", replace(fetch_data.config, api_base_url=server.url))
+    return server
+
+
+def fetched_players(server):
+    return sorted(int(path.rsplit("/", 1)[-1]) for _, path, _ in server.requests)
+
+
+def enrich_watermark(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT last_stg_seq FROM etl_watermarks WHERE step_name = 'enrich_players'")
+        seq, = cursor.fetchone()
+    connection.rollback()
+    return seq
+
+
+def staged_players(matches):
+    """Account ids in the matches that have a profile, so not anonymous"""
+    return sorted({player["account_id"] for match in matches for player in match["players"]
+                   if player["account_id"] not in (None, 0, fetch_data.ANONYMOUS_ACCOUNT_ID)})
+
+
+def test_only_new_and_outdated_players_are_fetched(loader, player_api, generator):
+    first, second = list(generator.matches(0, 10)), list(generator.matches(10, 20))
+    fetch_data.store_raw_data("stg_matches", first)
+    assert enrich_players.enrich_players() == len(staged_players(first))
+    assert fetched_players(player_api) == staged_players(first)
+    run_script(loader, ROOT / "sql_scripts" / "dim_players.sql")
+
+    # Profiles are as recent as every generated match, except the one made outdated here
+    outdated = staged_players(second[:1])[0]
+    with loader.cursor() as cursor:
+        cursor.execute("UPDATE dim_players SET last_match_time = TO_TIMESTAMP(0) WHERE account_id = %s", (outdated,))
+    loader.commit()
+    player_api.requests.clear()
+    fetch_data.store_raw_data("stg_matches", second)
+    new = set(staged_players(second)) - set(staged_players(first))
+    # The outdated player is fetched again, but its unchanged profile is not stored again
+    assert enrich_players.enrich_players() == len(new)
+    assert fetched_players(player_api) == sorted(new | {outdated})
+
+    # Nothing was staged since, so the next run fetches nothing
+    player_api.requests.clear()
+    assert enrich_players.enrich_players() == 0
+    assert player_api.requests == []
+    with loader.cursor() as cursor:
+        cursor.execute("SELECT MAX(stg_seq) FROM stg_matches")
+        assert enrich_watermark(loader) == cursor.fetchone()[0]
+
+
+def test_a_concurrent_watermark_move_is_kept(loader, player_api, generator, database_url, monkeypatch):
+    fetch_data.store_raw_data("stg_matches", generator.matches(0, 10))
+    store_unique_players = fetch_data.store_unique_players
+    other_run = psycopg2.connect(database_url)
+    other_run.autocommit = True
+
+    def store_and_overtake(players):
+        stored = store_unique_players(players)
+        # A concurrent run stages more matches and marks them enriched before this run finishes
+        fetch_data.store_raw_data("stg_matches", generator.matches(10, 20))
+        with other_run.cursor() as cursor:
+            cursor.execute("""
+                UPDATE etl_watermarks SET last_stg_seq = (SELECT MAX(stg_seq) FROM stg_matches)
+                WHERE step_name = 'enrich_players'
+                RETURNING last_stg_seq
+            """)
+            overtaken.append(cursor.fetchone()[0])
+        return stored
+
+    overtaken = []
+    monkeypatch.setattr(fetch_data, "store_unique_players", store_and_overtake)
+    try:
+        enrich_players.enrich_players()
+    finally:
+        other_run.close()
+    assert enrich_watermark(loader) == overtaken[0]
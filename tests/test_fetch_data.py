@@ -0,0 +1,156 @@
+# Standard library imports
+from dataclasses import replace
+
+# Third party imports
+import psycopg2
+import pytest
+
+# Local imports
+from benchmarks.mock_opendota import ROUTES
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client, fetch_data
+from data_pipeline.api_client import TokenBucket
+from data_pipeline.metrics import metrics
+
+
+@pytest.fixture
+def other_worker(database_url):
+    """Connection standing in for a concurrent loader"""
+    connection = psycopg2.connect(database_url)
+    connection.autocommit = True
+    yield connection
+    connection.close()
+
+
+def generated_api(stub_api, generator, failing_match_ids=()):
+    """Serves the generator's data like benchmarks.mock_opendota, answering 503 for `failing_match_ids`"""
+    def respond(path, headers, index):
+        for pattern, handler in ROUTES:
+            match = pattern.search(path)
+            if match:
+                if path.endswith(tuple(f"/matches/{match_id}" for match_id in failing_match_ids)):
+                    return 503, {}, {"error": "Service Unavailable"}
+                payload = handler(generator, *match.groups())
+                return (404, {}, {"error": "Not Found"}) if payload is None else (200, {}, payload)
+        return 404, {}, {"error": "Not Found"}
+
+    return stub_api(respond)
+
+
+def hold_team(connection, team_id, hold=True):
+    with connection.cursor() as cursor:
+        function = "pg_advisory_lock" if hold else "pg_advisory_unlock"
+        cursor.execute(f"SELECT {function}(%s, %s);", (fetch_data.TEAM_LOCK_NAMESPACE, team_id))
+
+
+def deferred_teams():
+    return metrics.counters.get(("load_teams_deferred", ()), 0)
+
+
+def test_held_teams_are_retried_after_the_others(loader, other_worker):
+    hold_team(other_worker, 2)
+    batches = []
+
+    def ingest(team_ids, tracked=None, load_heroes=True):
+        batches.append(team_ids)
+        if team_ids == [3]:
+            hold_team(other_worker, 2, hold=False)  # The other worker finishes team 2
+        return 1
+
+    deferred_before = deferred_teams()
+    assert fetch_data.ingest_in_batches(ingest, [1, 2, 3]) == 3
+    assert batches == [[1], [3], [2]]
+    assert deferred_teams() == deferred_before
+
+    with loader.cursor() as cursor:
+        cursor.execute("SELECT team_ids, status, matches_staged FROM load_batches ORDER BY batch_id")
+        assert cursor.fetchall() == [([1], "completed", 1), ([3], "completed", 1), ([2], "completed", 1)]
+
+
+def test_teams_still_held_are_deferred(loader, other_worker):
+    hold_team(other_worker, 2)
+    batches = []
+
+    def ingest(team_ids, tracked=None, load_heroes=True):
+        batches.append(team_ids)
+        return 0
+
+    deferred_before = deferred_teams()
+    assert fetch_data.ingest_in_batches(ingest, [1, 2, 3]) == 0
+    assert batches == [[1], [3]]
+    assert deferred_teams() == deferred_before + 1
+
+
+def test_backfill_checkpoint_stops_before_failed_matches(loader, stub_api, monkeypatch):
+    generator = DataGenerator(40, team_count=2)
+    team_id = generator.team_ids[0]
+    history = sorted(generator.team_matches(team_id), key=lambda m: (m["start_time"], m["match_id"]), reverse=True)
+    failing_match_ids = {history[5]["match_id"]}
+    server = generated_api(stub_api, generator, failing_match_ids)
+    monkeypatch.setattr(api_client, "rate_limiter", TokenBucket(1000))
+    monkeypatch.setattr(api_client, "RETRY_ATTEMPTS", 2)
+    monkeypatch.setattr(fetch_data, "config", replace(fetch_data.config, api_base_url=server.url, backfill_page_size=4))
+
+    def checkpoint():
+        with loader.cursor() as cursor:
+            cursor.execute("SELECT last_match_id, completed FROM backfill_checkpoints WHERE team_id = %s", (team_id,))
+            return cursor.fetchone()
+
+    def staged():
+        with loader.cursor() as cursor:
+            cursor.execute("SELECT match_id FROM stg_matches")
+            return {match_id for match_id, in cursor.fetchall()}
+
+    # Page 2 holds history[4:8]; the checkpoint stops at history[4], and the
+    # matches fetched after the failure are staged but not yet covered
+    fetch_data.backfill_team(team_id, {team_id})
+    assert checkpoint() == (history[4]["match_id"], False)
+    assert staged() == {m["match_id"] for m in history[:8]} - failing_match_ids
+
+    # Once the API answers again, the next run fetches the failed match and finishes the history
+    failing_match_ids.clear()
+    fetch_data.backfill_team(team_id, {team_id})
+    assert checkpoint() == (history[-1]["match_id"], True)
+    assert staged() == {m["match_id"] for m in history}
+
+
+def test_replaced_matches_drop_players_missing_from_the_new_payload(loader):
+    generator = DataGenerator(2)
+    matches = [generator.match(generator.match_id(index)) for index in range(2)]
+    fetch_data.store_raw_data("stg_matches", matches)
+
+    def player_slots(match):
+        with loader.cursor() as cursor:
+            cursor.execute("SELECT player_slot FROM stg_match_players WHERE match_id = %s ORDER BY player_slot",
+                           (match["match_id"],))
+            return [slot for slot, in cursor.fetchall()]
+
+    assert player_slots(matches[0]) == sorted(player["player_slot"] for player in matches[0]["players"])
+
+    # A corrected payload with fewer players, and one without any
+    fewer = dict(matches[0], players=matches[0]["players"][:7])
+    none = dict(matches[1], players=[])
+    fetch_data.store_raw_data("stg_matches", [fewer, none], replace_existing=True)
+    assert player_slots(matches[0]) == sorted(player["player_slot"] for player in fewer["players"])
+    assert player_slots(matches[1]) == []
+
+
+def test_load_batches_tag_every_staged_match_once(loader, stub_api, monkeypatch):
+    generator = DataGenerator(30, team_count=3)
+    server = generated_api(stub_api, generator)
+    # run() replaces the rate limiter with one built from RATE_LIMIT_PER_MINUTE
+    monkeypatch.setattr(api_client, "RATE_LIMIT_PER_MINUTE", 60000)
+    monkeypatch.setattr(api_client, "rate_limiter", api_client.rate_limiter)
+    run_config = replace(fetch_data.config, api_base_url=server.url,
+                         team_ids=",".join(str(team_id) for team_id in generator.team_ids),
+                         match_limit=generator.match_count, match_history_depth=generator.match_count)
+
+    # A second run over the same teams finds nothing new to stage
+    for _ in range(2):
+        fetch_data.run(run_config, connection=loader)
+
+    with loader.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COUNT(load_batch_id) FROM stg_matches")
+        assert cursor.fetchone() == (generator.match_count, generator.match_count)
+        cursor.execute("SELECT status, COUNT(*), SUM(matches_staged) FROM load_batches GROUP BY status")
+        assert cursor.fetchall() == [("completed", 2 * len(generator.team_ids), generator.match_count)]
@@ -0,0 +1,129 @@
+# Standard library imports
+import os
+import signal
+
+# Third party imports
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, parse_dsn
+from psycopg2.pool import ThreadedConnectionPool
+
+# Local imports
+import run_etl
+from benchmarks.mock_opendota import ROUTES
+from benchmarks.run_benchmarks import ROOT
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import api_client, export_snapshot
+
+
+def test_failed_script_does_not_poison_the_pool(database_url, tmp_path, monkeypatch):
+    (tmp_path / "broken.sql").write_text("BEGIN;\nSELECT 1 / 0;\nCOMMIT;\n")
+    (tmp_path / "next.sql").write_text("SELECT 1;\n")
+    etl = run_etl.ETL()
+    etl.scripts_dir = tmp_path
+    # A single connection, so the next step borrows the one the failed script used
+    etl.pool = ThreadedConnectionPool(1, 1, database_url)
+    try:
+        assert not etl.execute_sql("broken.sql", "broken step")
+        assert etl.execute_sql("next.sql", "next step")
+        conn = etl.pool.getconn()
+        assert conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+        etl.pool.putconn(conn)
+    finally:
+        etl.pool.closeall()
+
+
+def test_etl_needs_no_password_variable(monkeypatch):
+    monkeypatch.delenv("POSTGRES_PASSWORD", raising=False)
+    assert run_etl.ETL().db_password is None
+
+
+@pytest.fixture
+def daemon(database, database_url, stub_api, tmp_path, monkeypatch):
+    """
+    ETL on the test database with the environment of a daemon tracking the
+    teams of a small generator, whose newest matches the API hides until
+    `hidden.clear()`
+
+    Returns:
+        tuple: (ETL, DataGenerator, list of the hidden match ids)
+    """
+    generator = DataGenerator(40, team_count=3)
+    cutoff = generator.match(generator.match_id(29))["start_time"]
+    hidden = [generator.match_id(index) for index in range(generator.match_count)
+              if generator.match(generator.match_id(index))["start_time"] > cutoff]
+
+    def respond(path, headers, index):
+        for pattern, handler in ROUTES:
+            match = pattern.search(path)
+            if match:
+                payload = handler(generator, *match.groups())
+                if payload is not None and path.endswith("/matches"):
+                    payload = [entry for entry in payload if entry["match_id"] not in hidden]
+                return (404, {}, {"error": "Not Found"}) if payload is None else (200, {}, payload)
+        return 404, {}, {"error": "Not Found"}
+
+    server = stub_api(respond)
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    monkeypatch.setenv("OPENDOTA_API_BASE_URL", server.url)
+    monkeypatch.setenv("TEAM_IDS", ",".join(str(team_id) for team_id in generator.team_ids))
+    monkeypatch.delenv("MATCH_LIMIT", raising=False)
+    # fetch_data.run() replaces the rate limiter with one built from RATE_LIMIT_PER_MINUTE
+    monkeypatch.setattr(api_client, "RATE_LIMIT_PER_MINUTE", 60000)
+    monkeypatch.setattr(api_client, "rate_limiter", api_client.rate_limiter)
+    monkeypatch.setattr(export_snapshot, "SNAPSHOT_DIR", None)
+    monkeypatch.setattr(run_etl, "ETL_REPORT_PATH", str(tmp_path / "report.json"))
+
+    etl = run_etl.ETL()
+    dsn = parse_dsn(database_url)
+    etl.db_host, etl.db_name, etl.db_user = dsn.get("host"), dsn["dbname"], dsn.get("user")
+    etl.db_password = dsn.get("password")
+    etl.scripts_dir = ROOT / "sql_scripts"
+    return etl, generator, hidden
+
+
+def test_daemon_loads_only_new_matches(daemon, database, monkeypatch):
+    etl, generator, hidden = daemon
+    listener = database
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f"LISTEN {run_etl.ETL_NOTIFY_CHANNEL}")
+
+    loaded = []
+    run_cycle = etl.run_cycle
+
+    def counted_cycle(fetch_config, steps):
+        loaded.append(run_cycle(fetch_config, steps))
+        hidden.clear()  # The hidden matches are played after the first poll
+
+    monkeypatch.setattr(etl, "run_cycle", counted_cycle)
+    hidden_count = len(hidden)
+    etl.run_daemon(poll_interval=0, max_cycles=2)
+
+    # The initial run loads what the API shows, the first poll finds nothing new
+    # and the second loads the matches played since
+    assert 0 < hidden_count < generator.match_count
+    assert loaded == [0, hidden_count]
+    with listener.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT match_id) FROM fact_matches")
+        assert cursor.fetchone() == (generator.match_count, generator.match_count)
+
+    # One notification for the initial run and one for the micro-batch, none for the empty poll
+    listener.poll()
+    assert [notify.channel for notify in listener.notifies] == [run_etl.ETL_NOTIFY_CHANNEL] * 2
+
+
+def test_daemon_stops_after_the_current_cycle_on_sigterm(daemon, monkeypatch):
+    etl, _, _ = daemon
+    cycles = []
+
+    def cycle(fetch_config, steps):
+        cycles.append(1)
+        os.kill(os.getpid(), signal.SIGTERM)
+        return 0
+
+    monkeypatch.setattr(etl, "run_steps", lambda steps: {})
+    monkeypatch.setattr(etl, "run_cycle", cycle)
+    handler = signal.getsignal(signal.SIGTERM)
+    etl.run_daemon(poll_interval=0)
+    assert cycles == [1]
+    assert signal.getsignal(signal.SIGTERM) is handler
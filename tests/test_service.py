@@ -0,0 +1,121 @@
+# Standard library imports
+import threading
+
+# Third party imports
+import psycopg2
+import pytest
+
+# Local imports
+from analytics.service import MAX_LIMIT, QUESTIONS, PreparedConnection, ResultCache, build_statement, parse_params
+from benchmarks.run_benchmarks import ROOT, all_teams
+
+
+def test_parse_params_fills_in_defaults():
+    assert parse_params("top3_player_kda", "") == {"team_id": None, "days": None, "min_matches": 1, "limit": 3}
+    assert parse_params("win_rate_last_week", "team_id=2163&days=7") == {"team_id": 2163, "days": 7, "min_matches": 1}
+    # team_id and days accept "all"; the last of repeated values wins
+    assert parse_params("win_rate_last_week", "team_id=all&days=ALL&min_matches=0&min_matches=3") == {
+        "team_id": None, "days": None, "min_matches": 3}
+    assert parse_params("top3_player_kda", "limit=1000")["limit"] == MAX_LIMIT
+
+
+@pytest.mark.parametrize("query, message", [
+    ("team=2163", "unknown parameters: team, expected team_id, days, min_matches"),
+    ("days=week", "days must be an integer, got 'week'"),
+    ("days=0", "days is out of range: 0"),
+    ("min_matches=-1", "min_matches is out of range: -1"),
+])
+def test_parse_params_rejects_invalid_values(query, message):
+    with pytest.raises(ValueError, match=message):
+        parse_params("match_duration", query)
+
+
+def test_result_cache_serves_hits_and_evicts_the_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    assert cache.get_or_load("a", lambda: b"A") == (b"A", False)
+    assert cache.get_or_load("a", lambda: b"stale") == (b"A", True)
+    cache.get_or_load("b", lambda: b"B")
+    cache.get("a")
+    cache.get_or_load("c", lambda: b"C")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"A"
+
+
+def test_result_cache_expires_entries():
+    cache = ResultCache(ttl=-1)
+    cache.get_or_load("a", lambda: b"A")
+    assert cache.get_or_load("a", lambda: b"B") == (b"B", False)
+
+
+def test_result_cache_drops_responses_computed_across_a_clear():
+    cache = ResultCache()
+
+    def load():
+        # An ETL run completes while the query runs, so its result may be stale
+        cache.clear()
+        return b"stale"
+
+    assert cache.get_or_load("a", load) == (b"stale", False)
+    assert cache.get("a") is None
+    assert cache.get_or_load("a", lambda: b"fresh") == (b"fresh", False)
+    assert cache.get("a") == b"fresh"
+
+
+def test_result_cache_runs_concurrent_misses_once():
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+    loads, results = [], []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return b"A"
+
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_load("a", load)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_load("a", load))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(loads) == 1
+    assert sorted(results) == [(b"A", False)] + [(b"A", True)] * 3
+
+
+def script_rows(connection, question, team_id):
+    """Rows of an analytical script, for one team or with its team filter commented out"""
+    sql = (ROOT / "analytical_questions_scripts" / f"{question}.sql").read_text()
+    with connection.cursor() as cursor:
+        cursor.execute(sql.replace("2163", str(team_id)) if team_id else all_teams(sql))
+        return cursor.fetchall()
+
+
+def service_rows(connection, question, **params):
+    """Rows of a question as the service computes them, from its defaults and `params`"""
+    _, defaults = QUESTIONS[question]
+    name, sql, args = build_statement(question, dict(defaults, **params))
+    return [tuple(row.values()) for row in connection.execute_prepared(name, sql, args)]
+
+
+def test_service_answers_match_the_sql(database_url, question_data):
+    connection = psycopg2.connect(database_url, connection_factory=PreparedConnection)
+    connection.autocommit = True
+    try:
+        for team_id in (question_data.team_ids[0], question_data.team_ids[-1], None):
+            for question in QUESTIONS:
+                expected = script_rows(connection, question, team_id)
+                if question == "win_rate_last_week":
+                    expected.sort()  # The script leaves the team order open
+                assert service_rows(connection, question, team_id=team_id) == expected, (question, team_id)
+
+                # A window covering every match reads the facts instead of the all-time rollups
+                if question != "win_rate_last_week":
+                    windowed = service_rows(connection, question, team_id=team_id, days=10000)
+                    assert windowed == service_rows(connection, question, team_id=team_id, days=None), \
+                        (question, team_id)
+    finally:
+        connection.close()
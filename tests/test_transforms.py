@@ -0,0 +1,252 @@
+# Third party imports
+import pandas as pd
+import psycopg2
+import pytest
+
+# Local imports
+from benchmarks.run_benchmarks import ROOT, all_teams, run_script
+from benchmarks.synthetic import DataGenerator
+from data_pipeline import fetch_data, match_archive
+from run_etl import PIPELINE
+
+SQL_STEPS = [(name, target) for name, kind, target, _, _ in PIPELINE if kind == "sql" and name != "schema"]
+
+
+def run_steps(connection, skip=()):
+    """Runs the SQL steps in pipeline order, except those in `skip`"""
+    for name, target in SQL_STEPS:
+        if name not in skip:
+            run_script(connection, ROOT / "sql_scripts" / target)
+
+
+def stage(generator, start, stop):
+    fetch_data.store_raw_data("stg_matches", generator.matches(start, stop))
+
+
+def stage_dimensions(generator):
+    """Stages the heroes, teams and player profiles of a generator"""
+    fetch_data.store_raw_data("stg_heroes", generator.heroes())
+    fetch_data.store_raw_data("stg_teams", generator.teams())
+    fetch_data.store_unique_players(generator.player(account_id)
+                                    for team_id in generator.team_ids for account_id in generator.roster(team_id))
+
+
+def watermarks(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT step_name, last_stg_seq FROM etl_watermarks")
+        rows = dict(cursor.fetchall())
+    connection.rollback()
+    return rows
+
+
+def team_days(connection, query):
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    connection.rollback()
+    return rows
+
+
+ROLLUP_TEAM_DAYS = "SELECT team_id, day, matches, kills_sum FROM rollup_team_daily ORDER BY 1, 2"
+FACT_TEAM_DAYS = """
+    SELECT tm.team_id, (to_timestamp(m.start_time) AT TIME ZONE 'UTC')::date, COUNT(*), SUM(tm.total_kills)
+    FROM fact_team_match_stats tm
+    JOIN fact_matches m ON m.match_id = tm.match_id
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+
+def test_rollups_wait_for_lagging_team_stats(loader):
+    generator = DataGenerator(60, team_count=4)
+    fetch_data.store_raw_data("stg_heroes", generator.heroes())
+    fetch_data.store_raw_data("stg_teams", generator.teams())
+    stage(generator, 0, 40)
+    run_steps(loader)
+    first = watermarks(loader)
+    assert team_days(loader, ROLLUP_TEAM_DAYS) == team_days(loader, FACT_TEAM_DAYS)
+
+    # fact_team_match_stats lags one run behind: the rollups stop at its watermark
+    stage(generator, 40, 60)
+    run_steps(loader, skip={"fact_team_match_stats"})
+    lagging = watermarks(loader)
+    assert lagging["fact_matches"] > first["fact_matches"]
+    assert lagging["fact_team_match_stats"] == first["fact_team_match_stats"]
+    assert lagging["rollups"] == first["rollups"]
+
+    # and pick up the new matches once it has caught up
+    run_steps(loader)
+    caught_up = watermarks(loader)
+    assert caught_up["fact_team_match_stats"] == caught_up["rollups"] == caught_up["fact_matches"]
+    assert team_days(loader, ROLLUP_TEAM_DAYS) == team_days(loader, FACT_TEAM_DAYS)
+    assert team_days(loader, "SELECT SUM(matches) FROM rollup_team_daily")[0][0] == 2 * 60
+
+
+def test_team_stats_only_read_new_matches(loader):
+    generator = DataGenerator(20, team_count=4)
+    fetch_data.store_raw_data("stg_heroes", generator.heroes())
+    fetch_data.store_raw_data("stg_teams", generator.teams())
+    stage(generator, 0, 20)
+    run_steps(loader)
+
+    # A row deleted behind the step's back stays deleted: earlier matches are not re-read
+    with loader.cursor() as cursor:
+        cursor.execute("DELETE FROM fact_team_match_stats WHERE match_id = (SELECT MIN(match_id) FROM fact_matches)")
+    loader.commit()
+    run_script(loader, ROOT / "sql_scripts" / "fact_team_match_stats.sql")
+    assert team_days(loader, "SELECT COUNT(*) FROM fact_team_match_stats")[0][0] == 2 * 20 - 2
+
+
+def test_analytical_scripts_run_with_the_team_filter_commented_out(database):
+    for path in sorted((ROOT / "analytical_questions_scripts").glob("*.sql")):
+        sql = path.read_text()
+        assert all_teams(sql) != sql, path.name
+        for query in (sql, all_teams(sql)):
+            with database.cursor() as cursor:
+                cursor.execute(query)
+            database.rollback()
+
+
+# Baseline top3_player_kda.sql over the fact table, with the team filter of the rollups
+FACT_TOP_KDA = """
+    SELECT p.player_name, CAST(AVG(pm.kda) AS NUMERIC(10,2)) AS avg_kda
+    FROM dim_players p
+    JOIN fact_player_match_stats pm ON p.account_id = pm.account_id
+    WHERE pm.team_id IS NOT NULL
+    GROUP BY p.player_name
+    ORDER BY avg_kda DESC, p.player_name
+    LIMIT 3
+"""
+
+
+def test_top_kda_leaves_out_unknown_kda_like_avg(loader):
+    generator = DataGenerator(40, team_count=2)
+    stage_dimensions(generator)
+    stage(generator, 0, 40)
+    players = generator.roster(generator.team_ids[0])
+    with loader.cursor() as cursor:
+        # Missing deaths leave kda NULL: for some matches of every player, and every match of one
+        cursor.execute("UPDATE stg_match_players SET deaths = NULL WHERE match_id %% 3 = 0 OR account_id = %s",
+                       (players[0],))
+    loader.commit()
+    run_steps(loader)
+
+    script = all_teams((ROOT / "analytical_questions_scripts" / "top3_player_kda.sql").read_text())
+    rollup_answer = team_days(loader, script)
+    assert rollup_answer == team_days(loader, FACT_TOP_KDA)
+    assert rollup_answer[0] == (f"player{players[0]}", None)
+
+
+def test_rederived_matches_reach_the_facts(loader):
+    generator = DataGenerator(10, team_count=2)
+    stage_dimensions(generator)
+    stage(generator, 0, 10)
+    match = generator.match(generator.match_id(3))
+    player = match["players"][0]
+    stranger = generator.roster(generator.team_ids[1])[0] + 1000
+
+    # The typed columns and players of one match drift from its archived payload
+    with loader.cursor() as cursor:
+        cursor.execute("UPDATE stg_matches SET duration = 1 WHERE match_id = %s", (match["match_id"],))
+        cursor.execute("UPDATE stg_match_players SET kills = 99 WHERE match_id = %s AND player_slot = %s",
+                       (match["match_id"], player["player_slot"]))
+        cursor.execute("""
+            INSERT INTO stg_match_players (match_id, player_slot, account_id, hero_id, kills, deaths, assists)
+            VALUES (%s, 255, %s, 1, 1, 1, 1)
+        """, (match["match_id"], stranger))
+    loader.commit()
+    run_steps(loader)
+    first = watermarks(loader)
+
+    def facts():
+        return team_days(loader, f"""
+            SELECT m.duration, pm.account_id, pm.kills
+            FROM fact_matches m JOIN fact_player_match_stats pm ON pm.match_id = m.match_id
+            WHERE m.match_id = {match["match_id"]} AND pm.account_id IN ({player["account_id"]}, {stranger})
+            ORDER BY pm.account_id
+        """)
+
+    assert facts() == [(1, player["account_id"], 99), (1, stranger, 1)]
+
+    # Re-deriving only restages the changed match, and the next run reloads it without a watermark reset
+    assert match_archive.rederive(loader) == 1
+    run_steps(loader)
+    assert facts() == [(match["duration"], player["account_id"], player["kills"])]
+    assert all(last_stg_seq > first[step] for step, last_stg_seq in watermarks(loader).items())
+    assert team_days(loader, ROLLUP_TEAM_DAYS) == team_days(loader, FACT_TEAM_DAYS)
+
+
+# Invariants of the fact tables; every query must return 0
+FACT_CHECKS = {
+    "duplicate_matches": "SELECT COUNT(*) - COUNT(DISTINCT match_id) FROM fact_matches",
+    "orphan_team_rows": """
+        SELECT COUNT(*) FROM fact_team_match_stats tm
+        WHERE NOT EXISTS (SELECT 1 FROM fact_matches m WHERE m.match_id = tm.match_id AND m.start_time = tm.start_time)
+    """,
+    "orphan_player_rows": """
+        SELECT COUNT(*) FROM fact_player_match_stats pm
+        WHERE NOT EXISTS (SELECT 1 FROM fact_matches m WHERE m.match_id = pm.match_id AND m.start_time = pm.start_time)
+    """,
+}
+
+
+def fact_checks(connection):
+    return {name: team_days(connection, query)[0][0] for name, query in FACT_CHECKS.items()}
+
+
+def test_moved_matches_keep_one_fact_row(loader):
+    generator = DataGenerator(10, team_count=2)
+    stage_dimensions(generator)
+    stage(generator, 0, 10)
+    run_steps(loader)
+    assert fact_checks(loader) == dict.fromkeys(FACT_CHECKS, 0)
+
+    # The match is staged again with a start_time in another month
+    match = generator.match(generator.match_id(3))
+    moved = dict(match, start_time=match["start_time"] - 45 * 86400)
+    fetch_data.store_raw_data("stg_matches", [moved], replace_existing=True)
+    run_steps(loader)
+
+    assert fact_checks(loader) == dict.fromkeys(FACT_CHECKS, 0)
+    start_times = team_days(loader, f"""
+        SELECT 'matches', start_time FROM fact_matches WHERE match_id = {match["match_id"]}
+        UNION SELECT 'teams', start_time FROM fact_team_match_stats WHERE match_id = {match["match_id"]}
+        UNION SELECT 'players', start_time FROM fact_player_match_stats WHERE match_id = {match["match_id"]}
+        ORDER BY 1
+    """)
+    assert start_times == [(table, moved["start_time"]) for table in ("matches", "players", "teams")]
+
+
+@pytest.mark.parametrize("table", ["fact_team_match_stats", "fact_player_match_stats"])
+def test_fact_rows_need_their_match(loader, table):
+    generator = DataGenerator(4, team_count=2)
+    stage_dimensions(generator)
+    stage(generator, 0, 4)
+    run_steps(loader)
+
+    with loader.cursor() as cursor:
+        with pytest.raises(psycopg2.errors.ForeignKeyViolation):
+            cursor.execute(f"UPDATE {table} SET start_time = start_time + 1 WHERE match_id = %s",
+                           (generator.match_id(0),))
+    loader.rollback()
+
+
+def snapshot_rows(frame):
+    """DataFrame rows as tuples of plain Python values, None for missing ones"""
+    return [tuple(None if pd.isna(value) else value.item() if hasattr(value, "item") else value for value in row)
+            for row in frame.itertuples(index=False)]
+
+
+def test_snapshot_answers_match_the_sql(loader, question_data, tmp_path):
+    queries = pytest.importorskip("analytics.queries")
+    export_snapshot = pytest.importorskip("data_pipeline.export_snapshot")
+    export_snapshot.export_snapshot(loader, str(tmp_path))
+
+    for team_id in (question_data.team_ids[0], question_data.team_ids[-1], None):
+        for name, answer in queries.QUESTIONS.items():
+            sql = (ROOT / "analytical_questions_scripts" / f"{name}.sql").read_text()
+            expected = team_days(loader, sql.replace("2163", str(team_id)) if team_id else all_teams(sql))
+            actual = snapshot_rows(answer(team_id=team_id, snapshot_dir=str(tmp_path)))
+            if name == "win_rate_last_week":
+                expected.sort(key=str)  # The script leaves the team order open
+            assert actual == expected, (name, team_id)